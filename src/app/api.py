@@ -1,22 +1,69 @@
 """
 FastAPI app for the Jenius FX chatbot API.
-Provides a /chat-stream endpoint for streaming chat responses.
+Provides a /chat-stream endpoint for streaming chat responses, a /ready
+probe that turns healthy once the startup warm-up has succeeded, and
+Prometheus-style metrics on /metrics. /retrieve-batch runs retrieval only, for
+many queries at once (evaluation and bulk traffic).
+/chat-stream is admission-controlled: beyond settings.max_concurrent_streams
+requests queue briefly, and are rejected with 429 (queue full) or 503 (queue
+wait timed out) instead of piling up on the OpenAI rate limit.
 """
 
 # PYTHONPATH=src uvicorn app.api:app
 
+import asyncio
+import json
 import logging
+from contextlib import asynccontextmanager
 from typing import List, Literal, Optional
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from langchain.schema import HumanMessage
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
 
-from services.rag_services import stream_chat_with_memory
+from app.sse import coalesce, encode_event
+from core.disk_cache import get_disk_cache
+from core.metrics import REGISTRY, RequestTimings
+from core.settings import get_settings, settings
+from retrieval import vector_store
+from services import clients, fx_rates, rag_services
+from services.concurrency import GuardedStream, Overloaded, Ticket, get_admission
+from services.llm import count_tokens
+from services.sessions import create_session, get_session_store, record_turn
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up pooled clients and indexes in the background; /ready reports when done.
+    Also starts the FX rate refresh thread (serving from the last snapshot meanwhile).
+    Settings are validated here, so a misconfigured deployment fails at startup.
+    Queued disk-cache writes are flushed on shutdown.
+    """
+    get_settings()
+    task = asyncio.create_task(clients.warmup()) if settings.warmup_on_startup else None
+    fx = None
+    if settings.fx_answers_enabled:
+        try:
+            fx = fx_rates.get_fx_service()
+            fx.start()
+        except Exception as e:
+            logger.error(f"FX rate service failed to start: {e}")
+    yield
+    if task is not None and not task.done():
+        task.cancel()
+    if fx is not None:
+        fx.stop()
+    disk = get_disk_cache()
+    if disk is not None:
+        await asyncio.to_thread(disk.flush)
+    await clients.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,41 +71,217 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-Id"],
 )
 
 logger = logging.getLogger(__name__)
 
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once warm-up has succeeded, 503 before or if it failed.
+    """
+    state = clients.readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus text exposition of the stage histograms and cache counters.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 class ChatStreamRequest(BaseModel):
     """
     Request model for the /chat-stream endpoint.
-    history: List of message dicts (role/content)
+    history: List of message dicts (role/content); ignored when session_id is set
     user_input: The user's input string
     lang: Optional language code ("en" or "id")
+    session_id: Optional server-side session; the client then sends only the new message.
+        Must be an ID the server issued; unknown IDs are rejected with 404
+    new_session: Start a server-side session; its ID comes back in the X-Session-Id header
+    timing: If true, a final `event: timing` SSE frame carries per-stage timings
     """
 
-    history: List[dict]  # role: "user"/"assistant", content: str
+    history: List[dict] = []  # role: "user"/"assistant", content: str
     user_input: str
     lang: Optional[Literal["en", "id"]] = None
+    session_id: Optional[str] = None
+    new_session: bool = False
+    timing: bool = False
+
+
+_USAGE_KEYS = ("prompt_tokens", "cached_prompt_tokens", "completion_tokens")
+
+
+async def _client_gone(request: Request) -> None:
+    """
+    Return once the client has disconnected.
+    """
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that returns its admission ticket when the response is
+    over, however it ends: completed, client gone mid-send (a cancelled or
+    failed send leaves the body generator suspended, its cleanup deferred to
+    garbage collection), or body never started.
+    """
+
+    def __init__(self, content, ticket: Ticket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.ticket.release()
+
+
+def _to_messages(history: List[dict]) -> List:
+    """
+    Convert client-side role/content dicts into LangChain messages.
+    """
+    return [
+        (AIMessage if m.get("role") == "assistant" else HumanMessage)(
+            content=m.get("content", "")
+        )
+        for m in history
+    ]
 
 
 @app.post("/chat-stream")
-async def chat_stream(req: ChatStreamRequest):
+async def chat_stream(req: ChatStreamRequest, request: Request):
     """
     Stream chat responses for a given user input and chat history.
-    Converts incoming history to HumanMessage objects and streams the response chunks.
+    With a session_id, history comes from the server-side session as a
+    token-budgeted window and the finished turn is recorded afterwards; otherwise
+    the client's history is converted to Human/AI messages. new_session starts
+    a session under a server-issued ID (returned in X-Session-Id); a session_id
+    the server did not issue gets a 404.
+    The generator is async, so open streams wait on the event loop instead of
+    holding a threadpool worker each. A client disconnect, settings.stream_max_duration_s
+    or settings.stream_max_tokens ends the stream and cancels the upstream
+    generation.
+    Token chunks are coalesced into `data` events (see app/sse.py) with
+    increasing IDs; a final `event: done` frame carries the outcome
+    ("completed", "timeout" or "token_cap") and token usage, including the
+    prompt tokens the provider served from its prompt cache.
     """
+    try:
+        ticket = await get_admission().acquire()
+    except Overloaded as e:
+        logger.warning(f"Rejected /chat-stream request with {e.status_code}: {get_admission().stats()}")
+        return JSONResponse(
+            {"error": str(e)}, status_code=e.status_code, headers={"Retry-After": "1"}
+        )
     try:
         logger.info(
-            f"Received /chat-stream request: user_input='{req.user_input}', lang='{req.lang}'"
+            f"Received /chat-stream request: {len(req.user_input)} chars, lang='{req.lang}'"
+        )
+        session = None
+        if req.session_id:
+            session = get_session_store().find(req.session_id)
+            if session is None:
+                ticket.release()
+                return JSONResponse({"error": "unknown session"}, status_code=404)
+        elif req.new_session:
+            session = create_session()
+        history = session.window() if session else _to_messages(req.history)
+
+        parts, completed = [], []
+        timings = RequestTimings()
+
+        stream = GuardedStream(
+            rag_services.astream_chat_with_memory(
+                history,
+                req.user_input,
+                req.lang,
+                session_id=session.session_id if session else None,
+                timings=timings,
+            ),
+            max_duration_s=settings.stream_max_duration_s,
+            max_chunks=settings.stream_max_tokens,
+            disconnected=lambda: _client_gone(request),
         )
-        history = [HumanMessage(**m) for m in req.history]
 
-        def event_gen():
-            for chunk in stream_chat_with_memory(history, req.user_input, req.lang):
-                yield f"data:{chunk}\n\n"
+        async def event_gen():
+            event_id = 0
+            try:
+                chunks = coalesce(stream, settings.sse_flush_interval_ms / 1000, settings.sse_flush_bytes)
+                async for text in chunks:
+                    parts.append(text)
+                    event_id += 1
+                    yield encode_event(text, event_id=event_id)
+            finally:
+                ticket.release()  # frees the slot for a live user as soon as the stream ends
+            if stream.outcome == "disconnected":
+                return
+            completed.append(True)
+            answer = "".join(parts)
+            # provider-reported usage when this request ran the generation, else an estimate
+            usage = {k: timings.counters[k] for k in _USAGE_KEYS if k in timings.counters}
+            usage.setdefault("completion_tokens", count_tokens(answer) if answer else 0)
+            done = {"outcome": stream.outcome, "chunks": stream.sent, "usage": usage}
+            yield encode_event(json.dumps(done), event="done", event_id=event_id + 1)
+            if req.timing:
+                timings.add("total", timings.elapsed())
+                yield encode_event(json.dumps(timings.to_dict()), event="timing", event_id=event_id + 2)
+
+        async def save_turn():
+            # runs after the response is sent, so summarization never delays the stream
+            if session is not None and completed:
+                await record_turn(session, req.user_input, "".join(parts))
 
-        return StreamingResponse(event_gen(), media_type="text/event-stream")
+        return _AdmittedStreamingResponse(
+            event_gen(),
+            ticket,
+            media_type="text/event-stream",
+            headers={"X-Session-Id": session.session_id} if session else None,
+            background=BackgroundTask(save_turn),
+        )
     except Exception as e:
+        ticket.release()
         logger.error(f"Error in /chat-stream: {e}")
         return {"error": "An error occurred while processing your request."}
+
+
+class RetrieveBatchRequest(BaseModel):
+    """
+    Request model for the /retrieve-batch endpoint.
+    queries: Query strings; results come back in the same order
+    lang: Optional language code ("en" or "id") selecting namespace and filter
+    k: Documents per query
+    """
+
+    queries: List[str]
+    lang: Optional[Literal["en", "id"]] = None
+    k: int = Field(default=3, ge=1, le=20)
+
+
+@app.post("/retrieve-batch")
+def retrieve_batch(req: RetrieveBatchRequest):
+    """
+    Retrieve documents for many queries in one call: one batched embedding
+    request and a bounded pool of concurrent vector queries.
+    Runs in the threadpool since retrieval here is synchronous.
+    """
+    if len(req.queries) > settings.retrieve_batch_max_queries:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.retrieve_batch_max_queries} queries per request.",
+        )
+    logger.info(f"Received /retrieve-batch request: {len(req.queries)} queries, lang='{req.lang}'")
+    results = vector_store.retrieve_docs_many(req.queries, req.lang, req.k)
+    return {
+        "results": [
+            [{"id": d.id, "text": d.page_content, "metadata": d.metadata} for d in docs]
+            for docs in results
+        ]
+    }
@@ -5,10 +5,13 @@ Run:
     PYTHONPATH=src python3 -m app.main
 """
 
+import importlib
 import logging
 import sys
-from langchain.schema import AIMessage, HumanMessage
+import threading
+from langchain_core.messages import AIMessage, HumanMessage
 
+from core.settings import get_settings
 from services.rag_services import stream_chat_with_memory
 
 logging.basicConfig(
@@ -26,6 +29,11 @@ def run_cli() -> None:
     and streams responses from the RAG pipeline until the user exits.
     """
     try:
+        get_settings()
+        # import the OpenAI client while the user is still typing
+        threading.Thread(
+            target=importlib.import_module, args=("langchain_openai",), daemon=True
+        ).start()
         lang = input("Choose language [en/id] › ").strip().lower() or "en"
         if lang not in ("en", "id"):
             lang = "en"
@@ -39,13 +47,13 @@ def run_cli() -> None:
             if user.lower() == "exit":
                 logger.info("User exited the CLI chatbot.")
                 break
-            logger.info(f"User input: {user}")
+            logger.info(f"User input received ({len(user)} chars)")
             try:
                 reply_chunks = stream_chat_with_memory(history, user, lang=lang)
                 reply_text = "".join(reply_chunks)
                 reply_msg = AIMessage(content=reply_text)
                 history.extend([HumanMessage(content=user), reply_msg])
-                logger.info(f"AI reply: {reply_text}")
+                logger.info(f"AI reply streamed ({len(reply_text)} chars)")
                 print("AI:", reply_text, "\n")
             except Exception as e:
                 logger.error(f"Error during chat: {e}")
@@ -0,0 +1,92 @@
+import asyncio
+import re
+from typing import AsyncIterator, Optional
+
+"""
+Server-sent events encoding for /chat-stream.
+`encode_event` frames arbitrary text correctly: every line of a multi-line
+payload gets its own `data:` field, so a newline inside an answer never ends
+the event early, and leading spaces survive the one space the SSE parser strips.
+`coalesce` merges token chunks into fewer, larger frames: the first chunk goes
+out at once (time to first token is unchanged) and later ones are flushed
+every `interval_s` or once `max_bytes` are buffered, whichever comes first.
+"""
+
+_NEWLINE = re.compile(r"\r\n|\r|\n")
+
+
+def encode_event(data: str, event: Optional[str] = None, event_id: Optional[int] = None) -> str:
+    """
+    Encode one SSE event.
+    Args:
+        data: Payload; may contain newlines.
+        event: Optional event type (clients default to "message").
+        event_id: Optional event ID, echoed by the client as Last-Event-ID.
+    Returns:
+        The event, terminated by a blank line.
+    """
+    fields = []
+    if event_id is not None:
+        fields.append(f"id: {event_id}\n")
+    if event is not None:
+        fields.append(f"event: {event}\n")
+    fields.extend(f"data: {line}\n" for line in _NEWLINE.split(data))
+    return "".join(fields) + "\n"
+
+
+async def coalesce(chunks: AsyncIterator[str], interval_s: float, max_bytes: int) -> AsyncIterator[str]:
+    """
+    Merge consecutive chunks; see the module docstring for the flush policy.
+    interval_s <= 0 disables coalescing (every chunk is yielded as it arrives).
+    """
+    if interval_s <= 0:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    upstream = chunks.__aiter__()
+    buf: list = []
+    size = 0
+    flush_at: Optional[float] = None
+    pending: Optional[asyncio.Future] = None
+    first = True
+    exhausted = False
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(upstream.__anext__())
+            timeout = None if flush_at is None else max(0.0, flush_at - loop.time())
+            done, _ = await asyncio.wait([pending], timeout=timeout)
+            if not done:
+                # interval elapsed with no new chunk: flush what we have
+                yield "".join(buf)
+                buf, size, flush_at = [], 0, None
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                exhausted = True
+                break
+            finally:
+                pending = None
+            if first:
+                first = False
+                yield chunk
+                continue
+            buf.append(chunk)
+            size += len(chunk.encode())
+            if flush_at is None:
+                flush_at = loop.time() + interval_s
+            if size >= max_bytes:
+                yield "".join(buf)
+                buf, size, flush_at = [], 0, None
+        if buf:
+            yield "".join(buf)
+    finally:
+        if pending is not None:
+            pending.cancel()  # propagates to the upstream stream, which cancels its generation
+        elif not exhausted:
+            aclose = getattr(upstream, "aclose", None)
+            if aclose is not None:
+                asyncio.ensure_future(aclose())
@@ -0,0 +1,21 @@
+import argparse
+
+from benchmarks.results import compare
+
+"""
+Compare two benchmark result files:
+
+    PYTHONPATH=src python -m benchmarks old.json new.json
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+    print(compare(args.old, args.new))
+
+
+if __name__ == "__main__":
+    main()
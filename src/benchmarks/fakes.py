@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessageChunk
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from retrieval.local_index import _matches_filter
+
+"""
+Local stand-ins for OpenAI and Pinecone used by the benchmark suite.
+They reproduce the latency shape of the real services (time-to-first-token,
+inter-token delay, embedding and query round trips) without any network.
+"""
+
+
+class FakeChatModel:
+    """
+    Emits a canned answer token by token after `ttft` seconds, then one token
+    every `inter_token` seconds.
+    """
+
+    def __init__(self, ttft: float = 0.3, inter_token: float = 0.02, tokens: int = 60):
+        self.ttft = ttft
+        self.inter_token = inter_token
+        self.tokens = tokens
+
+    def _words(self) -> List[str]:
+        return [f"tok{i} " for i in range(self.tokens)]
+
+    async def astream(self, messages, **kwargs):
+        await asyncio.sleep(self.ttft)
+        for i, word in enumerate(self._words()):
+            if i:
+                await asyncio.sleep(self.inter_token)
+            yield AIMessageChunk(content=word)
+
+    def stream(self, messages, **kwargs):
+        time.sleep(self.ttft)
+        for i, word in enumerate(self._words()):
+            if i:
+                time.sleep(self.inter_token)
+            yield AIMessageChunk(content=word)
+
+    async def ainvoke(self, messages, **kwargs):
+        await asyncio.sleep(self.ttft)
+        return AIMessageChunk(content="".join(self._words()))
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic pseudo-random unit vectors derived from the text hash,
+    with an optional simulated round-trip `latency`.
+    """
+
+    def __init__(self, dim: int = 256, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+
+    def _vec(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "little")
+        v = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (v / np.linalg.norm(v)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vec(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakePineconeIndex:
+    """
+    In-memory subset of the Pinecone Index API (upsert/query/fetch/list/update/delete)
+    with a simulated per-call `latency`.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.namespaces: Dict[str, Dict[str, Tuple[np.ndarray, dict]]] = {}
+
+    def _sleep(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def upsert(self, vectors: Iterable[Tuple[str, List[float], dict]], namespace: str = ""):
+        self._sleep()
+        ns = self.namespaces.setdefault(namespace, {})
+        for uid, values, meta in vectors:
+            v = np.asarray(values, dtype=np.float32)
+            ns[uid] = (v / (np.linalg.norm(v) or 1.0), dict(meta))
+
+    def update(self, id: str, set_metadata: dict, namespace: str = ""):
+        self._sleep()
+        vec, _ = self.namespaces[namespace][id]
+        self.namespaces[namespace][id] = (vec, dict(set_metadata))
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: str = "", delete_all: bool = False):
+        self._sleep()
+        if delete_all:
+            self.namespaces.pop(namespace, None)
+        for uid in ids or []:
+            self.namespaces.get(namespace, {}).pop(uid, None)
+
+    def list(self, namespace: str = ""):
+        yield list(self.namespaces.get(namespace, {}))
+
+    def _search(self, vector, top_k, namespace, filter) -> List[Tuple[str, float, dict]]:
+        items = self.namespaces.get(namespace, {})
+        q = np.asarray(vector, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        scored = [
+            (uid, float(v @ q), meta)
+            for uid, (v, meta) in items.items()
+            if not filter or _matches_filter(meta, filter)
+        ]
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return scored[:top_k]
+
+    def query(self, vector, top_k=3, namespace="", filter=None, include_metadata=True):
+        self._sleep()
+        return {
+            "matches": [
+                {"id": uid, "score": score, "metadata": dict(meta)}
+                for uid, score, meta in self._search(vector, top_k, namespace, filter)
+            ]
+        }
+
+    async def aquery(self, vector, top_k=3, namespace="", filter=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._search(vector, top_k, namespace, filter)
+
+
+class FakeVectorStore(VectorStore):
+    """
+    LangChain VectorStore over a FakePineconeIndex namespace, returning the same
+    Documents as PineconeVectorStore.
+    """
+
+    def __init__(self, index: FakePineconeIndex, embedding: Embeddings, namespace: str = ""):
+        self._index = index
+        self._embedding = embedding
+        self._namespace = namespace
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @staticmethod
+    def _docs(matches) -> List[Document]:
+        out = []
+        for uid, _, meta in matches:
+            meta = dict(meta)
+            text = meta.pop("text", "")
+            out.append(Document(id=uid, page_content=text, metadata=meta))
+        return out
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        if self._index.latency:
+            time.sleep(self._index.latency)
+        return self._docs(self._index._search(embedding, k, self._namespace, filter))
+
+    async def asimilarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return self._docs(await self._index.aquery(embedding, k, self._namespace, filter))
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, filter)
+
+    async def asimilarity_search(self, query, k=4, filter=None, **kwargs):
+        vec = await self._embedding.aembed_query(query)
+        return await self.asimilarity_search_by_vector(vec, k, filter)
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("populate the FakePineconeIndex directly")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("populate the FakePineconeIndex directly")
@@ -0,0 +1,88 @@
+import os
+import tempfile
+from contextlib import ExitStack, contextmanager
+from typing import Iterator, List, Optional
+from unittest import mock
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, FakePineconeIndex, FakeVectorStore
+from core.settings import settings
+from retrieval import lexical_index, vector_store
+from retrieval.chunking import DEFAULT_JOBS, IngestJob, iter_chunks
+from retrieval.embeddings import CachedEmbeddings
+from services.answer_cache import answer_cache
+
+"""
+Benchmark environment: swaps OpenAI and Pinecone for the local fakes, loads the
+real FAQ corpus into the fake index and lexical index, and points every on-disk
+cache at a temporary directory.
+"""
+
+
+class BenchEnv:
+    def __init__(self, chat: FakeChatModel, embeddings: FakeEmbeddings, index: FakePineconeIndex):
+        self.chat = chat
+        self.embeddings = embeddings
+        self.index = index
+
+
+def load_corpus(jobs: Optional[List[IngestJob]] = None):
+    """
+    Parse the FAQ PDFs into (uid, text, metadata) chunks, grouped by namespace.
+    """
+    corpus = {}
+    for job in jobs or DEFAULT_JOBS:
+        corpus.setdefault(job.namespace, []).extend(iter_chunks(job))
+    return corpus
+
+
+@contextmanager
+def fake_services(
+    ttft: float = 0.3,
+    inter_token: float = 0.02,
+    tokens: int = 60,
+    embed_latency: float = 0.05,
+    query_latency: float = 0.05,
+    dim: int = 256,
+    hybrid: bool = True,
+) -> Iterator[BenchEnv]:
+    """
+    Install the fakes for the duration of the block.
+    """
+    chat = FakeChatModel(ttft=ttft, inter_token=inter_token, tokens=tokens)
+    base = FakeEmbeddings(dim=dim, latency=embed_latency)
+    embeddings = CachedEmbeddings(base, model="fake", dim=dim)
+    index = FakePineconeIndex(latency=query_latency)
+    tmp = tempfile.TemporaryDirectory(prefix="bench-")
+    with ExitStack() as stack:
+        stack.callback(tmp.cleanup)
+        # every file the pipeline reads or writes lives in the temp dir, never in src/data
+        for field in (
+            "cache_dir",
+            "local_index_dir",
+            "manifest_dir",
+            "lexical_index_dir",
+            "parsed_dir",
+            "answer_store_dir",
+            "fx_snapshot_path",
+            "disk_cache_path",
+            "session_db_path",
+        ):
+            stack.enter_context(mock.patch.object(settings, field, os.path.join(tmp.name, field)))
+        stack.enter_context(mock.patch.object(settings, "hybrid_retrieval", hybrid))
+        stack.enter_context(mock.patch.object(settings, "session_backend", "memory"))
+        stack.enter_context(mock.patch("services.rag_services.chat_model", return_value=chat))
+        stack.enter_context(mock.patch("services.sessions.chat_model", return_value=chat))
+        stack.enter_context(mock.patch.dict(vector_store._VECTORSTORES, clear=True))
+        stack.enter_context(mock.patch.dict(lexical_index._LEXICAL_INDEXES, clear=True))
+
+        saved_latency, index.latency = index.latency, 0.0
+        for ns, chunks in load_corpus().items():
+            vecs = base.embed_documents([text for _, text, _ in chunks])
+            index.upsert(((uid, v, meta) for (uid, _, meta), v in zip(chunks, vecs)), namespace=ns)
+            lexical_index.rebuild_lexical_index(ns, [(uid, meta) for uid, _, meta in chunks])
+            vector_store._VECTORSTORES[ns] = FakeVectorStore(index, embeddings, namespace=ns)
+        index.latency = saved_latency
+        base.calls = 0
+        answer_cache.clear()
+        stack.callback(answer_cache.clear)
+        yield BenchEnv(chat, base, index)
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import tracemalloc
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from benchmarks.harness import fake_services, load_corpus
+from benchmarks.results import save_results
+
+"""
+In-process load test for /chat-stream.
+Drives the ASGI app directly with N concurrent clients against the local fakes
+and reports throughput, time-to-first-byte and total latency percentiles, and
+memory held per open stream.
+
+    PYTHONPATH=src python -m benchmarks.load --concurrency 50 --requests 500
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class Sample(NamedTuple):
+    status: int
+    ttfb: Optional[float]
+    total: float
+    nbytes: int
+
+
+async def _post(app, path: str, payload: dict) -> Sample:
+    """
+    Minimal ASGI client that timestamps the first response body chunk.
+    (httpx's ASGITransport buffers the whole response, hiding time-to-first-byte.)
+    """
+    body = json.dumps(payload).encode()
+    done = asyncio.Event()
+    sent = False
+    status, first, nbytes = 0, None, 0
+    start = time.perf_counter()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, first, nbytes
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if chunk and first is None:
+                first = time.perf_counter() - start
+            nbytes += len(chunk)
+            if not message.get("more_body", False):
+                done.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    done.set()
+    return Sample(status, first, time.perf_counter() - start, nbytes)
+
+
+def _questions() -> List[dict]:
+    pool = []
+    for ns, chunks in load_corpus().items():
+        pool.extend({"user_input": meta["question"], "lang": None} for _, _, meta in chunks)
+    return pool
+
+
+async def run_load(app, questions: List[dict], concurrency: int, requests: int, unique: bool, seed: int = 0):
+    """
+    Fire `requests` chat requests with at most `concurrency` in flight.
+    Returns (samples, wall-clock seconds).
+    """
+    rng = random.Random(seed)
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> Sample:
+        q = dict(rng.choice(questions))
+        if unique:
+            # defeat the answer cache so every request exercises the full pipeline
+            q["user_input"] = f"{q['user_input']} ({i})"
+        async with sem:
+            return await _post(app, "/chat-stream", q)
+
+    start = time.perf_counter()
+    samples = await asyncio.gather(*(one(i) for i in range(requests)))
+    return samples, time.perf_counter() - start
+
+
+async def measure_memory(app, questions: List[dict], concurrency: int) -> float:
+    """
+    Peak traced allocation per stream with `concurrency` streams open at once, in KiB.
+    Run separately because tracemalloc slows everything down.
+    """
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    await run_load(app, questions, concurrency, concurrency, unique=True, seed=1)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (peak - base) / concurrency / 1024
+
+
+def summarize(samples: List[Sample], wall: float) -> dict:
+    ok = [s for s in samples if s.status == 200]
+    ttfb = np.array([s.ttfb for s in ok if s.ttfb is not None])
+    total = np.array([s.total for s in ok])
+    metrics = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+    }
+    for name, arr in (("ttfb", ttfb), ("total", total)):
+        if len(arr):
+            for p in (50, 95, 99):
+                metrics[f"{name}_p{p}_ms"] = round(float(np.percentile(arr, p)) * 1000, 1)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /chat-stream against local fakes.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--ttft", type=float, default=0.3, help="fake LLM time to first token (s)")
+    parser.add_argument("--inter-token", type=float, default=0.02, help="fake LLM delay per token (s)")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per fake answer")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--query-latency", type=float, default=0.05)
+    parser.add_argument("--no-hybrid", action="store_true", help="disable the lexical fast path")
+    parser.add_argument("--repeat", action="store_true", help="allow repeated questions (answer-cache hits)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--out", help="result file (default: src/benchmarks/results/...)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    from app.api import app
+
+    with fake_services(
+        ttft=args.ttft,
+        inter_token=args.inter_token,
+        tokens=args.tokens,
+        embed_latency=args.embed_latency,
+        query_latency=args.query_latency,
+        hybrid=not args.no_hybrid,
+    ):
+        questions = _questions()
+        samples, wall = asyncio.run(
+            run_load(app, questions, args.concurrency, args.requests, unique=not args.repeat)
+        )
+        metrics = summarize(samples, wall)
+        if not args.no_memory:
+            metrics["memory_per_stream_kib"] = round(
+                asyncio.run(measure_memory(app, questions, args.concurrency)), 1
+            )
+
+    for key, value in metrics.items():
+        print(f"{key:<28} {value}")
+    path = save_results("load", vars(args), metrics, out=args.out)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
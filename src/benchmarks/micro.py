@@ -0,0 +1,92 @@
+import argparse
+import logging
+import time
+from typing import Callable, Dict
+
+import fitz
+import numpy as np
+
+from benchmarks.harness import fake_services, load_corpus
+from benchmarks.results import save_results
+from retrieval import vector_store
+from retrieval.chunking import DEFAULT_JOBS, iter_qna_blocks
+from retrieval.pdf_parser import load_qna
+from services import rag_services
+
+"""
+Micro-benchmarks for the hot synchronous paths: PDF Q&A parsing (and loading
+the cached parse artifact), retrieval and prompt augmentation. OpenAI and
+Pinecone are replaced by zero-latency fakes so the numbers measure our own code.
+
+    PYTHONPATH=src python -m benchmarks.micro
+"""
+
+
+def timeit(fn: Callable[[int], object], repeat: int) -> Dict[str, float]:
+    """
+    Call fn(i) `repeat` times and return mean/p50/p95 in microseconds.
+    """
+    fn(0)  # warm-up
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        times[i] = time.perf_counter() - start
+    times *= 1e6
+    return {
+        "mean_us": round(float(times.mean()), 1),
+        "p50_us": round(float(np.percentile(times, 50)), 1),
+        "p95_us": round(float(np.percentile(times, 95)), 1),
+    }
+
+
+def run(repeat: int) -> Dict[str, float]:
+    metrics: Dict[str, float] = {}
+
+    def record(name: str, result: Dict[str, float]):
+        for key, value in result.items():
+            metrics[f"{name}.{key}"] = value
+        print(f"{name:<28} " + "  ".join(f"{k}={v}" for k, v in result.items()))
+
+    for job in DEFAULT_JOBS:
+        def parse(_, path=job.pdf_path):
+            with fitz.open(path) as doc:
+                return sum(1 for _ in iter_qna_blocks(doc))
+
+        record(f"iter_qna_blocks[{job.lang}]", timeit(parse, max(1, repeat // 20)))
+        # after the warm-up call this reads the cached artifact
+        record(f"load_qna[{job.lang}]", timeit(lambda _, path=job.pdf_path: load_qna(path), repeat))
+
+    questions = [
+        (meta["question"], job_ns)
+        for job_ns, chunks in load_corpus().items()
+        for _, _, meta in chunks
+    ]
+
+    def pick(i):
+        q, lang = questions[i % len(questions)]
+        # suffix defeats the embedding cache so every call embeds
+        return f"{q} {i}", lang
+
+    for hybrid in (False, True):
+        tag = "hybrid" if hybrid else "dense"
+        with fake_services(embed_latency=0.0, query_latency=0.0, hybrid=hybrid):
+            record(f"retrieve_docs[{tag}]", timeit(lambda i: vector_store.retrieve_docs(*pick(i)), repeat))
+            record(f"augment_prompt[{tag}]", timeit(lambda i: rag_services.augment_prompt(*pick(i)), repeat))
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for parsing and retrieval.")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--out", help="result file (default: src/benchmarks/results/...)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    metrics = run(args.repeat)
+    path = save_results("micro", vars(args), metrics, out=args.out)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import datetime
+import json
+import os
+import platform
+import subprocess
+from typing import Dict, Optional
+
+"""
+Benchmark result files: JSON documents tagged with the git commit so runs can
+be compared across commits.
+"""
+
+RESULTS_DIR = os.path.join("src", "benchmarks", "results")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def save_results(kind: str, params: dict, metrics: Dict[str, float], out: Optional[str] = None) -> str:
+    """
+    Write a result file and return its path.
+    """
+    commit = _git_commit()
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = out or os.path.join(RESULTS_DIR, f"{kind}-{commit or 'nogit'}-{stamp}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "kind": kind,
+                "commit": commit,
+                "timestamp": stamp,
+                "python": platform.python_version(),
+                "params": params,
+                "metrics": metrics,
+            },
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+    return path
+
+
+def compare(old_path: str, new_path: str) -> str:
+    """
+    Render a metric-by-metric comparison of two result files.
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    lines = [f"{'metric':<40} {old.get('commit') or 'old':>12} {new.get('commit') or 'new':>12} {'change':>9}"]
+    for key in sorted(set(old["metrics"]) | set(new["metrics"])):
+        a, b = old["metrics"].get(key), new["metrics"].get(key)
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a:
+            change = f"{(b - a) / a * 100:+.1f}%"
+        else:
+            change = "n/a"
+        lines.append(f"{key:<40} {a!s:>12} {b!s:>12} {change:>9}")
+    return "\n".join(lines)
@@ -0,0 +1,80 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, Tuple
+
+from benchmarks.results import save_results
+
+"""
+Cold-start budget: import cost of the entry points, measured in fresh
+interpreters with `python -X importtime`, so a new module-level import or
+side effect shows up as a regression.
+
+    PYTHONPATH=src python -m benchmarks.startup --check
+"""
+
+# cumulative import time budget per module, in milliseconds
+BUDGET_MS = {
+    "core.settings": 300,
+    "services.rag_services": 1300,
+    "app.api": 1800,
+    "app.main": 1300,
+}
+
+_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)")
+
+
+def measure(module: str, runs: int = 3) -> Tuple[float, float]:
+    """
+    Return (cumulative import ms, process wall ms) for `module`, best of `runs`.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, ["src", os.environ.get("PYTHONPATH")])))
+    best_import = best_wall = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        wall = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+        cumulative = next(
+            (int(m.group(1)) for m in map(_LINE.match, reversed(proc.stderr.splitlines())) if m and m.group(2) == module),
+            0,
+        )
+        best_import = min(best_import, cumulative / 1000)
+        best_wall = min(best_wall, wall)
+    return round(best_import, 1), round(best_wall, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import-time cold start against a budget.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help="exit non-zero when over budget")
+    parser.add_argument("--out", help="result file (default: src/benchmarks/results/...)")
+    args = parser.parse_args()
+
+    metrics: Dict[str, float] = {}
+    over = []
+    for module, budget in BUDGET_MS.items():
+        import_ms, wall_ms = measure(module, args.runs)
+        metrics[f"{module}.import_ms"] = import_ms
+        metrics[f"{module}.wall_ms"] = wall_ms
+        flag = "OVER" if import_ms > budget else "ok"
+        if import_ms > budget:
+            over.append(module)
+        print(f"{module:<24} import={import_ms:>8.1f}ms  wall={wall_ms:>8.1f}ms  budget={budget}ms  {flag}")
+    path = save_results("startup", vars(args), metrics, out=args.out)
+    print(f"saved {path}")
+    if args.check and over:
+        sys.exit(f"over startup budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.settings import settings
+
+"""
+Persistent local cache tier shared by every worker process on a host.
+A single SQLite file in WAL mode holds query embeddings, retrieval results and
+generated answers, so a restarted or newly forked worker starts warm and
+workers do not each recompute the same values. Entries live in a named bucket,
+carry a version string (embedding model/dim, namespace version, chat model)
+that must match on read, and are evicted least-recently-used once the file
+exceeds settings.disk_cache_max_bytes.
+Reads are synchronous (a local indexed lookup) on a per-thread reader
+connection that never takes the writer's lock and gives up on a locked
+database after READ_BUSY_TIMEOUT_MS; writes, including last-access refreshes,
+are queued to a background thread and committed in batches so request paths
+never wait on fsync. Any SQLite error degrades to a cache miss.
+"""
+
+logger = logging.getLogger(__name__)
+
+# (bucket, key, value, version, expires_at or None); value None refreshes the access time
+_Write = Tuple[str, str, Optional[bytes], str, Optional[float]]
+
+# only refresh last-access times this stale, to keep reads write-free
+_TOUCH_AFTER_S = 60.0
+# readers run on request paths (often the event loop): a miss beats a stall
+READ_BUSY_TIMEOUT_MS = 50
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entries ("
+    " bucket TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+    " version TEXT NOT NULL, size INTEGER NOT NULL,"
+    " accessed REAL NOT NULL, expires REAL,"
+    " PRIMARY KEY (bucket, key))",
+    "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)",
+)
+
+
+class DiskCache:
+    """
+    Size-bounded, versioned key/value cache in a SQLite WAL file.
+    Safe to open from several processes; each process keeps its own connection.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._readers = threading.local()
+        self._queue: "queue.SimpleQueue[Optional[_Write]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._pending = 0
+        self._idle = threading.Condition()
+
+    # ── connection ────────────────────────────────────────────────────
+    def _connect(self, busy_timeout_ms: int = 5000) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(
+            self.path, timeout=busy_timeout_ms / 1000, check_same_thread=False, isolation_level=None
+        )
+        conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        # a forked worker must not reuse its parent's connection or writer thread
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = self._connect()
+            self._pid = os.getpid()
+            self._writer = None
+        return self._conn
+
+    def _reader(self) -> sqlite3.Connection:
+        # one read connection per thread, so lookups never queue behind the writer's transaction
+        readers = self._readers
+        if getattr(readers, "conn", None) is None or readers.pid != os.getpid() or readers.path != self.path:
+            readers.conn = self._connect(READ_BUSY_TIMEOUT_MS)
+            readers.pid = os.getpid()
+            readers.path = self.path
+        return readers.conn
+
+    # ── reads ─────────────────────────────────────────────────────────
+    def get(self, bucket: str, key: str, version: str) -> Optional[bytes]:
+        """
+        Return the value stored under (bucket, key) if its version matches and it has not expired.
+        """
+        return self.get_many(bucket, [key], version).get(key)
+
+    def get_many(self, bucket: str, keys: Iterable[str], version: str) -> Dict[str, bytes]:
+        """
+        Batched `get`: returns {key: value} for the keys that hit.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found: Dict[str, bytes] = {}
+        stale: List[str] = []
+        try:
+            conn = self._reader()
+            for i in range(0, len(keys), 500):
+                part = keys[i : i + 500]
+                rows = conn.execute(
+                    f"SELECT key, value, version, accessed, expires FROM entries "
+                    f"WHERE bucket = ? AND key IN ({','.join('?' * len(part))})",
+                    (bucket, *part),
+                ).fetchall()
+                for key, value, ver, accessed, expires in rows:
+                    if ver != version or (expires is not None and expires < now):
+                        continue
+                    found[key] = value
+                    if now - accessed > _TOUCH_AFTER_S:
+                        stale.append(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache read failed: {e}")
+            return {}
+        if stale:
+            self._enqueue([(bucket, k, None, version, None) for k in stale])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    # ── writes ────────────────────────────────────────────────────────
+    def put(self, bucket: str, key: str, value: bytes, version: str, ttl_s: Optional[float] = None) -> None:
+        """
+        Queue a write; it is committed by the background writer shortly after.
+        """
+        self.put_many(bucket, [(key, value)], version, ttl_s)
+
+    def put_many(
+        self, bucket: str, items: Iterable[Tuple[str, bytes]], version: str, ttl_s: Optional[float] = None
+    ) -> None:
+        expires = time.time() + ttl_s if ttl_s else None
+        self._enqueue([(bucket, key, value, version, expires) for key, value in items])
+
+    def _enqueue(self, writes: List[_Write]) -> None:
+        with self._lock:
+            self._connection()
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="disk-cache-writer", daemon=True)
+                self._writer.start()
+        for write in writes:
+            with self._idle:
+                self._pending += 1
+            self._queue.put(write)
+
+    def _write_loop(self) -> None:
+        last_evict = 0.0
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 512:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            now = time.time()
+            try:
+                with self._lock:
+                    conn = self._connection()
+                    try:
+                        conn.execute("BEGIN IMMEDIATE")
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO entries "
+                            "(bucket, key, value, version, size, accessed, expires) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            [(b, k, v, ver, len(v) + len(k), now, exp) for b, k, v, ver, exp in batch if v is not None],
+                        )
+                        conn.executemany(
+                            "UPDATE entries SET accessed = ? WHERE bucket = ? AND key = ?",
+                            [(now, b, k) for b, k, v, _, _ in batch if v is None],
+                        )
+                        conn.execute("COMMIT")
+                    except sqlite3.Error:
+                        # roll back on the connection that began the transaction, still under the lock
+                        if conn.in_transaction:
+                            conn.execute("ROLLBACK")
+                        raise
+                if now - last_evict > 1.0:
+                    self.evict()
+                    last_evict = now
+            except sqlite3.Error as e:
+                logger.warning(f"Disk cache write failed: {e}")
+            finally:
+                with self._idle:
+                    self._pending -= len(batch)
+                    self._idle.notify_all()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until queued writes are committed (tests, shutdown).
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout=timeout)
+
+    # ── maintenance ───────────────────────────────────────────────────
+    def evict(self) -> int:
+        """
+        Drop expired entries, then least-recently-used ones until the stored
+        bytes are under 90% of max_bytes. Returns the number of rows removed.
+        """
+        try:
+            with self._lock:
+                conn = self._connection()
+                removed = conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?", (time.time(),)).rowcount
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    target = total - int(self.max_bytes * 0.9)
+                    # cumulative size over the oldest entries finds the cut-off in one pass; rowid
+                    # breaks ties, since a whole write batch shares one access time
+                    removed += conn.execute(
+                        "DELETE FROM entries WHERE rowid IN ("
+                        " SELECT rowid FROM (SELECT rowid, size, SUM(size) OVER ("
+                        "  ORDER BY accessed, rowid ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS running"
+                        "  FROM entries) WHERE running - size < ?)",
+                        (target,),
+                    ).rowcount
+                return removed
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache eviction failed: {e}")
+            return 0
+
+    def delete_bucket(self, bucket: str) -> None:
+        self.flush()
+        try:
+            with self._lock:
+                self._connection().execute("DELETE FROM entries WHERE bucket = ?", (bucket,))
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache delete failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            with self._lock:
+                rows, size = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+        except sqlite3.Error:
+            rows = size = -1
+        return {"entries": rows, "bytes": size, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+_CACHE: Optional[DiskCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_disk_cache() -> Optional[DiskCache]:
+    """
+    Return the process-wide disk cache, or None when settings.disk_cache_enabled is off.
+    """
+    global _CACHE
+    if not settings.disk_cache_enabled:
+        return None
+    path = settings.disk_cache_path or os.path.join(settings.cache_dir, "disk_cache.sqlite3")
+    with _CACHE_LOCK:
+        if _CACHE is None or _CACHE.path != path:
+            _CACHE = DiskCache(path, settings.disk_cache_max_bytes)
+        return _CACHE
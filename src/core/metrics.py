@@ -0,0 +1,228 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+"""
+In-process metrics for the Jenius FX chatbot.
+Prometheus-style counters and histograms (text exposition served on /metrics)
+plus per-request stage timings collected through a context variable, so deep
+code such as retrieve_docs can record spans without threading a parameter.
+"""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _fmt_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if idx < len(self.buckets):
+                data[0][idx] += 1
+            data[1] += value
+            data[2] += 1
+
+    def count(self, **labels: str) -> int:
+        data = self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames))
+        return data[2] if data else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, n) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, c in zip(self.buckets, counts):
+                    cumulative += c
+                    le = _fmt_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _fmt_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {n}")
+                labels = _fmt_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "chat_stage_seconds",
+        "Duration of chat pipeline stages (lang_detect, embedding, vector_query, ...)",
+        labelnames=("stage",),
+    )
+)
+TTFT_SECONDS = REGISTRY.register(
+    Histogram("chat_ttft_seconds", "Time from request start to the first streamed token")
+)
+GENERATION_SECONDS = REGISTRY.register(
+    Histogram("chat_generation_seconds", "Total time spent streaming the LLM answer")
+)
+TOKENS_PER_SECOND = REGISTRY.register(
+    Histogram(
+        "chat_tokens_per_second",
+        "Streamed chunks per second after the first token",
+        buckets=(5, 10, 20, 30, 50, 75, 100, 150, 200, 400),
+    )
+)
+CACHE_EVENTS = REGISTRY.register(
+    Counter("chat_cache_events_total", "Cache lookups by cache and result", ("cache", "result"))
+)
+REQUESTS = REGISTRY.register(
+    Counter("chat_requests_total", "Chat requests by outcome", ("outcome",))
+)
+STREAM_OUTCOMES = REGISTRY.register(
+    Counter(
+        "chat_stream_outcomes_total",
+        "Chat streams by how they ended (completed, disconnected, timeout, token_cap, error)",
+        ("outcome",),
+    )
+)
+LLM_TOKENS = REGISTRY.register(
+    Counter(
+        "chat_llm_tokens_total",
+        "LLM tokens reported by the provider: cached and uncached prompt tokens, completion tokens",
+        ("kind",),
+    )
+)
+RETRIEVAL_STRATEGY = REGISTRY.register(
+    Counter(
+        "chat_retrieval_strategy_total",
+        "Speculative retrieval: strategy whose results were used (or none/deadline)",
+        ("strategy",),
+    )
+)
+
+
+class RequestTimings:
+    """
+    Stage durations (seconds) for one chat request, for the optional SSE trailer.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = round(self.stages.get(stage, 0.0) + seconds, 6)
+
+    def count(self, name: str, amount: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def to_dict(self) -> dict:
+        return {"stages": dict(self.stages), **self.counters}
+
+
+_CURRENT: ContextVar[Optional[RequestTimings]] = ContextVar("chat_request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _CURRENT.get()
+
+
+def bind_timings(timings: RequestTimings):
+    """
+    Make `timings` the collector for spans in the current context; returns a reset token.
+    """
+    return _CURRENT.set(timings)
+
+
+def unbind_timings(token) -> None:
+    try:
+        _CURRENT.reset(token)
+    except ValueError:
+        # reset from a different context (e.g. generator closed elsewhere)
+        _CURRENT.set(None)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _CURRENT.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time the enclosed block as `stage` (histogram + current request timings).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    result = "hit" if hit else "miss"
+    CACHE_EVENTS.inc(cache=cache, result=result)
+    timings = _CURRENT.get()
+    if timings is not None:
+        timings.count(f"{cache}_cache_{result}")
@@ -0,0 +1,40 @@
+import os
+import time
+
+from core.settings import settings
+
+"""
+Per-namespace version stamps for the Jenius FX chatbot.
+Ingestion bumps a namespace's stamp file under settings.cache_dir; caches that
+hold data derived from a namespace (answers, retrieval results) include its
+version in their keys, so every process sharing the directory sees a
+re-ingest at once.
+"""
+
+
+def _stamp_path(namespace: str) -> str:
+    return os.path.join(settings.cache_dir, "ns_versions", f"{namespace or '_'}.stamp")
+
+
+def namespace_version(namespace: str) -> int:
+    """
+    Return the current version of `namespace` (mtime of its stamp file, 0 if never bumped).
+    """
+    try:
+        return os.stat(_stamp_path(namespace)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def bump_namespace_version(namespace: str) -> None:
+    """
+    Mark `namespace` as re-ingested; data cached against older versions becomes stale.
+    """
+    path = _stamp_path(namespace)
+    previous = namespace_version(namespace)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(str(time.time_ns()))
+    # make sure the version moves even on coarse-grained filesystem clocks
+    version = max(time.time_ns(), previous + 1)
+    os.utime(path, ns=(version, version))
@@ -1,8 +1,16 @@
 import os
+import threading
+from typing import List, Literal, Optional
+
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
-load_dotenv()  # .env is parsed exactly once
+"""
+Application settings. Nothing is read or validated at import: `.env` is parsed
+and the environment validated on first use of `settings` (or an explicit
+`get_settings()` call), so importing modules stays cheap and side-effect free.
+"""
+
 
 class Settings(BaseSettings):
     """
@@ -12,6 +20,62 @@ class Settings(BaseSettings):
     - pinecone_index: Pinecone index name
     - embed_model: Embedding model name
     - embed_dim: Embedding dimension
+    - vector_backend: "pinecone" (remote) or "local" (in-process mirror of the namespaces)
+    - local_index_dir: Directory holding the local vector index files
+    - manifest_dir: Directory holding per-namespace ingest manifests
+    - lexical_index_dir: Directory holding the per-namespace BM25 indexes
+    - parsed_dir: Directory holding the parsed Q&A artifact of each FAQ PDF
+    - hybrid_retrieval: Fuse BM25 and dense results in retrieve_docs
+    - lexical_confident_overlap: Query/FAQ-question term overlap that skips dense retrieval
+    - lexical_confident_margin: Required BM25 ratio of the best hit over the runner-up
+    - embed_cache_max_bytes: Byte budget of the in-process query-embedding cache
+    - session_backend: "memory" or "sqlite" storage for server-side chat sessions
+    - session_db_path: SQLite file used when session_backend is "sqlite"
+    - session_max_entries: Max sessions kept by the in-memory store (LRU)
+    - history_token_budget: Tokens of recent history sent verbatim to the LLM
+    - summary_max_tokens: Target length of the running summary of older turns
+    - retrieval_k: Number of chunks retrieved per query before context packing
+    - context_token_budget: Max tokens of retrieved context placed in the prompt
+    - context_dedup_threshold: Similarity above which a retrieved chunk is dropped as a near-duplicate
+    - http_max_connections: Size of the shared HTTP connection pool for OpenAI
+    - http_max_keepalive: Idle keep-alive connections kept in that pool
+    - http_timeout_s: Read timeout for OpenAI HTTP calls
+    - pinecone_pool_threads: Connection pool threads of the Pinecone index client
+    - warmup_on_startup: Warm up clients and indexes in the API lifespan
+    - cache_dir: Directory for local cache state shared across processes
+    - answer_cache_max_entries: Max answers kept in the response cache (0 disables it)
+    - answer_cache_ttl_s: Seconds a cached answer stays valid
+    - coalesce_requests: Share one retrieval/generation between identical in-flight questions
+    - max_concurrent_streams: Chat streams served at once per worker
+    - max_queued_streams: Requests allowed to wait for a slot before new ones get 429
+    - queue_timeout_s: Seconds a queued request waits before it gets 503
+    - stream_max_duration_s: Longest a chat stream may run before it is cut off
+    - stream_max_tokens: Streamed chunks (≈ tokens) after which an answer is cut off (0: no cap)
+    - sse_flush_interval_ms: Max time token chunks are held back to share one SSE frame (0: a frame per chunk)
+    - sse_flush_bytes: Buffered bytes that flush an SSE frame before the interval ends
+    - retrieve_batch_workers: Concurrent vector queries per /retrieve-batch call
+    - retrieve_batch_max_queries: Largest batch /retrieve-batch accepts
+    - answer_store_enabled: Answer known FAQ questions from the precomputed answer store
+    - answer_store_dir: Directory of the precomputed answer store
+    - answer_store_min_similarity: Question-embedding cosine similarity needed for a stored answer
+    - fx_provider: FX rate source ("file" or "http")
+    - fx_rates_file: Provider document for the file provider
+    - fx_rates_url: Provider endpoint for the http provider
+    - fx_snapshot_path: Last fetched rates, loaded at startup
+    - fx_refresh_interval_s: Seconds between background rate refreshes
+    - fx_max_age_s: Rates older than this are not quoted
+    - fx_answers_enabled: Answer rate/conversion questions from the FX rate table
+    - tool_calling: Let the chat model call tools (services/function_handler.py)
+    - tool_timeout_s: Default per-tool-call timeout
+    - tool_max_rounds: Max model turns that may request tools before it must answer
+    - fee_schedule_file: Fee schedule used by the calculate_fee tool
+    - retrieval_speculative: Issue the filtered, fallback and cross-namespace queries concurrently
+    - retrieval_deadline_s: Max wait for vector queries; the best result in by then is used
+    - retrieval_extra_namespaces: Namespaces also searched (unfiltered) as a last-resort strategy
+    - disk_cache_enabled: Keep embeddings, retrieval results and answers in the shared SQLite cache
+    - disk_cache_path: SQLite file of that cache (default: <cache_dir>/disk_cache.sqlite3)
+    - disk_cache_max_bytes: Stored bytes above which least-recently-used entries are evicted
+    - retrieval_cache_ttl_s: Seconds a cached retrieval result stays valid
     """
 
     bati_openai_api_key: str
@@ -19,12 +83,104 @@ class Settings(BaseSettings):
     pinecone_index: str = "xsell-chatbot"
     embed_model: str = "text-embedding-3-large"
     embed_dim: int = 3072
+    vector_backend: Literal["pinecone", "local"] = "pinecone"
+    local_index_dir: str = "src/data/processed/index"
+    manifest_dir: str = "src/data/processed/manifests"
+    lexical_index_dir: str = "src/data/processed/lexical"
+    parsed_dir: str = "src/data/processed/parsed"
+    hybrid_retrieval: bool = True
+    lexical_confident_overlap: float = 0.75
+    lexical_confident_margin: float = 1.5
+    embed_cache_max_bytes: int = 64 * 1024 * 1024
+    session_backend: Literal["memory", "sqlite"] = "memory"
+    session_db_path: str = "src/data/cache/sessions.db"
+    session_max_entries: int = 10000
+    history_token_budget: int = 1500
+    summary_max_tokens: int = 300
+    retrieval_k: int = 4
+    context_token_budget: int = 800
+    context_dedup_threshold: float = 0.8
+    http_max_connections: int = 200
+    http_max_keepalive: int = 50
+    http_timeout_s: float = 60.0
+    pinecone_pool_threads: int = 8
+    warmup_on_startup: bool = True
+    cache_dir: str = "src/data/cache"
+    answer_cache_max_entries: int = 512
+    answer_cache_ttl_s: float = 3600.0
+    coalesce_requests: bool = True
+    max_concurrent_streams: int = 64
+    max_queued_streams: int = 128
+    queue_timeout_s: float = 5.0
+    stream_max_duration_s: float = 120.0
+    stream_max_tokens: int = 2048
+    sse_flush_interval_ms: float = 40.0
+    sse_flush_bytes: int = 1024
+    retrieve_batch_workers: int = 8
+    retrieve_batch_max_queries: int = 1000
+    answer_store_enabled: bool = True
+    answer_store_dir: str = "src/data/processed/answers"
+    answer_store_min_similarity: float = 0.95
+    fx_provider: Literal["file", "http"] = "file"
+    fx_rates_file: str = "src/data/fx/rates.json"
+    fx_rates_url: Optional[str] = None
+    fx_snapshot_path: str = "src/data/cache/fx_snapshot.json"
+    fx_refresh_interval_s: float = 300.0
+    fx_max_age_s: float = 86400.0
+    fx_answers_enabled: bool = True
+    tool_calling: bool = False
+    tool_timeout_s: float = 5.0
+    tool_max_rounds: int = 3
+    fee_schedule_file: str = "src/data/fx/fees.json"
+    retrieval_speculative: bool = True
+    retrieval_deadline_s: float = 2.0
+    retrieval_extra_namespaces: List[str] = []
+    disk_cache_enabled: bool = True
+    disk_cache_path: Optional[str] = None
+    disk_cache_max_bytes: int = 512 * 1024 * 1024
+    retrieval_cache_ttl_s: float = 86400.0
 
     class Config:  # allow BATI_OPENAI_API_KEY in .env
         env_prefix = ""
         case_sensitive = False
 
-settings = Settings()
+_SETTINGS: Optional[Settings] = None
+_SETTINGS_LOCK = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """
+    Load `.env`, validate the environment and return the process-wide Settings.
+    """
+    global _SETTINGS
+    if _SETTINGS is None:
+        with _SETTINGS_LOCK:
+            if _SETTINGS is None:
+                load_dotenv()  # .env is parsed exactly once
+                loaded = Settings()
+                # Bridge → libraries that look for OPENAI_API_KEY
+                os.environ.setdefault("OPENAI_API_KEY", loaded.bati_openai_api_key)
+                _SETTINGS = loaded
+    return _SETTINGS
+
+
+class _LazySettings:
+    """
+    Module-level `settings` handle that loads on first attribute access and
+    forwards reads and writes (including test patches) to the real Settings.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+    def __delattr__(self, name):
+        delattr(get_settings(), name)
+
+    def __repr__(self):
+        return repr(get_settings()) if _SETTINGS is not None else "<settings (not loaded)>"
+
 
-# Bridge → libraries that look for OPENAI_API_KEY
-os.environ.setdefault("OPENAI_API_KEY", settings.bati_openai_api_key)
+settings = _LazySettings()
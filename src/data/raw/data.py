@@ -1,10 +1,17 @@
 import os
 
-import pandas as pd
-from datasets import load_dataset
+"""
+Download the llama-2 arXiv papers dataset to a local CSV (one-off utility).
+
+    python src/data/raw/data.py
+"""
 
 
 def get_dataset():
+    # pandas/datasets are only needed when this script actually runs
+    import pandas as pd
+    from datasets import load_dataset
+
     csv_path = "llama2_papers.csv"
 
     # Check if CSV file exists
@@ -24,5 +31,6 @@ def get_dataset():
     return df
 
 
-# Load the dataset
-panda = get_dataset()
+if __name__ == "__main__":
+    # Load the dataset
+    panda = get_dataset()
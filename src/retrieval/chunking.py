@@ -0,0 +1,342 @@
+import argparse
+import hashlib
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import tqdm
+
+from retrieval.embeddings import get_embeddings
+from retrieval.lexical_index import rebuild_lexical_index
+from retrieval.local_index import get_local_index
+from retrieval.manifest import ManifestDiff, content_hash, diff_chunks, load_manifest, save_manifest
+from retrieval.pdf_parser import PARSE_WORKERS, QUESTION_MIN, assemble_qna, load_qna, page_lines
+from retrieval.vector_store import get_raw_pinecone_index
+from services.answer_cache import invalidate_namespace
+from services.answer_store import precompute_answers, prune_answers
+from services.llm import CHAT_MODEL
+from services.rag_services import canonical_answer
+
+"""
+PDF FAQ chunking and ingestion pipeline for the Jenius FX chatbot.
+Streams Q&A blocks out of each PDF, embeds batches on a bounded worker pool and
+upserts them on a second pool, so embedding and upsert overlap and wall-clock
+time scales with concurrency instead of batch count. PDFs are parsed once per
+file content (retrieval/pdf_parser.py); re-runs read the cached Q&A artifact.
+
+With --precompute-answers, a final stage generates a canonical answer per FAQ
+question into the answer store (services/answer_store.py); unchanged questions
+keep their stored answer.
+
+Run:
+    PYTHONPATH=src python3 -m retrieval.chunking
+    PYTHONPATH=src python3 -m retrieval.chunking --precompute-answers
+    PYTHONPATH=src python3 -m retrieval.chunking --job src/data/raw/FAQ_FCY_Jenius_en.pdf:en:en:<url>
+"""
+
+logger = logging.getLogger(__name__)
+
+BATCH = 32
+EMBED_WORKERS = 4
+UPSERT_WORKERS = 4
+ANSWER_WORKERS = 4
+MAX_RETRIES = 3
+
+# (uid, text, metadata)
+Chunk = Tuple[str, str, dict]
+
+
+class IngestJob(NamedTuple):
+    pdf_path: str
+    lang: str
+    namespace: str
+    source_url: str
+
+
+DEFAULT_JOBS = [
+    IngestJob(
+        "src/data/raw/FAQ_FCY_Jenius_en.pdf",
+        "en",
+        "en",
+        "https://drive.google.com/uc?export=download&id=1-NQ2jSg2J5hwqIIoljCjSqQV4BPGh2R0",
+    ),
+    IngestJob(
+        "src/data/raw/FAQ_FCY_Jenius_id.pdf",
+        "id",
+        "id",
+        "https://drive.google.com/uc?export=download&id=1mFmcDTmzeSwso-apDS8rLAKcozNvdmjJ",
+    ),
+]
+
+
+# ───────────────────────── 1 ─ PARSING ─────────────────────────────────
+def iter_qna_blocks(doc, question_min=QUESTION_MIN):
+    """
+    Yield (question, answer, page_num) tuples from an open PDF, serially.
+    Ingestion goes through `pdf_parser.load_qna`, which parallelizes this and
+    caches the result; see retrieval/pdf_parser.py for the parsing rules.
+    """
+    pages = (page_lines(doc.load_page(i)) for i in range(doc.page_count))
+    yield from assemble_qna(pages, question_min)
+
+
+def iter_chunks(job: IngestJob, parse_workers: int = PARSE_WORKERS) -> Iterator[Chunk]:
+    """
+    Stream (uid, text, metadata) chunks for one PDF job.
+    """
+    try:
+        records = load_qna(job.pdf_path, workers=parse_workers)
+    except Exception as e:
+        logger.error(f"Failed to parse PDF file: {job.pdf_path}. Error: {e}")
+        return
+    for q, a, pg in records:
+        uid = hashlib.sha1(a.encode()).hexdigest()
+        meta = {
+            "source": f"{job.source_url}#page={pg}",
+            "lang": job.lang,
+            "question": q,
+            "text": a,
+        }
+        yield uid, a, meta
+
+
+# ───────────────────────── 2 ─ PIPELINE ────────────────────────────────
+def _with_retry(fn: Callable, *args, retries: int = MAX_RETRIES, **kwargs):
+    """
+    Call `fn`, retrying with exponential backoff (0.5s, 1s, 2s, ...) on failure.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = 0.5 * 2**attempt
+            logger.warning(f"{getattr(fn, '__name__', fn)} failed ({e}); retrying in {delay}s")
+            time.sleep(delay)
+
+
+def _batched(chunks: Iterator[Chunk], size: int) -> Iterator[List[Chunk]]:
+    batch: List[Chunk] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_job(
+    job: IngestJob,
+    embedder=None,
+    index=None,
+    batch_size: int = BATCH,
+    embed_workers: int = EMBED_WORKERS,
+    upsert_workers: int = UPSERT_WORKERS,
+    parse_workers: int = PARSE_WORKERS,
+) -> ManifestDiff:
+    """
+    Incrementally sync `job.namespace` with its PDF.
+    New chunks are embedded and upserted concurrently (at most
+    2 × embed_workers batches in flight, which bounds memory), chunks with
+    changed metadata get a metadata-only update, and stale IDs are deleted.
+    Returns the manifest diff that was applied.
+    """
+    embedder = embedder or get_embeddings()
+    index = index or get_raw_pinecone_index()
+    ns = job.namespace
+    manifest = load_manifest(ns)
+    lock = threading.Lock()
+    inflight = threading.BoundedSemaphore(max(1, embed_workers) * 2)
+    # load_qna returns the whole parsed document, so diffing it up front costs no overlap
+    chunks = list(iter_chunks(job, parse_workers))
+    diff = diff_chunks(manifest, chunks)
+    # every current chunk (first occurrence of each ID), for the lexical index
+    first: Dict[str, dict] = {}
+    for uid, _, meta in chunks:
+        first.setdefault(uid, meta)
+    records: List[Tuple[str, dict]] = list(first.items())
+    local_items: List[Tuple[str, List[float], dict]] = []
+    failed = 0
+
+    def upsert(items):
+        try:
+            _with_retry(index.upsert, items, namespace=ns)
+            with lock:
+                local_items.extend(items)
+                manifest.update({uid: content_hash(meta["text"], meta) for uid, _, meta in items})
+        finally:
+            inflight.release()
+
+    def embed(batch: List[Chunk], upsert_pool: ThreadPoolExecutor) -> Future:
+        try:
+            vecs = _with_retry(embedder.embed_documents, [txt for _, txt, _ in batch])
+        except BaseException:
+            inflight.release()
+            raise
+        items = [(uid, vec, meta) for (uid, _, meta), vec in zip(batch, vecs)]
+        return upsert_pool.submit(upsert, items)
+
+    with ThreadPoolExecutor(embed_workers, thread_name_prefix="embed") as embed_pool, \
+            ThreadPoolExecutor(upsert_workers, thread_name_prefix="upsert") as upsert_pool:
+        embed_futures = []
+        progress = tqdm.tqdm(desc=f"ingest[{ns}]", unit="chunk")
+        # only new chunks are embedded
+        for batch in _batched(iter(diff.new), batch_size):
+            inflight.acquire()  # backpressure: block the parser while the pools are full
+            embed_futures.append(embed_pool.submit(embed, batch, upsert_pool))
+            progress.update(len(batch))
+        progress.close()
+        for f in embed_futures:
+            try:
+                f.result().result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to embed or upsert a batch for namespace '{ns}': {e}")
+
+    for uid, txt, meta in diff.changed:
+        try:
+            _with_retry(index.update, id=uid, set_metadata=meta, namespace=ns)
+            get_local_index(ns).update_metadata(uid, meta)
+            manifest[uid] = content_hash(txt, meta)
+        except Exception as e:
+            logger.error(f"Failed to update metadata for {uid}: {e}")
+
+    stale = diff.stale
+    try:
+        for i in range(0, len(stale), 1000):
+            _with_retry(index.delete, ids=stale[i : i + 1000], namespace=ns)
+        for uid in stale:
+            manifest.pop(uid, None)
+    except Exception as e:
+        logger.error(f"Failed to delete stale vectors: {e}")
+
+    # keep the local mirror in step with Pinecone (one write for the whole job)
+    local = get_local_index(ns)
+    local.upsert(local_items)
+    if stale:
+        local.delete(ids=stale)
+
+    save_manifest(ns, manifest)
+    rebuild_lexical_index(ns, records)
+    logger.info(
+        f"Ingested {job.pdf_path} into namespace '{ns}': {diff.summary()}"
+        + (f", {failed} failed batches" if failed else "")
+    )
+    if diff.new or diff.changed or diff.stale:
+        # cached answers were built from the previous namespace contents
+        invalidate_namespace(ns)
+        # stored answers too: without --precompute-answers nothing else would replace them
+        try:
+            prune_answers(ns, chunks, CHAT_MODEL)
+        except Exception as e:
+            logger.error(f"Failed to prune stored answers for namespace '{ns}': {e}")
+    return diff
+
+
+def precompute_job_answers(job: IngestJob, embedder=None, workers: int = ANSWER_WORKERS) -> None:
+    """
+    Generate (or reuse) the stored canonical answer for every FAQ question of `job`.
+    """
+    embedder = embedder or get_embeddings()
+    chunks = list({uid: (uid, txt, meta) for uid, txt, meta in iter_chunks(job)}.values())
+    try:
+        precompute_answers(job.namespace, chunks, embedder, canonical_answer, CHAT_MODEL, workers)
+    except Exception as e:
+        logger.error(f"Failed to precompute answers for namespace '{job.namespace}': {e}")
+
+
+def run_jobs(
+    jobs: Sequence[IngestJob],
+    precompute: bool = False,
+    answer_workers: int = ANSWER_WORKERS,
+    **kwargs,
+) -> List[ManifestDiff]:
+    """
+    Run several ingest jobs with shared embedder and index clients, optionally
+    followed by the answer-store stage.
+    """
+    embedder = kwargs.pop("embedder", None) or get_embeddings()
+    index = kwargs.pop("index", None) or get_raw_pinecone_index()
+    diffs = [run_job(job, embedder=embedder, index=index, **kwargs) for job in jobs]
+    if precompute:
+        for job in jobs:
+            precompute_job_answers(job, embedder=embedder, workers=answer_workers)
+    return diffs
+
+
+def delete_namespace(namespace: str, index=None) -> None:
+    """
+    Wipe a namespace in Pinecone, the local mirror and the manifest.
+    """
+    try:
+        index = index or get_raw_pinecone_index()
+        index.delete(delete_all=True, namespace=namespace)
+        get_local_index(namespace).delete(delete_all=True)
+        save_manifest(namespace, {})
+        rebuild_lexical_index(namespace, [])
+        invalidate_namespace(namespace)
+        logger.info(f"Deleted all vectors in namespace '{namespace}'")
+    except Exception as e:
+        logger.error(f"Failed to delete vectors: {e}")
+
+
+# ───────────────────────── 3 ─ CLI ─────────────────────────────────────
+def _parse_job(spec: str) -> IngestJob:
+    # pdf:lang:namespace:source_url  (the URL may itself contain ':')
+    parts = spec.split(":", 3)
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("expected PDF:LANG:NAMESPACE:SOURCE_URL")
+    return IngestJob(*parts)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    parser = argparse.ArgumentParser(description="Ingest FAQ PDFs into the vector index.")
+    parser.add_argument(
+        "--job",
+        action="append",
+        type=_parse_job,
+        help="PDF:LANG:NAMESPACE:SOURCE_URL (repeatable; defaults to the en/id FAQ PDFs)",
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH)
+    parser.add_argument("--embed-workers", type=int, default=EMBED_WORKERS)
+    parser.add_argument("--upsert-workers", type=int, default=UPSERT_WORKERS)
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS)
+    parser.add_argument(
+        "--precompute-answers",
+        action="store_true",
+        help="also generate the canonical answer for every FAQ question (answer store)",
+    )
+    parser.add_argument("--answer-workers", type=int, default=ANSWER_WORKERS)
+    parser.add_argument(
+        "--delete-all", action="store_true", help="wipe the jobs' namespaces instead of ingesting"
+    )
+    args = parser.parse_args(argv)
+    jobs = args.job or DEFAULT_JOBS
+
+    if args.delete_all:
+        for job in jobs:
+            delete_namespace(job.namespace)
+        return
+    run_jobs(
+        jobs,
+        batch_size=args.batch_size,
+        embed_workers=args.embed_workers,
+        upsert_workers=args.upsert_workers,
+        parse_workers=args.parse_workers,
+        precompute=args.precompute_answers,
+        answer_workers=args.answer_workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from core.disk_cache import get_disk_cache
+from core.metrics import record_cache
+from core.settings import settings
+from services.clients import get_async_http_client, get_http_client
+
+"""
+Embedding utilities for the Jenius FX chatbot.
+Wraps the OpenAI embedder in an in-process cache so repeated queries (and the
+unfiltered fallback search in `retrieve_docs`) never pay a second network call.
+Misses fall through to the shared disk cache (core/disk_cache.py), so vectors
+survive restarts and are computed once per host rather than once per worker;
+async callers run that SQLite lookup on a worker thread, off the event loop.
+Async calls go to an embedder bound to the running loop's pooled HTTP client.
+"""
+
+logger = logging.getLogger(__name__)
+
+_WS = re.compile(r"\s+")
+
+CacheKey = Tuple[str, int, str]
+
+# one OpenAI embedder per async HTTP client (the pool is loop-bound), LRU-bounded
+# for the same reason as services.llm._MODELS
+ASYNC_EMBEDDERS_MAX = 32
+_ASYNC_EMBEDDERS: "OrderedDict[int, Tuple[Any, Embeddings]]" = OrderedDict()
+_ASYNC_EMBEDDERS_LOCK = threading.Lock()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse whitespace so formatting-only differences share one cache entry.
+    """
+    return _WS.sub(" ", text).strip()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain `Embeddings` that memoizes vectors of an underlying embedder.
+    Vectors are kept as float32 NumPy arrays (4 bytes/dim instead of a Python
+    float object per dim) and evicted least-recently-used by total byte size.
+    With persistent=True, misses are looked up in (and new vectors written to) the disk cache.
+    `async_base`, if given, returns the embedder to use for async calls.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        model: str,
+        dim: int,
+        max_bytes: int = 64 * 1024 * 1024,
+        persistent: bool = False,
+        async_base: Optional[Callable[[], Embeddings]] = None,
+    ):
+        self.base = base
+        self.async_base = async_base
+        self.persistent = persistent
+        self.model = model
+        self.dim = dim
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+
+    # ── cache primitives ──────────────────────────────────────────────
+    def _key(self, text: str) -> CacheKey:
+        return self.model, self.dim, normalize_text(text)
+
+    def _get(self, key: CacheKey) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._cache.get(key)
+            if vec is None:
+                self.misses += 1
+            else:
+                self._cache.move_to_end(key)
+                self.hits += 1
+        record_cache("embedding", vec is not None)
+        return vec
+
+    def _put(self, key: CacheKey, vector: List[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        if vec.nbytes > self.max_bytes:
+            return vec
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+            self._cache[key] = vec
+            self._nbytes += vec.nbytes
+            while self._nbytes > self.max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+        return vec
+
+    # ── disk tier ─────────────────────────────────────────────────────
+    @staticmethod
+    def _disk_key(key: CacheKey) -> str:
+        return hashlib.sha1(key[2].encode()).hexdigest()
+
+    def _disk_version(self) -> str:
+        return f"{self.model}:{self.dim}"
+
+    def _load(self, keys: List[CacheKey]) -> Dict[CacheKey, np.ndarray]:
+        """
+        Look `keys` up in the disk cache, promoting hits into memory.
+        """
+        disk = get_disk_cache() if self.persistent else None
+        if disk is None or not keys:
+            return {}
+        by_disk_key = {self._disk_key(k): k for k in keys}
+        blobs = disk.get_many("embedding", by_disk_key, self._disk_version())
+        loaded = {}
+        for disk_key, blob in blobs.items():
+            vec = np.frombuffer(blob, dtype=np.float32)
+            if vec.shape[0] == self.dim:
+                loaded[by_disk_key[disk_key]] = self._put(by_disk_key[disk_key], vec)
+        for key in keys:
+            record_cache("disk_embedding", key in loaded)
+        return loaded
+
+    async def _aload(self, keys: List[CacheKey]) -> Dict[CacheKey, np.ndarray]:
+        if not keys or not self.persistent or get_disk_cache() is None:
+            return {}
+        return await asyncio.to_thread(self._load, keys)
+
+    def _persist(self, vectors: Dict[CacheKey, np.ndarray]) -> None:
+        disk = get_disk_cache() if self.persistent else None
+        if disk is not None and vectors:
+            disk.put_many(
+                "embedding",
+                [(self._disk_key(k), v.tobytes()) for k, v in vectors.items()],
+                self._disk_version(),
+            )
+
+    def _split_memory(self, texts: List[str]) -> Tuple[List[CacheKey], Dict[int, np.ndarray], List[int]]:
+        keys = [self._key(t) for t in texts]
+        found: Dict[int, np.ndarray] = {}
+        missing: List[int] = []
+        for i, key in enumerate(keys):
+            vec = self._get(key)
+            if vec is None:
+                missing.append(i)
+            else:
+                found[i] = vec
+        return keys, found, missing
+
+    @staticmethod
+    def _take(keys: List[CacheKey], found: Dict[int, np.ndarray], missing: List[int], loaded: dict) -> List[int]:
+        for i in missing:
+            if keys[i] in loaded:
+                found[i] = loaded[keys[i]]
+        return [i for i in missing if i not in found]
+
+    def _split(self, texts: List[str]) -> Tuple[List[CacheKey], Dict[int, np.ndarray], List[int]]:
+        keys, found, missing = self._split_memory(texts)
+        if missing:
+            missing = self._take(keys, found, missing, self._load([keys[i] for i in missing]))
+        return keys, found, missing
+
+    async def _asplit(self, texts: List[str]) -> Tuple[List[CacheKey], Dict[int, np.ndarray], List[int]]:
+        keys, found, missing = self._split_memory(texts)
+        if missing:
+            missing = self._take(keys, found, missing, await self._aload([keys[i] for i in missing]))
+        return keys, found, missing
+
+    def _fill(self, keys: List[CacheKey], found: Dict[int, np.ndarray], missing: List[int], fresh: dict) -> None:
+        stored = {}
+        for i in missing:
+            found[i] = stored[keys[i]] = self._put(keys[i], fresh[keys[i][2]])
+        self._persist(stored)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._nbytes = 0
+
+    def abase(self) -> Embeddings:
+        """
+        The embedder async calls go to: `async_base()` if set, else `base`.
+        """
+        return self.async_base() if self.async_base is not None else self.base
+
+    # ── Embeddings interface ──────────────────────────────────────────
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed `texts`, sending only cache misses (deduplicated) to the base embedder.
+        """
+        keys, found, missing = self._split(texts)
+        if missing:
+            todo = list(dict.fromkeys(keys[i][2] for i in missing))
+            self._fill(keys, found, missing, dict(zip(todo, self.base.embed_documents(todo))))
+        return [found[i].tolist() for i in range(len(texts))]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vec = self._get(key)
+        if vec is None:
+            vec = self._load([key]).get(key)
+        if vec is None:
+            vec = self._put(key, self.base.embed_query(key[2]))
+            self._persist({key: vec})
+        return vec.tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await self._asplit(texts)
+        if missing:
+            todo = list(dict.fromkeys(keys[i][2] for i in missing))
+            self._fill(keys, found, missing, dict(zip(todo, await self.abase().aembed_documents(todo))))
+        return [found[i].tolist() for i in range(len(texts))]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vec = self._get(key)
+        if vec is None:
+            vec = (await self._aload([key])).get(key)
+        if vec is None:
+            vec = self._put(key, await self.abase().aembed_query(key[2]))
+            self._persist({key: vec})
+        return vec.tolist()
+
+
+_EMBEDDINGS: Optional[CachedEmbeddings] = None
+_EMBEDDINGS_LOCK = threading.Lock()
+
+
+def _openai_embeddings(http_async_client=None) -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings  # slow import, deferred to first use
+
+    return OpenAIEmbeddings(
+        model=settings.embed_model, http_client=get_http_client(), http_async_client=http_async_client
+    )
+
+
+def _async_openai_embeddings() -> Embeddings:
+    """
+    Return the OpenAI embedder bound to the running loop's pooled async HTTP client.
+    """
+    client = get_async_http_client()
+    key = id(client)
+    with _ASYNC_EMBEDDERS_LOCK:
+        entry = _ASYNC_EMBEDDERS.get(key)
+        if entry is not None and entry[0] is client:
+            _ASYNC_EMBEDDERS.move_to_end(key)
+            return entry[1]
+        embedder = _openai_embeddings(client)
+        _ASYNC_EMBEDDERS[key] = (client, embedder)
+        _ASYNC_EMBEDDERS.move_to_end(key)
+        while len(_ASYNC_EMBEDDERS) > ASYNC_EMBEDDERS_MAX:
+            _ASYNC_EMBEDDERS.popitem(last=False)
+        return embedder
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """
+    Return the process-wide cached OpenAI embedder for `settings.embed_model`.
+    """
+    global _EMBEDDINGS
+    with _EMBEDDINGS_LOCK:
+        if _EMBEDDINGS is None:
+            _EMBEDDINGS = CachedEmbeddings(
+                _openai_embeddings(),
+                model=settings.embed_model,
+                dim=settings.embed_dim,
+                max_bytes=settings.embed_cache_max_bytes,
+                persistent=True,
+                async_base=_async_openai_embeddings,
+            )
+            logger.info(f"Created cached embeddings for model '{settings.embed_model}'")
+        return _EMBEDDINGS
@@ -1,16 +1,12 @@
-# PYTHONPATH=. python3 -m src.scripts.ingest_pdf_faq_id
-import hashlib
+# PYTHONPATH=.:src python3 -m src.retrieval.ingest_scripts.ingest_pdf_faq_en
+"""
+Ingest the English FCY FAQ PDF into the "en" namespace.
+Thin wrapper around the shared pipeline in retrieval/chunking.py.
+"""
 import logging
-import math
-import re
 import sys
 
-import fitz
-import pinecone
-import tqdm
-from langchain_openai import OpenAIEmbeddings
-
-from src.retrieval.vector_store import get_raw_pinecone_index  # your helper
+from src.retrieval.chunking import IngestJob, delete_namespace, run_jobs
 
 # Setup logging
 logging.basicConfig(
@@ -26,104 +22,15 @@ SOURCE_URL = (
     "&id=1-NQ2jSg2J5hwqIIoljCjSqQV4BPGh2R0"
 )
 
-QUESTION_MIN = 13.5  # ≥14-pt is a question
-ANSWER_MAX = 13.49  # ≤13.5-pt is body
-
-embedder = OpenAIEmbeddings(model="text-embedding-3-large")
-index = get_raw_pinecone_index()
-BATCH = 100
-
-
-def iter_qna_blocks(doc, question_min=13.5):
-    """
-    Yield (question, answer, page_num) tuples.
-    Any line whose average font-size >= question_min is considered part of the question.
-    We only yield when the question ends with '?' and we've collected its answers.
-    """
-    pending_q, pending_a, page_num = None, [], None
-
-    for page_idx in range(doc.page_count):
-        page = doc.load_page(page_idx)
-        blocks = page.get_text("dict")["blocks"]
-
-        for b in blocks:
-            for line in b["lines"]:
-                # 1) collapse all spans on this line
-                spans = [s for s in line["spans"] if s["text"].strip()]
-                line_text = " ".join(s["text"].strip() for s in spans)
-                if not line_text:
-                    continue
-                # 2) compute an average font-size for the line
-                avg_size = sum(s["size"] for s in spans) / len(spans)
-
-                if avg_size >= question_min:
-                    # it's a question line
-                    # if we already had a complete Q (ending in '?'), flush it
-                    if pending_q and pending_q.strip().endswith("?"):
-                        yield pending_q, " ".join(pending_a), page_num
-                        pending_a = []
-                        # start brand-new question
-                        pending_q = line_text
-                        page_num = page_idx + 1
-                    else:
-                        # accumulate multi-line question
-                        pending_q = (
-                            (pending_q + " " + line_text) if pending_q else line_text
-                        )
-                        page_num = page_idx + 1
-                else:
-                    # everything smaller is answer content
-                    if pending_q is not None:
-                        pending_a.append(line_text)
-
-    # flush the very last Q&A if it ended in '?'
-    if pending_q and pending_q.strip().endswith("?"):
-        yield pending_q, " ".join(pending_a), page_num
-
-
-def build_vectors(pdf_path):
-    try:
-        doc = fitz.open(pdf_path)
-    except Exception as e:
-        logger.error(f"Failed to open PDF file: {pdf_path}. Error: {e}")
-        return
-    for q, a, pg in iter_qna_blocks(doc):
-        chunk = a
-        uid = hashlib.sha1(chunk.encode()).hexdigest()
-        meta = {
-            "source": f"{SOURCE_URL}#page={pg}",
-            "lang": "en",  # this PDF is Bahasa
-            "question": q,
-            "text": chunk,
-        }
-        yield uid, chunk, meta
-    doc.close()
+JOB = IngestJob(PDF_PATH, "en", "en", SOURCE_URL)
 
 
 def main():
-    ids, texts, metas = [], [], []
-    for uid, txt, meta in build_vectors(PDF_PATH):
-        ids.append(uid)
-        texts.append(txt)
-        metas.append(meta)
-
-    logger.info(f"Total Q&A chunks: {len(ids)}")
-    for i in tqdm.tqdm(range(0, len(texts), BATCH)):
-        try:
-            vecs = embedder.embed_documents(texts[i : i + BATCH])
-            index.upsert(
-                zip(ids[i : i + BATCH], vecs, metas[i : i + BATCH]), namespace="en"
-            )
-        except Exception as e:
-            logger.error(f"Failed to embed or upsert batch {i}-{i+BATCH}: {e}")
+    run_jobs([JOB])
 
 
 def delete_all():
-    try:
-        index.delete(delete_all=True, namespace="en")
-        logger.info("Deleted all vectors")
-    except Exception as e:
-        logger.error(f"Failed to delete vectors: {e}")
+    delete_namespace(JOB.namespace)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from core.settings import settings
+
+"""
+Lexical (BM25) index over the FAQ questions and answers for the Jenius FX chatbot.
+Built at ingest time per namespace; used by `retrieve_docs` as the lexical half of
+a hybrid retriever and as a zero-network fast path when a user message is a
+near-paraphrase of an FAQ question.
+"""
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+# very common words carry no signal for FAQ matching
+STOPWORDS = {
+    # en
+    "a", "an", "the", "is", "are", "do", "does", "i", "my", "me", "can", "to", "of",
+    "in", "on", "for", "and", "or", "what", "how", "it", "be", "with", "at", "from",
+    # id
+    "apa", "apakah", "bagaimana", "cara", "saya", "di", "ke", "dari", "yang", "dan",
+    "atau", "untuk", "dengan", "ini", "itu", "bisa", "ada", "adalah",
+}
+
+# cache one index per namespace
+_LEXICAL_INDEXES: Dict[str, "LexicalIndex"] = {}
+_LEXICAL_INDEXES_LOCK = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 over question + answer text. Question tokens are counted twice, since
+    user messages usually paraphrase the question rather than the answer.
+    """
+
+    def __init__(self, namespace: str, k1: float = 1.2, b: float = 0.75):
+        self.namespace = namespace
+        self.k1 = k1
+        self.b = b
+        self._ids: List[str] = []
+        self._metas: List[dict] = []
+        self._questions: List[set] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._idf: Dict[str, float] = {}
+        self._avg_len = 0.0
+        self.mtime = 0
+
+    @property
+    def path(self) -> str:
+        return os.path.join(settings.lexical_index_dir, f"{self.namespace or '_default'}.json")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # ── build / persist ───────────────────────────────────────────────
+    def build(self, records: List[Tuple[str, dict]]) -> "LexicalIndex":
+        """
+        (Re)build from (id, metadata) records; metadata carries "question" and "text".
+        """
+        self._ids = [uid for uid, _ in records]
+        self._metas = [dict(meta) for _, meta in records]
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._questions, self._lengths = [], []
+        for n, meta in enumerate(self._metas):
+            q_tokens = tokenize(meta.get("question", ""))
+            tokens = q_tokens * 2 + tokenize(meta.get("text", ""))
+            self._questions.append(set(q_tokens))
+            self._lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((n, tf))
+        self._postings = dict(postings)
+        total = len(self._ids)
+        self._avg_len = sum(self._lengths) / total if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in self._postings.items()
+        }
+        return self
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                [{"id": i, "metadata": m} for i, m in zip(self._ids, self._metas)],
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp, self.path)
+        self.mtime = os.stat(self.path).st_mtime_ns
+        logger.info(f"Saved lexical index '{self.namespace}' with {len(self)} docs")
+
+    def load(self) -> "LexicalIndex":
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, encoding="utf-8") as f:
+                records = json.load(f)
+        except FileNotFoundError:
+            return self
+        self.build([(r["id"], r["metadata"]) for r in records])
+        self.mtime = mtime
+        return self
+
+    def is_stale(self) -> bool:
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime
+        except OSError:
+            return bool(self._ids)
+
+    # ── search ────────────────────────────────────────────────────────
+    def _scores(self, tokens: List[str]) -> Dict[int, float]:
+        scores: Dict[int, float] = defaultdict(float)
+        # _avg_len is 0 for an index of empty documents
+        avg_len = max(self._avg_len, 1e-9)
+        for term in set(tokens):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for n, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[n] / avg_len)
+                scores[n] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def _document(self, n: int) -> Document:
+        meta = dict(self._metas[n])
+        text = meta.pop("text", "")
+        return Document(id=self._ids[n], page_content=text, metadata=meta)
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[Document, float]]:
+        """
+        Return the top-`k` (Document, BM25 score) pairs for `query`.
+        """
+        if not self._ids:
+            return []
+        scores = self._scores(tokenize(query))
+        top = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [(self._document(n), s) for n, s in top]
+
+    def confident_match(self, query: str, k: int = 3) -> Optional[List[Document]]:
+        """
+        Return the top-`k` docs if the best hit is almost certainly the FAQ the
+        user is asking (question-term overlap and a clear BM25 margin), else None.
+        """
+        tokens = tokenize(query)
+        if not self._ids or not tokens:
+            return None
+        scores = self._scores(tokens)
+        if not scores:
+            return None
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        best, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        q_set, faq_set = set(tokens), self._questions[best]
+        overlap = len(q_set & faq_set) / len(q_set | faq_set) if faq_set else 0.0
+        if overlap < settings.lexical_confident_overlap:
+            return None
+        if runner_up and best_score < settings.lexical_confident_margin * runner_up:
+            return None
+        return [self._document(n) for n, _ in ranked[:k]]
+
+
+def get_lexical_index(namespace: str = "") -> LexicalIndex:
+    """
+    Return the cached LexicalIndex for `namespace`, reloading it when the file
+    on disk was rebuilt (by an ingest in another process).
+    """
+    with _LEXICAL_INDEXES_LOCK:
+        index = _LEXICAL_INDEXES.get(namespace)
+        if index is None or index.is_stale():
+            index = _LEXICAL_INDEXES[namespace] = LexicalIndex(namespace).load()
+        return index
+
+
+def rebuild_lexical_index(namespace: str, records: List[Tuple[str, dict]]) -> LexicalIndex:
+    """
+    Build, persist and swap in the lexical index for `namespace` (used by ingest).
+    """
+    index = LexicalIndex(namespace).build(records)
+    index.save()
+    with _LEXICAL_INDEXES_LOCK:
+        _LEXICAL_INDEXES[namespace] = index
+    return index
+
+
+def fuse(
+    rankings: List[List[Document]], k: int = 3, rrf_k: int = 60
+) -> List[Document]:
+    """
+    Reciprocal-rank fusion of several ranked Document lists (deduped by content).
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc.page_content
+            scores[key] += 1.0 / (rrf_k + rank + 1)
+            docs.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in best]
@@ -0,0 +1,404 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from core.settings import settings
+
+"""
+Local in-process vector index for the Jenius FX chatbot.
+Mirrors a Pinecone namespace as a float32 matrix memory-mapped from disk, with
+vectorized cosine top-k and Pinecone-style metadata filters, so retrieval can run
+with zero network hops (settings.vector_backend = "local").
+Readers take one immutable snapshot (ids, metadata, matrix) per query, and an
+index reloads itself when records.json is rewritten, so a re-ingest by another
+process is picked up without a restart.
+"""
+
+logger = logging.getLogger(__name__)
+
+# (id, score, metadata)
+Match = Tuple[str, float, Dict[str, Any]]
+
+
+class _Snapshot(NamedTuple):
+    ids: List[str]
+    metas: List[Dict[str, Any]]
+    matrix: np.ndarray
+    masks: Dict[str, np.ndarray]  # filter masks over these rows, filled lazily
+    mtime: int  # records.json mtime this was loaded from (0 if never saved)
+
+# cache one index per namespace
+_LOCAL_INDEXES: Dict[str, "LocalIndex"] = {}
+_LOCAL_INDEXES_LOCK = threading.Lock()
+
+
+def _matches_filter(meta: Dict[str, Any], flt: Dict[str, Any]) -> bool:
+    """
+    Evaluate a Pinecone metadata filter ({"lang": "en"}, {"lang": {"$in": [...]}}, ...).
+    """
+    for field, cond in flt.items():
+        if field == "$and":
+            if not all(_matches_filter(meta, c) for c in cond):
+                return False
+            continue
+        if field == "$or":
+            if not any(_matches_filter(meta, c) for c in cond):
+                return False
+            continue
+        value = meta.get(field)
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, arg in cond.items():
+            if op == "$eq" and value != arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$nin" and value in arg:
+                return False
+            if op == "$exists" and (field in meta) != bool(arg):
+                return False
+    return True
+
+
+class LocalIndex:
+    """
+    One namespace of vectors: `vectors.npy` (unit-normalized float32 rows,
+    memory-mapped) plus `records.json` (ids and metadata, same row order).
+    """
+
+    def __init__(self, namespace: str, root: Optional[str] = None):
+        self.namespace = namespace
+        self.path = os.path.join(root or settings.local_index_dir, namespace or "_default")
+        self._lock = threading.Lock()
+        self._snapshot = _Snapshot([], [], np.zeros((0, settings.embed_dim), dtype=np.float32), {}, 0)
+        self._load()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.npy")
+
+    @property
+    def _records_path(self) -> str:
+        return os.path.join(self.path, "records.json")
+
+    def _records_mtime(self) -> int:
+        try:
+            return os.stat(self._records_path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _load(self) -> None:
+        # callers hold self._lock (or are the constructor)
+        mtime = self._records_mtime()
+        if not mtime:
+            return
+        try:
+            with open(self._records_path, encoding="utf-8") as f:
+                records = json.load(f)
+            matrix = np.load(self._vectors_path, mmap_mode="r")
+        except FileNotFoundError:
+            return
+        if len(matrix) != len(records):
+            # caught between the two renames of a save elsewhere; the next access retries
+            return
+        self._snapshot = _Snapshot(
+            [r["id"] for r in records], [r["metadata"] for r in records], matrix, {}, mtime
+        )
+        logger.info(
+            f"Loaded local index '{self.namespace}' with {len(records)} vectors"
+        )
+
+    def refresh(self) -> "LocalIndex":
+        """
+        Reload if records.json was rewritten since it was loaded (by an ingest
+        in another process).
+        """
+        if self._records_mtime() != self._snapshot.mtime:
+            with self._lock:
+                self._current()
+        return self
+
+    def _current(self) -> _Snapshot:
+        # under self._lock: the latest snapshot, reloaded first if the files moved on
+        if self._records_mtime() != self._snapshot.mtime:
+            self._load()
+        return self._snapshot
+
+    def _save(self, ids: List[str], metas: List[Dict[str, Any]], matrix: np.ndarray) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        # write-then-rename so readers never see a half-written index
+        tmp_vec = self._vectors_path + ".tmp.npy"
+        np.save(tmp_vec, matrix)
+        os.replace(tmp_vec, self._vectors_path)
+        self._save_records(ids, metas)
+
+    def _save_records(self, ids: List[str], metas: List[Dict[str, Any]]) -> None:
+        # records.json alone, for writes that keep the rows (and so vectors.npy) as they are
+        tmp_rec = self._records_path + ".tmp"
+        with open(tmp_rec, "w", encoding="utf-8") as f:
+            json.dump(
+                [{"id": i, "metadata": m} for i, m in zip(ids, metas)],
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_rec, self._records_path)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._snapshot.ids)
+
+    # ── writes ────────────────────────────────────────────────────────
+    def upsert(self, vectors: Iterable[Tuple[str, List[float], Dict[str, Any]]]) -> int:
+        """
+        Insert or replace (id, values, metadata) tuples, like `Index.upsert`.
+        Returns the number of vectors written.
+        """
+        new = list(vectors)
+        if not new:
+            return 0
+        with self._lock:
+            snap = self._current()
+            rows = {i: n for n, i in enumerate(snap.ids)}
+            ids, metas = list(snap.ids), list(snap.metas)
+            matrix = np.array(snap.matrix, dtype=np.float32)
+            incoming = np.asarray([v for _, v, _ in new], dtype=np.float32)
+            norms = np.linalg.norm(incoming, axis=1, keepdims=True)
+            incoming /= np.where(norms == 0, 1, norms)
+            append = []
+            for (uid, _, meta), vec in zip(new, incoming):
+                if uid in rows:
+                    matrix[rows[uid]] = vec
+                    metas[rows[uid]] = dict(meta)
+                else:
+                    rows[uid] = len(ids) + len(append)
+                    append.append(vec)
+                    ids.append(uid)
+                    metas.append(dict(meta))
+            if append:
+                matrix = np.vstack([matrix.reshape(-1, incoming.shape[1]), np.stack(append)])
+            self._save(ids, metas, matrix)
+        return len(new)
+
+    def update_metadata(self, uid: str, metadata: Dict[str, Any]) -> bool:
+        """
+        Replace the metadata of an existing vector, like `Index.update(set_metadata=...)`.
+        Returns False if `uid` is not in the index.
+        """
+        with self._lock:
+            snap = self._current()
+            if uid not in snap.ids:
+                return False
+            metas = list(snap.metas)
+            metas[snap.ids.index(uid)] = dict(metadata)
+            # same rows in the same order: the vectors file stays valid
+            self._save_records(list(snap.ids), metas)
+        return True
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False) -> None:
+        """
+        Delete vectors by id, or everything with `delete_all=True`.
+        """
+        with self._lock:
+            snap = self._current()
+            if delete_all:
+                keep = []
+            else:
+                drop = set(ids or [])
+                keep = [n for n, i in enumerate(snap.ids) if i not in drop]
+            matrix = np.array(snap.matrix, dtype=np.float32)[keep]
+            self._save(
+                [snap.ids[n] for n in keep],
+                [snap.metas[n] for n in keep],
+                matrix.reshape(len(keep), -1),
+            )
+
+    # ── reads ─────────────────────────────────────────────────────────
+    @staticmethod
+    def _mask(snap: _Snapshot, flt: Dict[str, Any]) -> np.ndarray:
+        key = json.dumps(flt, sort_keys=True)
+        mask = snap.masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (_matches_filter(m, flt) for m in snap.metas), dtype=bool, count=len(snap.metas)
+            )
+            snap.masks[key] = mask
+        return mask
+
+    def query(
+        self, vector: List[float], top_k: int = 3, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Match]:
+        """
+        Return the `top_k` (id, cosine score, metadata) matches for `vector`.
+        """
+        snap = self.refresh()._snapshot
+        ids, metas = snap.ids, snap.metas
+        if not ids or top_k <= 0:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        scores = snap.matrix @ q
+        if filter:
+            scores = np.where(self._mask(snap, filter), scores, -np.inf)
+        k = min(top_k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (ids[n], float(scores[n]), dict(metas[n]))
+            for n in top
+            if np.isfinite(scores[n])
+        ]
+
+    # ── population ────────────────────────────────────────────────────
+    def sync_from_pinecone(self, index, batch: int = 100) -> int:
+        """
+        Replace this namespace with the contents of the same namespace in Pinecone.
+        Returns the number of vectors mirrored.
+        """
+        items: List[Tuple[str, List[float], Dict[str, Any]]] = []
+        for id_batch in index.list(namespace=self.namespace):
+            for i in range(0, len(id_batch), batch):
+                res = index.fetch(ids=id_batch[i : i + batch], namespace=self.namespace)
+                for uid, vec in res.vectors.items():
+                    items.append((uid, list(vec.values), dict(vec.metadata or {})))
+        self.delete(delete_all=True)
+        self.upsert(items)
+        logger.info(f"Synced {len(items)} vectors from Pinecone namespace '{self.namespace}'")
+        return len(items)
+
+
+def get_local_index(namespace: str = "") -> LocalIndex:
+    """
+    Return the cached LocalIndex for `namespace`, reloaded if it was rebuilt on disk.
+    """
+    with _LOCAL_INDEXES_LOCK:
+        if namespace not in _LOCAL_INDEXES:
+            _LOCAL_INDEXES[namespace] = LocalIndex(namespace)
+        index = _LOCAL_INDEXES[namespace]
+    return index.refresh()
+
+
+class LocalVectorStore(VectorStore):
+    """
+    LangChain VectorStore over a LocalIndex, returning the same `Document`
+    objects (text in `page_content`, remaining metadata in `metadata`) as
+    PineconeVectorStore.
+    """
+
+    def __init__(self, index: LocalIndex, embedding: Embeddings, text_key: str = "text"):
+        self._index = index
+        self._embedding = embedding
+        self._text_key = text_key
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _to_docs(self, matches: List[Match]) -> List[Tuple[Document, float]]:
+        docs = []
+        for uid, score, meta in matches:
+            text = meta.pop(self._text_key, None)
+            if text is None:
+                logger.warning(f"Found document with no `{self._text_key}` key. Skipping.")
+                continue
+            docs.append((Document(id=uid, page_content=text, metadata=meta), score))
+        return docs
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self._to_docs(self._index.query(embedding, top_k=k, filter=filter))
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            d for d, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+        ]
+
+    async def asimilarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        # in-process matrix product: no I/O to await
+        return self.similarity_search_by_vector(embedding, k=k, filter=filter)
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        vector = await self._embedding.aembed_query(query)
+        return [
+            d for d, _ in self.similarity_search_by_vector_with_score(vector, k=k, filter=filter)
+        ]
+
+    def add_texts(
+        self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = kwargs.get("ids") or [hashlib.sha1(t.encode()).hexdigest() for t in texts]
+        vecs = self._embedding.embed_documents(texts)
+        self._index.upsert(
+            (uid, vec, {**meta, self._text_key: text})
+            for uid, vec, meta, text in zip(ids, vecs, metadatas, texts)
+        )
+        return ids
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        namespace: str = "",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(get_local_index(namespace), embedding)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
+
+
+def main():
+    """
+    Mirror Pinecone namespaces into the local index.
+    PYTHONPATH=src python3 -m retrieval.local_index en id
+    """
+    from retrieval.vector_store import get_raw_pinecone_index
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("namespaces", nargs="*", default=["en", "id"])
+    args = parser.parse_args()
+    index = get_raw_pinecone_index()
+    for ns in args.namespaces:
+        get_local_index(ns).sync_from_pinecone(index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, NamedTuple, Tuple
+
+from core.settings import settings
+
+"""
+Ingest manifests for the Jenius FX chatbot.
+Keeps, per namespace, a local map of chunk ID → content hash so re-ingestion only
+embeds new chunks, patches metadata of changed ones and deletes stale IDs.
+"""
+
+logger = logging.getLogger(__name__)
+
+# (uid, text, metadata) as produced by retrieval.chunking.iter_chunks
+Chunk = Tuple[str, str, dict]
+
+
+class ManifestDiff(NamedTuple):
+    new: List[Chunk]  # ID not in the manifest → embed + upsert
+    changed: List[Chunk]  # same ID (same text), different metadata → metadata update only
+    unchanged: List[str]
+    stale: List[str]  # in the manifest but no longer in the source → delete
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.new)} new, {len(self.changed)} changed, "
+            f"{len(self.unchanged)} unchanged, {len(self.stale)} stale"
+        )
+
+
+def content_hash(text: str, meta: dict) -> str:
+    """
+    Hash everything that ends up in the index for a chunk (text + metadata).
+    """
+    payload = json.dumps({"text": text, "meta": meta}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def manifest_path(namespace: str) -> str:
+    return os.path.join(settings.manifest_dir, f"{namespace or '_default'}.json")
+
+
+def load_manifest(namespace: str) -> Dict[str, str]:
+    """
+    Return the stored {chunk_id: content_hash} map for `namespace` ({} if none).
+    """
+    try:
+        with open(manifest_path(namespace), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.error(f"Unreadable manifest for namespace '{namespace}', starting fresh: {e}")
+        return {}
+
+
+def save_manifest(namespace: str, manifest: Dict[str, str]) -> None:
+    path = manifest_path(namespace)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def diff_chunks(manifest: Dict[str, str], chunks: List[Chunk]) -> ManifestDiff:
+    """
+    Compare the current source chunks against `manifest`.
+    Duplicate IDs (identical answers) are collapsed to their first occurrence.
+    """
+    new, changed, unchanged, seen = [], [], [], set()
+    for uid, text, meta in chunks:
+        if uid in seen:
+            continue
+        seen.add(uid)
+        old = manifest.get(uid)
+        if old is None:
+            new.append((uid, text, meta))
+        elif old != content_hash(text, meta):
+            changed.append((uid, text, meta))
+        else:
+            unchanged.append(uid)
+    stale = [uid for uid in manifest if uid not in seen]
+    return ManifestDiff(new, changed, unchanged, stale)
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import fitz
+
+from core.settings import settings
+
+"""
+FAQ PDF parsing for the Jenius FX chatbot.
+Pages are read into (line text, average font size) lines on a process pool, in
+contiguous page ranges, and merged back in page order; the question/answer
+state machine then runs once over the ordered lines, so a question or answer
+that spans a page break comes out exactly as in a serial parse.
+The parsed Q&A records are written to a JSONL artifact keyed by the PDF's
+SHA-256, the parser version and question_min (settings.parsed_dir), so later ingest, evaluation and index builds
+read the artifact instead of reopening the PDF.
+"""
+
+logger = logging.getLogger(__name__)
+
+QUESTION_MIN = 13.5  # ≥14-pt is a question
+# bump when the parsing rules change; older artifacts are then re-parsed
+PARSER_VERSION = 1
+PARSE_WORKERS = os.cpu_count() or 1
+# below this many pages, process start-up costs more than it saves
+PARALLEL_MIN_PAGES = 48
+# text only: skip decoding images, which the parser never looks at
+_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# (line text, average span font size)
+Line = Tuple[str, float]
+
+
+class QnA(NamedTuple):
+    question: str
+    answer: str
+    page: int  # 1-based page the question starts on
+
+
+# ───────────────────────── 1 ─ PAGE LINES ──────────────────────────────
+def page_lines(page) -> List[Line]:
+    """
+    Collapse every non-empty text line of `page` to (text, average font size).
+    """
+    lines: List[Line] = []
+    for b in page.get_text("dict", flags=_TEXT_FLAGS)["blocks"]:
+        for line in b.get("lines", []):
+            spans = [s for s in line["spans"] if s["text"].strip()]
+            if spans:
+                text = " ".join(s["text"].strip() for s in spans)
+                lines.append((text, sum(s["size"] for s in spans) / len(spans)))
+    return lines
+
+
+def _read_pages(path: str, start: int, stop: int) -> List[List[Line]]:
+    # process-pool entry point: each worker opens its own handle on the PDF
+    with fitz.open(path) as doc:
+        return [page_lines(doc.load_page(i)) for i in range(start, stop)]
+
+
+def read_pages(path: str, workers: int = PARSE_WORKERS) -> List[List[Line]]:
+    """
+    Return the lines of every page of the PDF at `path`, in page order.
+    Large documents are split into one contiguous page range per worker.
+    """
+    with fitz.open(path) as doc:
+        count = doc.page_count
+        if workers <= 1 or count < PARALLEL_MIN_PAGES:
+            return [page_lines(doc.load_page(i)) for i in range(count)]
+    step = -(-count // workers)
+    ranges = [(start, min(start + step, count)) for start in range(0, count, step)]
+    pages: List[List[Line]] = []
+    with ProcessPoolExecutor(len(ranges)) as pool:
+        # map yields in submission order, so pages merge back in order
+        for part in pool.map(_read_pages, [path] * len(ranges), *zip(*ranges)):
+            pages.extend(part)
+    return pages
+
+
+# ───────────────────────── 2 ─ Q&A ASSEMBLY ────────────────────────────
+def assemble_qna(pages: Iterable[List[Line]], question_min: float = QUESTION_MIN) -> Iterator[QnA]:
+    """
+    Yield Q&A records from ordered page lines.
+    Any line whose average font-size >= question_min is considered part of the question.
+    We only yield when the question ends with '?' and we've collected its answers.
+    """
+    pending_q, pending_a, page_num = None, [], None
+
+    for page_idx, lines in enumerate(pages):
+        for line_text, avg_size in lines:
+            if avg_size >= question_min:
+                # it's a question line
+                # if we already had a complete Q (ending in '?'), flush it
+                if pending_q and pending_q.strip().endswith("?"):
+                    yield QnA(pending_q, " ".join(pending_a), page_num)
+                    pending_a = []
+                    # start brand-new question
+                    pending_q = line_text
+                else:
+                    # accumulate multi-line question
+                    pending_q = (pending_q + " " + line_text) if pending_q else line_text
+                page_num = page_idx + 1
+            elif pending_q is not None:
+                # everything smaller is answer content
+                pending_a.append(line_text)
+
+    # flush the very last Q&A if it ended in '?'
+    if pending_q and pending_q.strip().endswith("?"):
+        yield QnA(pending_q, " ".join(pending_a), page_num)
+
+
+# ───────────────────────── 3 ─ ARTIFACT ────────────────────────────────
+def pdf_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def artifact_path(digest: str, question_min: float = QUESTION_MIN) -> str:
+    # one file per parse configuration: runs with different settings never overwrite each other
+    return os.path.join(settings.parsed_dir, f"{digest}.v{PARSER_VERSION}.q{question_min:g}.qna.jsonl")
+
+
+def _header(digest: str, question_min: float) -> dict:
+    return {"format": "qna", "version": PARSER_VERSION, "pdf_sha256": digest, "question_min": question_min}
+
+
+def read_artifact(path: str, expected: dict) -> Optional[List[QnA]]:
+    """
+    Return the records of the artifact at `path`, or None if it is missing,
+    unreadable or was written for another PDF/parser version.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if {k: header.get(k) for k in expected} != expected:
+                return None
+            return [QnA(r["question"], r["answer"], r["page"]) for r in map(json.loads, f)]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable parse artifact {path}: {e}")
+        return None
+
+
+def write_artifact(path: str, header: dict, records: Sequence[QnA]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(dict(header, records=len(records))) + "\n")
+        for r in records:
+            f.write(json.dumps(r._asdict(), ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def load_qna(path: str, question_min: float = QUESTION_MIN, workers: int = PARSE_WORKERS) -> List[QnA]:
+    """
+    Return the Q&A records of the PDF at `path`, from its artifact when one
+    exists for this exact file and parser version, else by parsing (and then
+    writing the artifact).
+    Args:
+        path: PDF file.
+        question_min: Font size from which a line is part of a question.
+        workers: Processes used to read pages of large PDFs.
+    Returns:
+        The Q&A records in document order.
+    """
+    digest = pdf_hash(path)
+    header = _header(digest, question_min)
+    target = artifact_path(digest, question_min)
+    records = read_artifact(target, header)
+    if records is not None:
+        logger.info(f"Loaded {len(records)} Q&A records for {path} from {target}")
+        return records
+    records = list(assemble_qna(read_pages(path, workers), question_min))
+    try:
+        write_artifact(target, header, records)
+        logger.info(f"Parsed {len(records)} Q&A records from {path} into {target}")
+    except OSError as e:
+        logger.warning(f"Could not write parse artifact {target}: {e}")
+    return records
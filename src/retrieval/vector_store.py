@@ -1,29 +1,77 @@
+import asyncio
+import contextvars
+import hashlib
+import json
 import logging
+import threading
 import time
-from typing import Dict, List, Optional
-from langchain.schema import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone, ServerlessSpec
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from core.disk_cache import get_disk_cache
+from core.metrics import RETRIEVAL_STRATEGY, record_cache, span
+from core.namespace_version import namespace_version
 from core.settings import settings
+from retrieval.embeddings import get_embeddings, normalize_text
+from retrieval.lexical_index import fuse, get_lexical_index
+
+if TYPE_CHECKING:
+    # langchain_core.vectorstores pulls in langsmith; keep it off the import path
+    from langchain_core.vectorstores import VectorStore
 
 """
 Vector store utilities for the Jenius FX chatbot.
 Handles Pinecone index management, vector store caching, and document retrieval.
+With settings.vector_backend = "local", retrieval runs against the in-process
+mirror in retrieval/local_index.py instead of Pinecone. With
+settings.hybrid_retrieval, dense results are fused with the BM25 index in
+retrieval/lexical_index.py, and a confident lexical match skips the embedding
+call and vector query entirely. `retrieve_docs_many` serves bulk/evaluation
+traffic: one batched embedding call and a bounded pool of concurrent queries.
+With settings.retrieval_speculative, the filtered query, its unfiltered
+fallback and any cross-namespace queries are issued together on one query
+embedding; the most preferred non-empty result that arrives within
+settings.retrieval_deadline_s wins. On the async path the rest are cancelled;
+a pool thread cannot be interrupted, so the sync path only stops strategies
+that have not started and runs at most SPECULATIVE_PER_REQUEST at a time.
+Finished dense/hybrid results are kept in the shared disk cache, versioned on the
+embedding model/dimension and the namespace version bumped by ingestion.
 """
 
 # cache one store per namespace
-_VECTORSTORES: Dict[str, PineconeVectorStore] = {}
+_VECTORSTORES: Dict[str, "VectorStore"] = {}
+_VECTORSTORES_LOCK = threading.RLock()
+# the resolved Index client is shared by every namespace
+_INDEX = None
+# runs the concurrent strategies of sync `retrieve_docs` calls
+_SPECULATIVE_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="retrieval")
+# strategies of one sync search in flight at once (the filtered query and its fallback);
+# an abandoned query keeps its pool thread until it returns
+SPECULATIVE_PER_REQUEST = 2
 
 logger = logging.getLogger(__name__)
 
+
 def _ensure_index():
     """
     Create Pinecone index if it doesn't exist, and return the Index client.
-    Waits until the index is ready.
+    Waits until the index is ready. The client (and its connection pool) is
+    resolved once per process.
     """
+    global _INDEX
+    with _VECTORSTORES_LOCK:
+        if _INDEX is None:
+            _INDEX = _create_index()
+        return _INDEX
+
+
+def _create_index():
+    from pinecone import Pinecone, ServerlessSpec  # deferred: only the Pinecone backend needs it
+
     try:
-        pc = Pinecone(api_key=settings.pinecone_api_key)
+        pc = Pinecone(
+            api_key=settings.pinecone_api_key, pool_threads=settings.pinecone_pool_threads
+        )
         name = settings.pinecone_index
         if name not in pc.list_indexes().names():
             logger.info(f"Creating Pinecone index: {name}")
@@ -37,31 +85,47 @@ def _ensure_index():
             while not pc.describe_index(name).status["ready"]:
                 logger.info(f"Waiting for Pinecone index '{name}' to be ready...")
                 time.sleep(1)
-        return pc.Index(name)
+        return pc.Index(name, pool_threads=settings.pinecone_pool_threads)
     except Exception as e:
         logger.error(f"Error ensuring Pinecone index: {e}")
         raise
 
 
-def get_vectorstore(namespace: str = "") -> PineconeVectorStore:
+def get_vectorstore(namespace: str = "") -> "VectorStore":
     """
-    Return a LangChain PineconeVectorStore scoped to `namespace`.
-    Caches a separate store for each namespace.
+    Return a LangChain vector store scoped to `namespace`: a PineconeVectorStore,
+    or a LocalVectorStore when settings.vector_backend is "local".
+    Caches a separate store for each namespace (thread-safe).
     """
-    if namespace in _VECTORSTORES:
+    store = _VECTORSTORES.get(namespace)
+    if store is not None:
+        return store
+    with _VECTORSTORES_LOCK:
+        if namespace not in _VECTORSTORES:
+            _VECTORSTORES[namespace] = _create_vectorstore(namespace)
         return _VECTORSTORES[namespace]
+
+
+def _create_vectorstore(namespace: str) -> "VectorStore":
+    if settings.vector_backend == "local":
+        from retrieval.local_index import LocalVectorStore, get_local_index
+
+        store = LocalVectorStore(get_local_index(namespace), get_embeddings())
+        logger.info(f"Created LocalVectorStore for namespace '{namespace}'")
+        return store
     try:
+        from langchain_pinecone import PineconeVectorStore  # deferred: slow import
+
         # ensure the index exists
         index = _ensure_index()
-        # create embeddings instance
-        embed = OpenAIEmbeddings(model=settings.embed_model)
+        # shared, cached embeddings instance
+        embed = get_embeddings()
         store = PineconeVectorStore(
             index=index,
             embedding=embed,
             text_key="text",
             namespace=namespace,
         )
-        _VECTORSTORES[namespace] = store
         logger.info(f"Created PineconeVectorStore for namespace '{namespace}'")
         return store
     except Exception as e:
@@ -82,10 +146,214 @@ def get_raw_pinecone_index():
         raise
 
 
+def _lexical_search(query: str, ns: str, k: int) -> Tuple[Optional[List[Document]], List[Document]]:
+    """
+    Run the BM25 half of hybrid retrieval.
+    Returns (confident match or None, lexical ranking to fuse with dense results).
+    """
+    if not settings.hybrid_retrieval:
+        return None, []
+    with span("lexical"):
+        lex = get_lexical_index(ns)
+        confident = lex.confident_match(query, k=k)
+        lexical = [] if confident else [d for d, _ in lex.search(query, k=k)]
+    record_cache("lexical_fast_path", bool(confident))
+    if confident:
+        logger.info(f"Lexical fast path hit in namespace '{ns}'")
+    return confident, lexical
+
+
+def _dense_search(vs: "VectorStore", vector: List[float], lang: Optional[str], k: int) -> List[Document]:
+    """
+    Metadata-filtered vector query with an unfiltered fallback when it has no hits.
+    """
+    # primary search: metadata filter
+    with span("vector_query"):
+        docs = vs.similarity_search_by_vector(
+            vector, k=k, filter={"lang": lang} if lang else None
+        )
+    if not docs:
+        # fallback: same namespace, no filter
+        with span("fallback_query"):
+            docs = vs.similarity_search_by_vector(vector, k=k)
+    return docs
+
+
+# ───────────────────────── speculative strategies ──────────────────────
+Strategy = Tuple[str, "VectorStore", Optional[dict]]
+
+
+def _strategies(vs: "VectorStore", lang: Optional[str], ns: str) -> List[Strategy]:
+    """
+    Vector queries in order of preference: filtered primary, unfiltered
+    fallback, then each extra namespace (unfiltered).
+    """
+    strategies: List[Strategy] = [("vector_query", vs, {"lang": lang} if lang else None)]
+    if lang:
+        strategies.append(("fallback_query", vs, None))
+    for extra in settings.retrieval_extra_namespaces:
+        if extra != ns:
+            strategies.append(("cross_namespace", get_vectorstore(namespace=extra), None))
+    return strategies
+
+
+def _pick(strategies: List[Strategy], results: List[Optional[List[Document]]]) -> Optional[List[Document]]:
+    """
+    Return the preferred result once it is decided: the first non-empty result
+    whose more-preferred strategies all came back empty. None means keep waiting.
+    """
+    for (name, _, _), docs in zip(strategies, results):
+        if docs is None:
+            return None
+        if docs:
+            RETRIEVAL_STRATEGY.inc(strategy=name)
+            return docs
+    RETRIEVAL_STRATEGY.inc(strategy="none")
+    return []
+
+
+def _past_deadline(strategies: List[Strategy], results: List[Optional[List[Document]]], ns: str) -> List[Document]:
+    """
+    Deadline hit: use the most preferred non-empty result that did arrive.
+    """
+    late = [name for (name, _, _), docs in zip(strategies, results) if docs is None]
+    logger.warning(f"Retrieval deadline hit in namespace '{ns}'; still pending: {late}")
+    RETRIEVAL_STRATEGY.inc(strategy="deadline")
+    return next((docs for docs in results if docs), [])
+
+
+def _speculative_search(vs: "VectorStore", vector: List[float], lang: Optional[str], k: int, ns: str) -> List[Document]:
+    """
+    Sync speculative search: strategies run on a shared thread pool, at most
+    SPECULATIVE_PER_REQUEST at a time in order of preference; the next one
+    starts when a running one finishes without deciding the result.
+    """
+    strategies = _strategies(vs, lang, ns)
+
+    def run(name, store, flt):
+        with span(name):
+            return store.similarity_search_by_vector(vector, k=k, filter=flt)
+
+    results: List[Optional[List[Document]]] = [None] * len(strategies)
+    index: Dict[Future, int] = {}
+    pending: set = set()
+
+    def launch() -> None:
+        while len(index) < len(strategies) and len(pending) < SPECULATIVE_PER_REQUEST:
+            i = len(index)
+            # copy the context so stage timings land on this request
+            f = _SPECULATIVE_POOL.submit(contextvars.copy_context().run, run, *strategies[i])
+            index[f] = i
+            pending.add(f)
+
+    deadline = time.monotonic() + settings.retrieval_deadline_s
+    launch()
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                return _past_deadline(strategies, results, ns)
+            pending -= done
+            for f in done:
+                i = index[f]
+                try:
+                    results[i] = f.result()
+                except Exception as e:
+                    logger.error(f"Retrieval strategy '{strategies[i][0]}' failed in namespace '{ns}': {e}")
+                    results[i] = []
+            picked = _pick(strategies, results)
+            if picked is not None:
+                return picked
+            launch()
+        return _pick(strategies, results) or []
+    finally:
+        for f in pending:
+            f.cancel()
+
+
+async def _aspeculative_search(
+    vs: "VectorStore", vector: List[float], lang: Optional[str], k: int, ns: str
+) -> List[Document]:
+    """
+    Async speculative search: strategies run as tasks; losers are cancelled.
+    """
+    strategies = _strategies(vs, lang, ns)
+
+    async def run(name, store, flt):
+        with span(name):
+            return await store.asimilarity_search_by_vector(vector, k=k, filter=flt)
+
+    tasks = [asyncio.create_task(run(*s)) for s in strategies]
+    results: List[Optional[List[Document]]] = [None] * len(tasks)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.retrieval_deadline_s
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                return _past_deadline(strategies, results, ns)
+            for t in done:
+                i = tasks.index(t)
+                if t.exception() is not None:
+                    logger.error(f"Retrieval strategy '{strategies[i][0]}' failed in namespace '{ns}': {t.exception()}")
+                    results[i] = []
+                else:
+                    results[i] = t.result()
+            picked = _pick(strategies, results)
+            if picked is not None:
+                return picked
+        return _pick(strategies, results) or []
+    finally:
+        for t in pending:
+            t.cancel()
+
+
+# ───────────────────────── shared result cache ─────────────────────────
+def _results_key(query: str, ns: str, k: int) -> str:
+    return hashlib.sha1(f"{ns}\x1f{k}\x1f{normalize_text(query)}".encode()).hexdigest()
+
+
+def _results_version(ns: str) -> str:
+    return f"{settings.embed_model}:{settings.embed_dim}:{int(settings.hybrid_retrieval)}:{namespace_version(ns)}"
+
+
+def _cached_results(query: str, ns: str, k: int) -> Optional[List[Document]]:
+    disk = get_disk_cache()
+    if disk is None:
+        return None
+    blob = disk.get("retrieval", _results_key(query, ns, k), _results_version(ns))
+    record_cache("disk_retrieval", blob is not None)
+    if blob is None:
+        return None
+    return [Document(**d) for d in json.loads(blob)]
+
+
+def _store_results(query: str, ns: str, k: int, docs: List[Document], started: float) -> None:
+    """
+    Persist a complete result; empty and deadline-truncated results are not stored.
+    """
+    disk = get_disk_cache()
+    if disk is None or not docs or time.monotonic() - started >= settings.retrieval_deadline_s:
+        return
+    payload = [{"id": d.id, "page_content": d.page_content, "metadata": d.metadata} for d in docs]
+    disk.put(
+        "retrieval",
+        _results_key(query, ns, k),
+        json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"),
+        _results_version(ns),
+        ttl_s=settings.retrieval_cache_ttl_s,
+    )
+
+
 def retrieve_docs(query: str, lang: Optional[str] = None, k: int = 3) -> List[Document]:
     """
     Do a similarity search in the `lang` namespace (if provided),
     filter by metadata {'lang': lang}, and fallback to unfiltered if no hits.
+    The query is embedded once and the vector reused for the fallback; with
+    settings.retrieval_speculative both run concurrently under a deadline.
     Args:
         query: The query string.
         lang: Optional language code for namespace and filtering.
@@ -95,18 +363,124 @@ def retrieve_docs(query: str, lang: Optional[str] = None, k: int = 3) -> List[Do
     """
     ns = lang or ""
     try:
+        confident, lexical = _lexical_search(query, ns, k)
+        if confident:
+            return confident
+        cached = _cached_results(query, ns, k)
+        if cached is not None:
+            return cached
+        started = time.monotonic()
         vs = get_vectorstore(namespace=ns)
-        # primary search: metadata filter
-        docs = vs.similarity_search(query, k=k, filter={"lang": lang} if lang else None)
-        if not docs:
-            # fallback: same namespace, no filter
-            docs = vs.similarity_search(query, k=k)
-        logger.info(
-            f"Retrieved {len(docs)} docs for query '{query}' in namespace '{ns}'"
-        )
+        with span("embedding"):
+            vector = vs.embeddings.embed_query(query)
+        if settings.retrieval_speculative:
+            docs = _speculative_search(vs, vector, lang, k, ns)
+        else:
+            docs = _dense_search(vs, vector, lang, k)
+        if lexical:
+            docs = fuse([docs, lexical], k=k)
+        _store_results(query, ns, k, docs, started)
+        logger.info(f"Retrieved {len(docs)} docs in namespace '{ns}'")
         return docs
     except Exception as e:
-        logger.error(
-            f"Error retrieving docs for query '{query}' in namespace '{ns}': {e}"
-        )
+        logger.error(f"Error retrieving docs in namespace '{ns}': {e}")
         return []
+
+
+async def aretrieve_docs(
+    query: str, lang: Optional[str] = None, k: int = 3
+) -> List[Document]:
+    """
+    Async counterpart of `retrieve_docs`.
+    Uses the async embedding and Pinecone query calls so the event loop is never
+    blocked while waiting on the network. Same filter/fallback semantics.
+    Args:
+        query: The query string.
+        lang: Optional language code for namespace and filtering.
+        k: Number of documents to retrieve.
+    Returns:
+        List of matching Document objects.
+    """
+    ns = lang or ""
+    try:
+        confident, lexical = _lexical_search(query, ns, k)
+        if confident:
+            return confident
+        cached = _cached_results(query, ns, k)
+        if cached is not None:
+            return cached
+        started = time.monotonic()
+        vs = get_vectorstore(namespace=ns)
+        with span("embedding"):
+            vector = await vs.embeddings.aembed_query(query)
+        if settings.retrieval_speculative:
+            docs = await _aspeculative_search(vs, vector, lang, k, ns)
+        else:
+            # primary search: metadata filter
+            with span("vector_query"):
+                docs = await vs.asimilarity_search_by_vector(
+                    vector, k=k, filter={"lang": lang} if lang else None
+                )
+            if not docs:
+                # fallback: same namespace, no filter
+                with span("fallback_query"):
+                    docs = await vs.asimilarity_search_by_vector(vector, k=k)
+        if lexical:
+            docs = fuse([docs, lexical], k=k)
+        _store_results(query, ns, k, docs, started)
+        logger.info(f"Retrieved {len(docs)} docs in namespace '{ns}'")
+        return docs
+    except Exception as e:
+        logger.error(f"Error retrieving docs in namespace '{ns}': {e}")
+        return []
+
+
+def retrieve_docs_many(
+    queries: List[str], lang: Optional[str] = None, k: int = 3
+) -> List[List[Document]]:
+    """
+    Batched `retrieve_docs` for evaluation and bulk traffic.
+    Queries not answered by the lexical fast path are embedded in a single
+    `embed_documents` call, then searched concurrently on a bounded thread pool
+    (settings.retrieve_batch_workers). Same filter/fallback/fusion semantics.
+    Args:
+        queries: The query strings.
+        lang: Optional language code for namespace and filtering.
+        k: Number of documents to retrieve per query.
+    Returns:
+        One list of matching Documents per query, in input order.
+    """
+    ns = lang or ""
+    results: List[List[Document]] = [[] for _ in queries]
+    try:
+        lexical: Dict[int, List[Document]] = {}
+        pending: List[int] = []
+        for i, query in enumerate(queries):
+            confident, lexical[i] = _lexical_search(query, ns, k)
+            if confident:
+                results[i] = confident
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+
+        vs = get_vectorstore(namespace=ns)
+        with span("embedding"):
+            vectors = vs.embeddings.embed_documents([queries[i] for i in pending])
+
+        def search(i: int, vector: List[float]) -> List[Document]:
+            try:
+                docs = _dense_search(vs, vector, lang, k)
+            except Exception as e:
+                logger.error(f"Error in batched query in namespace '{ns}': {e}")
+                docs = []
+            return fuse([docs, lexical[i]], k=k) if lexical[i] else docs
+
+        workers = max(1, min(settings.retrieve_batch_workers, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for i, docs in zip(pending, pool.map(search, pending, vectors)):
+                results[i] = docs
+        logger.info(f"Retrieved docs for {len(queries)} queries in namespace '{ns}'")
+    except Exception as e:
+        logger.error(f"Error in batched retrieval in namespace '{ns}': {e}")
+    return results
@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from core.disk_cache import get_disk_cache
+from core.metrics import record_cache
+from core.namespace_version import bump_namespace_version, namespace_version
+from core.settings import settings
+
+"""
+Answer cache for the Jenius FX chatbot.
+Stores generated answers keyed on the normalized user input, the resolved language
+and a hash of the retrieved context, with LRU + TTL eviction and hit/miss counters.
+Entries are tied to a per-namespace version stamp on disk (core/namespace_version.py), so re-ingesting a
+namespace (a separate process) invalidates every answer built from it.
+Answers are also written to the shared disk cache (core/disk_cache.py), versioned
+on the chat model and namespace version, so other workers and restarted
+processes reuse them.
+"""
+
+logger = logging.getLogger(__name__)
+
+_WS = re.compile(r"\s+")
+_PUNCT = re.compile(r"[^\w\s]")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Lower-case, strip punctuation and collapse whitespace so trivially different
+    phrasings of the same question share a cache key.
+    """
+    return _WS.sub(" ", _PUNCT.sub(" ", text.lower())).strip()
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU cache of generated answers with a TTL and a size limit.
+    With persistent=True, misses fall back to (and puts write through to) the disk cache.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_s: Optional[float] = None, persistent: bool = False):
+        # None: read settings on first use, so the module-level cache costs nothing at import
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (answer, namespace, namespace_version, stored_at)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[str, str, int, float]]" = (
+            OrderedDict()
+        )
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is None:
+            self._max_entries = settings.answer_cache_max_entries
+        return self._max_entries
+
+    @property
+    def ttl_s(self) -> float:
+        if self._ttl_s is None:
+            self._ttl_s = settings.answer_cache_ttl_s
+        return self._ttl_s
+
+    @staticmethod
+    def make_key(user_input: str, lang: str, context: str) -> Tuple[str, str, str]:
+        """
+        Build the cache key from the normalized input, language and context hash.
+        """
+        ctx_hash = hashlib.sha1(context.encode()).hexdigest()
+        return normalize_query(user_input), lang, ctx_hash
+
+    @staticmethod
+    def _disk_key(key: Tuple[str, str, str]) -> str:
+        return hashlib.sha1("\x1f".join(key).encode()).hexdigest()
+
+    @staticmethod
+    def _disk_version(namespace: str) -> str:
+        from services.llm import CHAT_MODEL
+
+        return f"{CHAT_MODEL}:{namespace_version(namespace)}"
+
+    def get(self, key: Tuple[str, str, str], namespace: Optional[str] = None) -> Optional[str]:
+        """
+        Return the cached answer for `key`, or None on miss/expiry/invalidation.
+        Falls back to the disk cache; `namespace` defaults to the key's language.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                answer, ns, version, stored_at = entry
+                expired = time.monotonic() - stored_at > self.ttl_s
+                if expired or version != namespace_version(ns):
+                    del self._entries[key]
+                    entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return answer
+        answer = self._load(key, key[1] if namespace is None else namespace)
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return answer
+
+    def _load(self, key: Tuple[str, str, str], namespace: str) -> Optional[str]:
+        disk = get_disk_cache() if self.persistent else None
+        if disk is None or self.max_entries <= 0:
+            return None
+        blob = disk.get("answer", self._disk_key(key), self._disk_version(namespace))
+        record_cache("disk_answer", blob is not None)
+        if blob is None:
+            return None
+        answer = blob.decode("utf-8")
+        self._remember(key, answer, namespace)
+        return answer
+
+    def put(self, key: Tuple[str, str, str], answer: str, namespace: str) -> None:
+        """
+        Store `answer` under `key`, evicting the least recently used entries.
+        """
+        if not answer or self.max_entries <= 0:
+            return
+        self._remember(key, answer, namespace)
+        disk = get_disk_cache() if self.persistent else None
+        if disk is not None:
+            disk.put(
+                "answer", self._disk_key(key), answer.encode("utf-8"), self._disk_version(namespace), ttl_s=self.ttl_s
+            )
+
+    def _remember(self, key: Tuple[str, str, str], answer: str, namespace: str) -> None:
+        with self._lock:
+            self._entries[key] = (
+                answer,
+                namespace,
+                namespace_version(namespace),
+                time.monotonic(),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        """
+        Drop every in-process entry built from `namespace`. Returns the number removed.
+        """
+        with self._lock:
+            stale = [k for k, v in self._entries.items() if v[1] == namespace]
+            for k in stale:
+                del self._entries[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return size and hit/miss counters.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+async def replay(answer: str, chunk_chars: int = 16) -> AsyncIterator[str]:
+    """
+    Yield a cached answer in small word-aligned chunks, like a live LLM stream.
+    """
+    buf = ""
+    for word in re.findall(r"\S+\s*|\s+", answer):
+        buf += word
+        if len(buf) >= chunk_chars:
+            yield buf
+            buf = ""
+    if buf:
+        yield buf
+
+
+answer_cache = AnswerCache(persistent=True)
+
+
+def invalidate_namespace(namespace: str) -> None:
+    """
+    Invalidate cached answers for `namespace` in this process and in every other
+    process sharing `settings.cache_dir` (called by the ingest scripts after upsert).
+    """
+    bump_namespace_version(namespace)
+    removed = answer_cache.invalidate_namespace(namespace)
+    logger.info(f"Invalidated answer cache for namespace '{namespace}' ({removed} local entries)")
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from core.settings import settings
+from services.answer_cache import normalize_query
+
+"""
+Precomputed answers for the known FAQ questions of the Jenius FX chatbot.
+An optional ingest stage generates one canonical answer per FAQ question and
+namespace; at query time a user message that matches an FAQ question (same
+normalized text, or a question embedding above
+settings.answer_store_min_similarity) is answered from the store without
+retrieval or generation.
+Stored per namespace as `<ns>.json` (entries) plus `<ns>.npy` (question vectors).
+"""
+
+logger = logging.getLogger(__name__)
+
+# (uid, text, metadata) as produced by retrieval.chunking.iter_chunks
+Chunk = Tuple[str, str, dict]
+
+# cache one store per namespace
+_STORES: Dict[str, "AnswerStore"] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def fingerprint(question: str, text: str, model: str) -> str:
+    """
+    Identify what a stored answer was generated from; a change means regenerate.
+    """
+    return hashlib.sha1(f"{model}\0{question}\0{text}".encode()).hexdigest()
+
+
+class AnswerStore:
+    """
+    Canonical answers for one namespace, indexed by normalized question text
+    and by question embedding.
+    """
+
+    def __init__(self, namespace: str, root: Optional[str] = None):
+        self.namespace = namespace
+        self.root = root or settings.answer_store_dir
+        self.entries: List[dict] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._by_question: Dict[str, int] = {}
+        self.mtime = 0
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.root, f"{self.namespace or '_'}.json")
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _reindex(self) -> None:
+        self._by_question = {normalize_query(e["question"]): n for n, e in enumerate(self.entries)}
+
+    # ── persistence ───────────────────────────────────────────────────
+    def load(self) -> "AnswerStore":
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+            vectors = np.load(self.path[:-5] + ".npy")
+        except FileNotFoundError:
+            return self
+        except Exception as e:
+            logger.error(f"Failed to load answer store '{self.namespace}': {e}")
+            return self
+        self.entries, self.vectors, self.mtime = entries, vectors, mtime
+        self._reindex()
+        return self
+
+    def save(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        # vectors first: readers reload when the json mtime moves
+        np.save(self.path[:-5] + ".tmp.npy", self.vectors)
+        os.replace(self.path[:-5] + ".tmp.npy", self.path[:-5] + ".npy")
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.mtime = os.stat(self.path).st_mtime_ns
+        logger.info(f"Saved answer store '{self.namespace}' with {len(self)} answers")
+
+    def is_stale(self) -> bool:
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime
+        except OSError:
+            return bool(self.entries)
+
+    # ── lookup ────────────────────────────────────────────────────────
+    def exact(self, query: str) -> Optional[dict]:
+        n = self._by_question.get(normalize_query(query))
+        return self.entries[n] if n is not None else None
+
+    def nearest(self, vector: List[float]) -> Optional[dict]:
+        """
+        Return the entry whose question embedding is closest to `vector`, if it
+        clears settings.answer_store_min_similarity.
+        """
+        if not self.entries:
+            return None
+        q = np.asarray(vector, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        sims = self.vectors @ q
+        best = int(np.argmax(sims))
+        if sims[best] < settings.answer_store_min_similarity:
+            return None
+        return self.entries[best]
+
+    # ── build ─────────────────────────────────────────────────────────
+    def build(
+        self,
+        chunks: List[Chunk],
+        embedder: Embeddings,
+        generate: Callable[[str, str, dict], str],
+        model: str,
+        workers: int = 4,
+    ) -> Tuple[int, int]:
+        """
+        (Re)generate answers for `chunks`, reusing stored answers whose FAQ
+        question, FAQ answer and model are unchanged. Questions absent from
+        `chunks` are dropped.
+        Args:
+            chunks: FAQ chunks; the question is metadata["question"].
+            embedder: Embeddings used to index the questions.
+            generate: Called as generate(question, faq_text, metadata) -> answer.
+            model: Chat model name, part of each entry's fingerprint.
+            workers: Concurrent generation calls.
+        Returns:
+            (generated, reused) counts.
+        """
+        old = {(e["id"], e["fingerprint"]): (e, self.vectors[n]) for n, e in enumerate(self.entries)}
+        entries: List[Optional[dict]] = []
+        vectors: List[Optional[np.ndarray]] = []
+        todo: List[int] = []
+        for uid, text, meta in chunks:
+            fp = fingerprint(meta["question"], text, model)
+            hit = old.get((uid, fp))
+            entries.append(hit[0] if hit else None)
+            vectors.append(hit[1] if hit else None)
+            if hit is None:
+                todo.append(len(entries) - 1)
+
+        def make(i: int) -> dict:
+            uid, text, meta = chunks[i]
+            return {
+                "id": uid,
+                "question": meta["question"],
+                "answer": generate(meta["question"], text, meta),
+                "source": meta.get("source", ""),
+                "fingerprint": fingerprint(meta["question"], text, model),
+            }
+
+        with ThreadPoolExecutor(max(1, workers), thread_name_prefix="answers") as pool:
+            futures = {i: pool.submit(make, i) for i in todo}
+            for i, fut in futures.items():
+                try:
+                    entries[i] = fut.result()
+                except Exception as e:
+                    logger.error(f"Failed to generate answer for {chunks[i][0]}: {e}")
+        if todo:
+            done = [i for i in todo if entries[i] is not None]
+            for i, v in zip(done, embedder.embed_documents([entries[i]["question"] for i in done])):
+                v = np.asarray(v, dtype=np.float32)
+                vectors[i] = v / (np.linalg.norm(v) or 1.0)
+
+        keep = [i for i, e in enumerate(entries) if e is not None]
+        self.entries = [entries[i] for i in keep]
+        self.vectors = (
+            np.stack([vectors[i] for i in keep]).astype(np.float32)
+            if keep
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        self._reindex()
+        generated = sum(1 for i in todo if entries[i] is not None)
+        return generated, len(keep) - generated
+
+    def prune(self, chunks: List[Chunk], model: str) -> int:
+        """
+        Drop entries that no current chunk would reuse (its question or FAQ
+        answer changed, or it was removed), so exact and nearest matches never
+        serve an answer built from superseded content.
+        Returns:
+            The number of entries dropped.
+        """
+        current = {(uid, fingerprint(meta["question"], text, model)) for uid, text, meta in chunks}
+        keep = [n for n, e in enumerate(self.entries) if (e["id"], e["fingerprint"]) in current]
+        dropped = len(self.entries) - len(keep)
+        if dropped:
+            self.entries = [self.entries[n] for n in keep]
+            self.vectors = self.vectors[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+            self._reindex()
+        return dropped
+
+
+def get_answer_store(namespace: str = "") -> AnswerStore:
+    """
+    Return the cached AnswerStore for `namespace`, reloading it when the file
+    on disk was rebuilt (by an ingest in another process).
+    """
+    with _STORES_LOCK:
+        store = _STORES.get(namespace)
+        if store is None or store.is_stale():
+            store = _STORES[namespace] = AnswerStore(namespace).load()
+        return store
+
+
+def precompute_answers(
+    namespace: str,
+    chunks: List[Chunk],
+    embedder: Embeddings,
+    generate: Callable[[str, str, dict], str],
+    model: str,
+    workers: int = 4,
+) -> AnswerStore:
+    """
+    Build, persist and swap in the answer store for `namespace` (used by ingest).
+    """
+    store = AnswerStore(namespace).load()
+    generated, reused = store.build(chunks, embedder, generate, model, workers)
+    store.save()
+    with _STORES_LOCK:
+        _STORES[namespace] = store
+    logger.info(f"Answer store '{namespace}': {generated} generated, {reused} reused")
+    return store
+
+
+def prune_answers(namespace: str, chunks: List[Chunk], model: str) -> int:
+    """
+    Drop stored answers for `namespace` that `chunks` no longer back, persist
+    and swap in the result (used by ingest runs that do not precompute).
+    """
+    store = AnswerStore(namespace).load()
+    dropped = store.prune(chunks, model)
+    if dropped:
+        store.save()
+        with _STORES_LOCK:
+            _STORES[namespace] = store
+        logger.info(f"Answer store '{namespace}': dropped {dropped} outdated answers")
+    return dropped
+
@@ -0,0 +1,147 @@
+import asyncio
+import importlib
+import logging
+import threading
+import time
+import weakref
+from typing import Optional
+
+import httpx
+
+from core.settings import settings
+
+"""
+Long-lived network clients for the Jenius FX chatbot.
+One pooled HTTP client (per event loop, for async) is shared by every OpenAI
+chat/embedding call, and the app lifespan warms up the Pinecone index, vector
+stores and embedding path before the service reports ready.
+"""
+
+logger = logging.getLogger(__name__)
+
+_LOCK = threading.Lock()
+_HTTP_CLIENT: Optional[httpx.Client] = None
+# httpx.AsyncClient pools are bound to the loop that created them
+_ASYNC_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+_READY = threading.Event()
+_WARMUP_ERROR: Optional[str] = None
+_WARMUP_SECONDS: Optional[float] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive,
+        keepalive_expiry=60.0,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.http_timeout_s, connect=10.0)
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Return the process-wide pooled sync HTTP client for OpenAI calls.
+    """
+    global _HTTP_CLIENT
+    with _LOCK:
+        if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+            _HTTP_CLIENT = httpx.Client(limits=_limits(), timeout=_timeout())
+        return _HTTP_CLIENT
+
+
+def get_async_http_client() -> Optional[httpx.AsyncClient]:
+    """
+    Return the pooled async HTTP client for the running event loop
+    (None outside a loop, in which case the OpenAI SDK creates its own).
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    with _LOCK:
+        client = _ASYNC_HTTP_CLIENTS.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+            _ASYNC_HTTP_CLIENTS[loop] = client
+        return client
+
+
+# ───────────────────────── LIFESPAN ────────────────────────────────────
+def is_ready() -> bool:
+    return _READY.is_set()
+
+
+def readiness() -> dict:
+    """
+    Report warm-up state for the readiness probe.
+    """
+    return {
+        "ready": _READY.is_set(),
+        "warmup_seconds": _WARMUP_SECONDS,
+        "error": _WARMUP_ERROR,
+    }
+
+
+async def warmup(namespaces=("en", "id")) -> None:
+    """
+    Resolve the index, build and open the per-namespace vector stores, load
+    the local indexes and language model, and do one embedding round trip so
+    the first real request pays no connection or initialization cost.
+    """
+    global _WARMUP_ERROR, _WARMUP_SECONDS
+    from retrieval.embeddings import get_embeddings
+    from retrieval.lexical_index import get_lexical_index
+    from retrieval.vector_store import get_vectorstore
+    from services.lang_detect import get_classifier
+    from services.llm import chat_model_for
+
+    start = time.perf_counter()
+    try:
+        # imports, model and index files load off the event loop, which is already serving /ready
+        await asyncio.to_thread(importlib.import_module, "langchain_openai")
+        await asyncio.to_thread(get_classifier)
+        # the model is keyed on this loop's HTTP client, which only the loop can look up
+        await asyncio.to_thread(chat_model_for, get_async_http_client())
+        for ns in namespaces:
+            await asyncio.to_thread(get_lexical_index, ns)
+            store = await asyncio.to_thread(get_vectorstore, ns)
+            if hasattr(store, "__aenter__"):
+                # keep the async Pinecone client open so queries reuse its session
+                await store.__aenter__()
+        await get_embeddings().abase().aembed_query("warmup")
+        _WARMUP_ERROR = None
+        # only a completed warm-up makes the worker ready; a failed one leaves /ready at 503
+        _READY.set()
+    except Exception as e:
+        _WARMUP_ERROR = str(e)
+        logger.error(f"Warm-up failed: {e}")
+    finally:
+        _WARMUP_SECONDS = round(time.perf_counter() - start, 3)
+        logger.info(f"Warm-up finished in {_WARMUP_SECONDS}s")
+
+
+async def shutdown() -> None:
+    """
+    Close the pooled clients and any open async vector-store sessions.
+    """
+    from retrieval.vector_store import _VECTORSTORES
+
+    for store in list(_VECTORSTORES.values()):
+        if hasattr(store, "aclose"):
+            try:
+                await store.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close vector store: {e}")
+    with _LOCK:
+        clients = list(_ASYNC_HTTP_CLIENTS.values())
+        _ASYNC_HTTP_CLIENTS.clear()
+    for client in clients:
+        await client.aclose()
+    if _HTTP_CLIENT is not None:
+        _HTTP_CLIENT.close()
+    _READY.clear()
@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from core.metrics import REQUESTS, STREAM_OUTCOMES, record_cache
+from core.settings import settings
+
+"""
+Request coalescing and admission control for the chat pipeline.
+SingleFlight lets concurrent identical requests share one upstream call (or
+one token stream, fanned out to every subscriber). AdmissionController caps
+the number of chat streams in flight and rejects quickly once its wait queue
+is full, so a traffic spike degrades into 429/503s instead of exhausting the
+OpenAI rate limit for everyone. GuardedStream ends a stream (and cancels its
+upstream generation) when the client disconnects, a max duration passes or a
+token cap is reached, so abandoned streams stop costing tokens and slots.
+State is kept per event loop (asyncio primitives are bound to their loop).
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """
+    One in-progress upstream stream: the chunks produced so far plus a
+    condition that wakes subscribers when more arrive.
+    """
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent work by key.
+    `do` shares the result of one coroutine; `stream` shares one async
+    iterator, replaying the chunks already produced to late joiners.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn(), or the result of an identical call already in flight.
+        """
+        fut = self._calls.get(key)
+        record_cache(self.name, fut is not None)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._calls[key] = fut
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            if not fut.done():
+                fut.set_exception(e)
+                fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Yield the chunks of factory(), shared with every concurrent caller of the
+        same key. The upstream iterator runs in its own task, so one subscriber
+        going away does not cut the others off; it is cancelled when the last
+        subscriber leaves.
+        """
+        flight = self._flights.get(key)
+        if flight is not None and flight.task is not None and flight.task.cancelling():
+            flight = None  # its last subscriber just left; start over
+        record_cache(self.name, flight is not None)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._pump(key, flight, factory))
+        flight.subscribers += 1
+        try:
+            sent = 0
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: len(flight.chunks) > sent or flight.done)
+                    pending = flight.chunks[sent:]
+                    finished = flight.done
+                for chunk in pending:
+                    yield chunk
+                sent += len(pending)
+                if finished and sent == len(flight.chunks):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task is not None:
+                flight.task.cancel()
+
+    async def _pump(self, key: Hashable, flight: _Flight, factory: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for chunk in factory():
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+        except Exception as e:
+            logger.error(f"Coalesced {self.name} stream failed: {e}")
+            flight.error = e
+        finally:
+            # later arrivals start a fresh flight instead of replaying a finished one
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request cannot be admitted.
+    status_code is 429 when the wait queue is full, 503 when the wait timed out.
+    """
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Ticket:
+    """
+    An admitted request's slot; release() is idempotent.
+    """
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a bounded, time-limited wait queue.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout_s: float):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout_s = queue_timeout_s
+        self.active = 0
+        self.waiting = 0
+        self._sem = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self) -> Ticket:
+        """
+        Take a slot, waiting up to queue_timeout_s for one to free up.
+        Raises Overloaded without waiting when the queue is already full.
+        """
+        if self.active >= self.max_concurrent and self.waiting >= self.max_queued:
+            REQUESTS.inc(outcome="rejected")
+            raise Overloaded(429, "Too many requests in flight, please retry shortly.")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            REQUESTS.inc(outcome="timed_out")
+            raise Overloaded(503, "Service is busy, please retry shortly.")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return Ticket(self)
+
+    def _release(self) -> None:
+        self.active -= 1
+        self._sem.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"active": self.active, "waiting": self.waiting, "limit": self.max_concurrent}
+
+
+class GuardedStream:
+    """
+    Async-iterable wrapper ending a chunk stream on whichever comes first:
+    the upstream finishing, `disconnected()` returning, max_duration_s passing
+    or max_chunks chunks (≈ tokens) having been yielded. Every ending other
+    than completion cancels the upstream generator immediately.
+    `outcome` is then "completed", "disconnected", "timeout", "token_cap" or "error".
+    """
+
+    def __init__(
+        self,
+        chunks: AsyncIterator[str],
+        max_duration_s: Optional[float] = None,
+        max_chunks: Optional[int] = None,
+        disconnected: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
+        self.chunks = chunks
+        self.max_duration_s = max_duration_s
+        self.max_chunks = max_chunks
+        self.disconnected = disconnected
+        self.outcome: Optional[str] = None
+        self.sent = 0
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_duration_s if self.max_duration_s else None
+        watcher = asyncio.ensure_future(self.disconnected()) if self.disconnected else None
+        upstream = self.chunks.__aiter__()
+        pending: Optional[asyncio.Future] = None
+        try:
+            while True:
+                pending = asyncio.ensure_future(upstream.__anext__())
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                done, _ = await asyncio.wait(
+                    [f for f in (pending, watcher) if f is not None],
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if pending not in done:
+                    self.outcome = "disconnected" if watcher is not None and watcher in done else "timeout"
+                    return
+                try:
+                    chunk = pending.result()
+                except StopAsyncIteration:
+                    self.outcome = "completed"
+                    return
+                except Exception:
+                    self.outcome = "error"
+                    raise
+                pending = None
+                self.sent += 1
+                yield chunk
+                if self.max_chunks and self.sent >= self.max_chunks:
+                    self.outcome = "token_cap"
+                    return
+        finally:
+            # the consumer went away mid-stream (e.g. the response task was cancelled)
+            self.outcome = self.outcome or "disconnected"
+            if watcher is not None:
+                watcher.cancel()
+            if self.outcome != "completed":
+                if pending is not None:
+                    pending.cancel()  # unwinds the upstream generator, closing its HTTP stream
+                else:
+                    aclose = getattr(upstream, "aclose", None)
+                    if aclose is not None:
+                        asyncio.ensure_future(aclose())
+            STREAM_OUTCOMES.inc(outcome=self.outcome)
+            if self.outcome != "completed":
+                logger.info(f"Stream ended early ({self.outcome}) after {self.sent} chunks")
+
+
+_LOCK = threading.Lock()
+_CONTROLLERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AdmissionController]" = (
+    weakref.WeakKeyDictionary()
+)
+_FLIGHTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, SingleFlight]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_admission() -> AdmissionController:
+    """
+    Return the admission controller of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        controller = _CONTROLLERS.get(loop)
+        if controller is None:
+            controller = AdmissionController(
+                settings.max_concurrent_streams,
+                settings.max_queued_streams,
+                settings.queue_timeout_s,
+            )
+            _CONTROLLERS[loop] = controller
+        return controller
+
+
+def single_flight(name: str) -> SingleFlight:
+    """
+    Return the named SingleFlight group of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        groups = _FLIGHTS.setdefault(loop, {})
+        if name not in groups:
+            groups[name] = SingleFlight(name)
+        return groups[name]
@@ -0,0 +1,107 @@
+import logging
+import re
+from typing import List, NamedTuple, Optional, Set
+
+from core.settings import settings
+from services.llm import count_tokens
+
+"""
+Context assembly for the Jenius FX chatbot.
+Packs retrieved FAQ chunks into a compact Q/A context under a token budget,
+dropping near-duplicates (the EN and ID PDFs overlap heavily).
+"""
+
+logger = logging.getLogger(__name__)
+
+NO_CONTEXT = "No relevant context."
+
+_WORD = re.compile(r"\w+")
+
+
+class ContextResult(NamedTuple):
+    text: str
+    tokens: int  # tokens used by `text`
+    used: int  # chunks packed
+    duplicates: int  # chunks dropped as near-duplicates
+    truncated: int  # chunks dropped (or cut) for the budget
+
+
+def _shingles(text: str, n: int = 3) -> Set[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) < n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + n]) for i in range(len(words) - n + 1)}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _format(doc) -> str:
+    """
+    Render a chunk as "Q: ...\\nA: ..." when the FAQ question is in its metadata.
+    """
+    meta = getattr(doc, "metadata", None)
+    question = meta.get("question") if isinstance(meta, dict) else None
+    answer = doc.page_content.strip()
+    if isinstance(question, str) and question.strip():
+        return f"Q: {question.strip()}\nA: {answer}"
+    return answer
+
+
+def _truncate(text: str, budget: int) -> str:
+    # shrink proportionally, then step down until the tokenizer agrees
+    tokens = count_tokens(text)
+    while text and tokens > budget:
+        text = text[: max(0, int(len(text) * budget / tokens) - 1)].rstrip()
+        tokens = count_tokens(text)
+    return text
+
+
+def build_context(
+    docs: List,
+    budget: Optional[int] = None,
+    dedup_threshold: Optional[float] = None,
+) -> ContextResult:
+    """
+    Pack `docs` (in retrieval order) into a Q/A context of at most `budget` tokens.
+    Args:
+        docs: Retrieved Document objects, best first.
+        budget: Token budget (defaults to settings.context_token_budget).
+        dedup_threshold: Word-trigram Jaccard similarity above which a chunk is
+            considered a near-duplicate of one already packed.
+    Returns:
+        ContextResult with the context text and how many tokens it used.
+    """
+    budget = settings.context_token_budget if budget is None else budget
+    threshold = settings.context_dedup_threshold if dedup_threshold is None else dedup_threshold
+
+    blocks: List[str] = []
+    kept: List[Set[str]] = []
+    used_tokens = duplicates = truncated = 0
+    sep_tokens = count_tokens("\n\n")
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        if any(_jaccard(shingles, k) >= threshold for k in kept):
+            duplicates += 1
+            continue
+        block = _format(doc)
+        cost = count_tokens(block) + (sep_tokens if blocks else 0)
+        if used_tokens + cost > budget:
+            truncated += 1
+            if blocks:
+                continue
+            # the best chunk alone is over budget: keep its head rather than nothing
+            block = _truncate(block, budget)
+            if not block:
+                continue
+            cost = count_tokens(block)
+        blocks.append(block)
+        kept.append(shingles)
+        used_tokens += cost
+
+    if not blocks:
+        return ContextResult(NO_CONTEXT, count_tokens(NO_CONTEXT), 0, duplicates, truncated)
+    return ContextResult("\n\n".join(blocks), used_tokens, len(blocks), duplicates, truncated)
@@ -0,0 +1,347 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, Optional, Tuple, Type
+
+from langchain_core.messages import AIMessageChunk, ToolMessage
+from langchain_core.messages.ai import add_usage
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from core.metrics import record_cache, span
+from core.settings import settings
+from retrieval import vector_store
+from services import fx_rates
+
+"""
+Tool calling for the Jenius FX chatbot.
+Tools (FX rate lookup, fee calculation, FAQ search) are registered here and
+bound to the ChatOpenAI model. When the model asks for several tools in one
+turn they run concurrently, each under its own timeout, and results are
+memoized per (tool, arguments) for the tool's TTL. Tool results go back to the
+model and its final answer is streamed to the caller, so a multi-step answer
+costs one round of parallel tool work instead of serial hops.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class Tool:
+    """
+    A callable exposed to the model.
+    fn receives the validated arguments as keyword arguments and may be sync
+    (run in a worker thread) or async.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        args_schema: Type[BaseModel],
+        fn: Callable[..., Any],
+        timeout_s: Optional[float] = None,
+        cache_ttl_s: float = 0.0,
+    ):
+        self.name = name
+        self.description = description
+        self.args_schema = args_schema
+        self.fn = fn
+        self.timeout_s = timeout_s
+        self.cache_ttl_s = cache_ttl_s
+
+    def spec(self) -> dict:
+        """
+        OpenAI function-calling schema for `bind_tools`.
+        """
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.args_schema.model_json_schema(),
+            },
+        }
+
+    def validate(self, args: dict) -> dict:
+        """
+        Validated, normalized arguments (raises pydantic.ValidationError).
+        """
+        return self.args_schema(**args).model_dump()
+
+    async def __call__(self, args: dict) -> Any:
+        kwargs = self.validate(args)
+        if asyncio.iscoroutinefunction(self.fn):
+            return await self.fn(**kwargs)
+        return await asyncio.to_thread(self.fn, **kwargs)
+
+
+# registered tools, by name
+TOOLS: Dict[str, Tool] = {}
+
+
+def register_tool(
+    name: str,
+    description: str,
+    args_schema: Type[BaseModel],
+    timeout_s: Optional[float] = None,
+    cache_ttl_s: float = 0.0,
+):
+    """
+    Decorator registering `fn` as a tool available to the model.
+    """
+
+    def decorator(fn):
+        TOOLS[name] = Tool(name, description, args_schema, fn, timeout_s, cache_ttl_s)
+        return fn
+
+    return decorator
+
+
+# ───────────────────────── 1 ─ RESULT CACHE ────────────────────────────
+class ToolResultCache:
+    """
+    Thread-safe LRU of tool results keyed on (tool, canonical arguments), with a per-entry TTL.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (result, expires_at)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(name: str, args: dict) -> Tuple[str, str]:
+        """
+        `args` should be the tool's validated arguments (`Tool.validate`), so
+        spellings the schema normalizes (defaults, currency case) share an entry.
+        """
+        canonical = json.dumps(args, sort_keys=True, ensure_ascii=False)
+        return name, hashlib.sha1(canonical.encode()).hexdigest()
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() > entry[1]:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Tuple[str, str], result: str, ttl_s: float) -> None:
+        if ttl_s <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (result, time.monotonic() + ttl_s)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+tool_cache = ToolResultCache()
+
+
+# ───────────────────────── 2 ─ EXECUTION ───────────────────────────────
+async def run_tool_call(call: dict) -> ToolMessage:
+    """
+    Run one model-requested tool call under its timeout, using the memoized
+    result when there is one. Failures are reported to the model, not raised.
+    """
+    name, args, call_id = call["name"], call.get("args") or {}, call["id"]
+    tool = TOOLS.get(name)
+    if tool is None:
+        return ToolMessage(content=json.dumps({"error": f"unknown tool '{name}'"}), tool_call_id=call_id)
+
+    try:
+        args = tool.validate(args)
+    except ValidationError as e:
+        return ToolMessage(content=json.dumps({"error": f"invalid arguments: {e}"}), tool_call_id=call_id)
+
+    key = tool_cache.make_key(name, args)
+    cached = tool_cache.get(key)
+    record_cache("tool", cached is not None)
+    if cached is not None:
+        return ToolMessage(content=cached, tool_call_id=call_id)
+
+    timeout = tool.timeout_s or settings.tool_timeout_s
+    try:
+        with span(f"tool:{name}"):
+            result = await asyncio.wait_for(tool(args), timeout=timeout)
+        content = json.dumps(result, ensure_ascii=False, default=str)
+        # an error the tool reported (stale rates, bad input) must not outlive its cause
+        if not (isinstance(result, dict) and "error" in result):
+            tool_cache.put(key, content, tool.cache_ttl_s)
+    except asyncio.TimeoutError:
+        logger.warning(f"Tool '{name}' timed out after {timeout}s")
+        content = json.dumps({"error": f"'{name}' timed out"})
+    except Exception as e:
+        logger.error(f"Tool '{name}' failed: {e}")
+        content = json.dumps({"error": str(e)})
+    return ToolMessage(content=content, tool_call_id=call_id)
+
+
+async def run_tool_calls(calls: List[dict]) -> List[ToolMessage]:
+    """
+    Run every tool call of one model turn concurrently; results keep call order.
+    """
+    return list(await asyncio.gather(*(run_tool_call(c) for c in calls)))
+
+
+def bind_tools(llm, names: Optional[List[str]] = None):
+    """
+    Bind the registered tools (or the named subset) to a chat model.
+    """
+    tools = [TOOLS[n] for n in names] if names else list(TOOLS.values())
+    return llm.bind_tools([t.spec() for t in tools])
+
+
+class ToolRun:
+    """
+    One tool-augmented generation: stream the model, run any requested tools in
+    parallel, feed the results back, and repeat until the model answers (at
+    most settings.tool_max_rounds tool rounds).
+    `tool_calls` counts the tool calls made, so callers can tell whether the
+    answer depends on live data; `usage` sums the usage_metadata of every model turn.
+    """
+
+    def __init__(self, llm, names: Optional[List[str]] = None):
+        self.llm = llm
+        self.bound = bind_tools(llm, names)
+        self.tool_calls = 0
+        self.usage: Optional[dict] = None
+
+    def _add_usage(self, chunk) -> None:
+        meta = getattr(chunk, "usage_metadata", None)
+        if isinstance(meta, dict):
+            self.usage = add_usage(self.usage, meta)
+
+    async def astream(self, messages: List) -> AsyncIterator[str]:
+        messages = list(messages)
+        for _ in range(settings.tool_max_rounds):
+            turn: Optional[AIMessageChunk] = None
+            async for chunk in self.bound.astream(messages):
+                self._add_usage(chunk)
+                if chunk.content:
+                    yield chunk.content
+                turn = chunk if turn is None else turn + chunk
+            if turn is None or not turn.tool_calls:
+                return
+            self.tool_calls += len(turn.tool_calls)
+            logger.info(f"Running {len(turn.tool_calls)} tool call(s): {[c['name'] for c in turn.tool_calls]}")
+            messages += [turn] + await run_tool_calls(turn.tool_calls)
+        # out of tool rounds: answer with what has been gathered
+        async for chunk in self.llm.astream(messages):
+            self._add_usage(chunk)
+            if chunk.content:
+                yield chunk.content
+
+
+# ───────────────────────── 3 ─ TOOLS ───────────────────────────────────
+def _upper(code: str) -> str:
+    return code.strip().upper()
+
+
+class FxRateArgs(BaseModel):
+    source: str = Field(description="ISO 4217 code of the currency to convert from, e.g. USD")
+    target: str = Field(default="IDR", description="ISO 4217 code of the currency to convert to")
+    amount: float = Field(default=1.0, description="Amount in the source currency")
+
+    _codes = field_validator("source", "target")(_upper)
+
+
+@register_tool(
+    "get_fx_rate",
+    "Current indicative Jenius exchange rate between two currencies, and the converted amount.",
+    FxRateArgs,
+    cache_ttl_s=60.0,
+)
+def get_fx_rate(source: str, target: str, amount: float) -> dict:
+    service = fx_rates.get_fx_service()
+    table = service.table
+    if table is None or service.is_stale():
+        return {"error": "exchange rates are currently unavailable"}
+    converted = table.convert(amount, source, target)[0]
+    return {
+        "source": source,
+        "target": target,
+        "amount": amount,
+        "rate": table.rate(source, target),
+        "converted": round(float(converted), 2),
+        "as_of": table.as_of,
+    }
+
+
+class FeeArgs(BaseModel):
+    transaction_type: str = Field(description="Fee schedule entry, e.g. transfer_out or withdrawal")
+    amount: float = Field(description="Transaction amount")
+    currency: str = Field(description="ISO 4217 code of the transaction amount")
+
+    _codes = field_validator("currency")(_upper)
+
+
+def load_fee_schedule() -> Dict[str, dict]:
+    """
+    Read settings.fee_schedule_file:
+        {"<transaction_type>": {"currency": "USD", "flat": 5.0, "percent": 0.1, "min": 0, "max": null}}
+    """
+    with open(settings.fee_schedule_file, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@register_tool(
+    "calculate_fee",
+    "Fee Jenius charges for a foreign-currency transaction of the given type and amount.",
+    FeeArgs,
+    cache_ttl_s=300.0,
+)
+def calculate_fee(transaction_type: str, amount: float, currency: str) -> dict:
+    try:
+        schedule = load_fee_schedule()
+    except FileNotFoundError:
+        return {"error": "fee schedule unavailable; search the FAQ instead"}
+    entry = schedule.get(transaction_type)
+    if entry is None:
+        return {"error": f"unknown transaction type; known: {sorted(schedule)}"}
+    fee_currency = entry.get("currency", currency).upper()
+    service = fx_rates.get_fx_service()
+    table = service.table
+    if fee_currency != currency and (table is None or service.is_stale()):
+        return {"error": "exchange rates are currently unavailable"}
+    base_amount = amount if fee_currency == currency else float(table.convert(amount, currency, fee_currency)[0])
+    fee = entry.get("flat", 0.0) + entry.get("percent", 0.0) / 100.0 * base_amount
+    if entry.get("min") is not None:
+        fee = max(fee, entry["min"])
+    if entry.get("max") is not None:
+        fee = min(fee, entry["max"])
+    return {"transaction_type": transaction_type, "fee": round(fee, 2), "fee_currency": fee_currency}
+
+
+class FaqSearchArgs(BaseModel):
+    query: str = Field(description="Question to search the Jenius FCY FAQ for")
+    lang: Literal["en", "id"] = Field(default="en", description="Language of the FAQ to search")
+
+
+@register_tool(
+    "search_faq",
+    "Search the Jenius foreign-currency FAQ; returns the most relevant questions and answers.",
+    FaqSearchArgs,
+    cache_ttl_s=300.0,
+)
+async def search_faq(query: str, lang: str) -> List[dict]:
+    docs = await vector_store.aretrieve_docs(query, lang=lang, k=settings.retrieval_k)
+    return [
+        {
+            "question": d.metadata.get("question", ""),
+            "answer": d.page_content,
+            "source": d.metadata.get("source", ""),
+        }
+        for d in docs
+    ]
@@ -0,0 +1,400 @@
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.settings import settings
+from services.clients import get_http_client
+
+"""
+FX rate service for the Jenius FX chatbot.
+Rates come from a pluggable provider (a local JSON file, or an HTTP endpoint
+serving the same document), are held in a compact numpy table that is swapped
+atomically on refresh, refreshed on a background thread, and snapshotted to
+disk so a restart serves rates immediately. Conversion is vectorized over many
+amounts and currency pairs. `answer_rate_question` answers "how much is 100 USD
+in IDR"-style questions from this table, so the chat pipeline can skip
+retrieval and generation for them.
+
+Provider document:
+    {"base": "IDR", "as_of": "2026-10-17T09:00:00Z", "rates": {"USD": 16250.0, ...}}
+where each rate is the number of `base` units per one unit of the currency.
+"""
+
+logger = logging.getLogger(__name__)
+
+ISO_CODES = re.compile(r"\b([A-Za-z]{3})\b")
+AMOUNT = r"(\d[\d.,]*)"
+_CODE = r"\b([A-Za-z]{3})\b"
+_INTO = r"\s*(?:to|in|into|ke|dalam|jadi|=)\s*"
+# explicit conversions only, each yielding (amount or None, source, target):
+# "100 USD to IDR", "1.000.000 rupiah ke SGD"
+_AMOUNT_FIRST = re.compile(rf"{AMOUNT}\s*{_CODE}{_INTO}{_CODE}", re.IGNORECASE)
+# "USD 100 to IDR"
+_CODE_FIRST = re.compile(rf"{_CODE}\s*{AMOUNT}{_INTO}{_CODE}", re.IGNORECASE)
+# "how much is USD in IDR", "what is 1 SGD in USD", "berapa USD ke IDR"
+_QUESTION = re.compile(
+    rf"\b(?:how much is|how much|what is|what's|berapa)\s+(?:(?:1|one|a|satu)\s+)?{_CODE}{_INTO}{_CODE}",
+    re.IGNORECASE,
+)
+# "USD/IDR"
+_PAIR = re.compile(rf"{_CODE}\s*/\s*{_CODE}", re.IGNORECASE)
+# "USD rate", "kurs USD", "exchange rate for SGD"
+_RATE_WORDS = re.compile(r"\b(rate|rates|kurs|nilai tukar|exchange)\b", re.IGNORECASE)
+# fee, limit, how-to and why questions mention currencies too; they belong to the FAQ
+_NOT_A_QUOTE = re.compile(
+    r"\b(fees?|charges?|cost|biaya|limits?|batas\w*|maksimum|minimum|cara|why|kenapa|mengapa|bagaimana"
+    r"|different|beda|berbeda)\b|\bhow\b(?!\s+much)",
+    re.IGNORECASE,
+)
+_ALIASES = {"rupiah": "IDR", "rp": "IDR"}
+# codes that are also everyday words only count when typed in capitals
+_AMBIGUOUS = {"ALL", "TRY", "TOP", "CUP", "MOP", "BAM", "MAD"}
+
+
+# ───────────────────────── 1 ─ PROVIDERS ───────────────────────────────
+class RateProvider:
+    """
+    Source of rates. `fetch` returns (base, as_of epoch seconds, {currency: base per unit}).
+    """
+
+    name = "provider"
+
+    def fetch(self) -> Tuple[str, float, Dict[str, float]]:
+        raise NotImplementedError
+
+
+def _parse_document(doc: dict) -> Tuple[str, float, Dict[str, float]]:
+    base = str(doc["base"]).upper()
+    as_of = doc.get("as_of")
+    if isinstance(as_of, str):
+        as_of = datetime.datetime.fromisoformat(as_of.replace("Z", "+00:00")).timestamp()
+    rates = {str(c).upper(): float(r) for c, r in doc["rates"].items() if float(r) > 0}
+    rates[base] = 1.0
+    return base, float(as_of or time.time()), rates
+
+
+class FileRateProvider(RateProvider):
+    """
+    Reads the provider document from a local JSON file (e.g. dropped by a treasury export).
+    """
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self) -> Tuple[str, float, Dict[str, float]]:
+        with open(self.path, encoding="utf-8") as f:
+            return _parse_document(json.load(f))
+
+
+class HttpRateProvider(RateProvider):
+    """
+    Fetches the provider document from an HTTP endpoint over the shared pooled client.
+    """
+
+    name = "http"
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def fetch(self) -> Tuple[str, float, Dict[str, float]]:
+        response = get_http_client().get(self.url, timeout=10.0)
+        response.raise_for_status()
+        return _parse_document(response.json())
+
+
+def make_provider() -> RateProvider:
+    """
+    Build the provider selected by settings.fx_provider.
+    """
+    if settings.fx_provider == "http":
+        if not settings.fx_rates_url:
+            raise ValueError("fx_rates_url must be set for the http FX provider")
+        return HttpRateProvider(settings.fx_rates_url)
+    return FileRateProvider(settings.fx_rates_file)
+
+
+# ───────────────────────── 2 ─ RATE TABLE ──────────────────────────────
+class RateTable:
+    """
+    Immutable rate snapshot: currency codes, an index into a float64 array of
+    base-per-unit rates, and the provider's as-of time.
+    """
+
+    def __init__(self, base: str, as_of: float, rates: Dict[str, float], fetched_at: Optional[float] = None):
+        self.base = base
+        self.as_of = as_of
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.currencies: Tuple[str, ...] = tuple(sorted(rates))
+        self.index: Dict[str, int] = {c: n for n, c in enumerate(self.currencies)}
+        self.per_unit = np.array([rates[c] for c in self.currencies], dtype=np.float64)
+
+    def __contains__(self, currency: str) -> bool:
+        return currency.upper() in self.index
+
+    def _positions(self, codes: Union[str, Sequence[str]], n: int) -> np.ndarray:
+        if isinstance(codes, str):
+            codes = [codes] * n
+        try:
+            return np.fromiter((self.index[c.upper()] for c in codes), dtype=np.intp, count=n)
+        except KeyError as e:
+            raise ValueError(f"Unknown currency: {e.args[0]}") from None
+
+    def rate(self, source: str, target: str) -> float:
+        """
+        Units of `target` per one unit of `source`.
+        """
+        return float(self.convert(1.0, source, target)[0])
+
+    def convert(
+        self,
+        amounts: Union[float, Iterable[float]],
+        sources: Union[str, Sequence[str]],
+        targets: Union[str, Sequence[str]],
+    ) -> np.ndarray:
+        """
+        Convert many amounts at once. `sources`/`targets` are one currency code
+        each or one per amount.
+        Args:
+            amounts: Amount(s) in the source currency.
+            sources: Source currency code(s).
+            targets: Target currency code(s).
+        Returns:
+            float64 array of converted amounts.
+        """
+        amounts = np.atleast_1d(np.asarray(amounts, dtype=np.float64))
+        n = len(amounts)
+        src = self._positions(sources, n)
+        dst = self._positions(targets, n)
+        return amounts * self.per_unit[src] / self.per_unit[dst]
+
+    def to_json(self) -> dict:
+        return {
+            "base": self.base,
+            "as_of": self.as_of,
+            "fetched_at": self.fetched_at,
+            "rates": dict(zip(self.currencies, self.per_unit.tolist())),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "RateTable":
+        return cls(data["base"], data["as_of"], data["rates"], data.get("fetched_at"))
+
+
+# ───────────────────────── 3 ─ SERVICE ─────────────────────────────────
+class FxRateService:
+    """
+    Current RateTable plus background refresh and on-disk snapshots.
+    Readers grab `self.table` (a reference swap, no locking on the read path).
+    """
+
+    def __init__(
+        self,
+        provider: RateProvider,
+        snapshot_path: Optional[str] = None,
+        refresh_interval_s: Optional[float] = None,
+        max_age_s: Optional[float] = None,
+    ):
+        self.provider = provider
+        self.snapshot_path = snapshot_path or settings.fx_snapshot_path
+        self.refresh_interval_s = refresh_interval_s or settings.fx_refresh_interval_s
+        self.max_age_s = max_age_s or settings.fx_max_age_s
+        self.table: Optional[RateTable] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def load_snapshot(self) -> bool:
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                self.table = RateTable.from_json(json.load(f))
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"Failed to load FX snapshot: {e}")
+            return False
+        logger.info(f"Loaded FX snapshot with {len(self.table.currencies)} currencies")
+        return True
+
+    def _save_snapshot(self, table: RateTable) -> None:
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(table.to_json(), f)
+        os.replace(tmp, self.snapshot_path)
+
+    def refresh(self) -> bool:
+        """
+        Fetch from the provider, swap in the new table and snapshot it.
+        On failure the previous table is kept (and ages towards stale).
+        """
+        with self._lock:
+            try:
+                base, as_of, rates = self.provider.fetch()
+                table = RateTable(base, as_of, rates)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"FX rate refresh from {self.provider.name} failed: {e}")
+                return False
+            self.table = table
+            self.last_error = None
+            try:
+                self._save_snapshot(table)
+            except Exception as e:
+                logger.error(f"Failed to save FX snapshot: {e}")
+            logger.info(f"Refreshed FX rates: {len(table.currencies)} currencies")
+            return True
+
+    def is_stale(self) -> bool:
+        table = self.table
+        return table is None or time.time() - table.as_of > self.max_age_s
+
+    def start(self) -> None:
+        """
+        Serve from the snapshot right away and refresh in a daemon thread.
+        """
+        if self._thread is not None:
+            return
+        self.load_snapshot()
+        self._stop.clear()
+
+        def run():
+            while True:
+                self.refresh()
+                if self._stop.wait(self.refresh_interval_s):
+                    return
+
+        self._thread = threading.Thread(target=run, name="fx-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def stats(self) -> dict:
+        table = self.table
+        return {
+            "currencies": len(table.currencies) if table else 0,
+            "as_of": table.as_of if table else None,
+            "stale": self.is_stale(),
+            "last_error": self.last_error,
+        }
+
+
+_SERVICE: Optional[FxRateService] = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_fx_service() -> FxRateService:
+    """
+    Return the process-wide FX rate service (snapshot loaded, refresh not started).
+    """
+    global _SERVICE
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            _SERVICE = FxRateService(make_provider())
+            _SERVICE.load_snapshot()
+        return _SERVICE
+
+
+# ───────────────────────── 4 ─ RATE QUESTIONS ──────────────────────────
+def _parse_amount(text: Optional[str]) -> float:
+    if not text:
+        return 1.0
+    text = text.rstrip(".,")
+    # "1,000.50" / "1.000,50" / "1.000" / "1,000": the last separator followed
+    # by exactly two digits is the decimal point
+    m = re.match(r"^(.*)[.,](\d{1,2})$", text)
+    if m:
+        return float(re.sub(r"[.,]", "", m.group(1)) + "." + m.group(2))
+    return float(re.sub(r"[.,]", "", text))
+
+
+def _code(token: str, known: set) -> Optional[str]:
+    code = token.upper()
+    if code not in known or (code in _AMBIGUOUS and not token.isupper()):
+        return None
+    return code
+
+
+def parse_rate_question(text: str, known: Iterable[str]) -> Optional[Tuple[float, str, str]]:
+    """
+    Extract (amount, source, target) from an explicit conversion or rate question.
+    Only "<amount> X to Y", "X <amount> to Y", "how much is / what is X in Y",
+    "X/Y" and a bare "X rate" (one unit into IDR) count, with codes from `known`;
+    anything asking about fees, limits, how-to or why is left to the FAQ.
+    """
+    if _NOT_A_QUOTE.search(text):
+        return None
+    known = {c.upper() for c in known}
+    for alias, code in _ALIASES.items():
+        text = re.sub(rf"\b{alias}\b", code, text, flags=re.IGNORECASE)
+    candidates = [(m.group(1), m.group(2), m.group(3)) for m in _AMOUNT_FIRST.finditer(text)]
+    candidates += [(m.group(2), m.group(1), m.group(3)) for m in _CODE_FIRST.finditer(text)]
+    candidates += [(None, m.group(1), m.group(2)) for p in (_QUESTION, _PAIR) for m in p.finditer(text)]
+    for amount, source, target in candidates:
+        source, target = _code(source, known), _code(target, known)
+        if source and target and source != target:
+            return _parse_amount(amount), source, target
+    if _RATE_WORDS.search(text) and "IDR" in known:
+        codes = [_code(tok, known) for tok in ISO_CODES.findall(text)]
+        codes = [c for c in dict.fromkeys(codes) if c and c != "IDR"]
+        if len(codes) == 1:
+            return 1.0, codes[0], "IDR"
+    return None
+
+
+def _format_number(value: float, lang: str) -> str:
+    text = f"{value:,.2f}"
+    if lang == "id":
+        text = text.replace(",", "_").replace(".", ",").replace("_", ".")
+    return text
+
+
+_ANSWER = {
+    "en": (
+        "{amount} {source} ≈ {converted} {target} "
+        "(1 {source} = {rate} {target}, as of {as_of}). "
+        "This is an indicative rate; the rate shown in the Jenius app when you transact applies."
+    ),
+    "id": (
+        "{amount} {source} ≈ {converted} {target} "
+        "(1 {source} = {rate} {target}, per {as_of}). "
+        "Ini adalah kurs indikatif; kurs yang berlaku adalah kurs di aplikasi Jenius saat transaksi."
+    ),
+}
+
+
+def answer_rate_question(text: str, lang: str = "en", service: Optional[FxRateService] = None) -> Optional[str]:
+    """
+    Answer a conversion/rate question from the local rate table.
+    Returns None if the text is not a rate question, a currency is unknown,
+    or the rates are stale (the caller then falls back to the RAG pipeline).
+    """
+    service = service or get_fx_service()
+    table = service.table
+    if table is None or service.is_stale():
+        return None
+    parsed = parse_rate_question(text, table.currencies)
+    if parsed is None:
+        return None
+    amount, source, target = parsed
+    converted = table.convert(amount, source, target)[0]
+    as_of = datetime.datetime.fromtimestamp(table.as_of, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    return _ANSWER.get(lang, _ANSWER["en"]).format(
+        amount=_format_number(amount, lang),
+        source=source,
+        converted=_format_number(converted, lang),
+        target=target,
+        rate=_format_number(table.rate(source, target), lang),
+        as_of=as_of,
+    )
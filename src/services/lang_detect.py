@@ -0,0 +1,206 @@
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage
+
+"""
+Language identification for the Jenius FX chatbot.
+A compact character n-gram naive Bayes classifier for the only two languages we
+route on (en/id), trained on the FAQ corpora and shipped as a small JSON model.
+Deterministic and microseconds per call; low-confidence inputs ("ok", "USD?")
+fall back to the session's earlier language or the conversation history.
+"""
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..", "data", "models", "lang_id.json")
+)
+LANGS = ("en", "id")
+DEFAULT_LANG = "en"
+MIN_CONFIDENCE = 0.99
+NGRAM_SIZES = (1, 2, 3)
+
+_NON_LETTER = re.compile(r"[^a-z]+")
+
+
+def _ngrams(text: str) -> Iterable[str]:
+    for word in _NON_LETTER.sub(" ", text.lower()).split():
+        padded = f" {word} "
+        for n in NGRAM_SIZES:
+            for i in range(len(padded) - n + 1):
+                gram = padded[i : i + n]
+                if gram.strip():
+                    yield gram
+
+
+class LangClassifier:
+    """
+    Multinomial naive Bayes over character 1–3-grams.
+    """
+
+    def __init__(self, log_probs: Dict[str, Dict[str, float]], unknown: Dict[str, float]):
+        self.log_probs = log_probs
+        self.unknown = unknown
+        # two classes: one log-likelihood ratio lookup per n-gram instead of one per lang
+        self._langs = tuple(sorted(log_probs))
+        if len(self._langs) == 2:
+            a, b = self._langs
+            self._delta = {g: log_probs[b][g] - log_probs[a][g] for g in log_probs[a]}
+            self._delta_unknown = unknown[b] - unknown[a]
+
+    @classmethod
+    def train(cls, texts: Dict[str, List[str]], max_features: int = 1500) -> "LangClassifier":
+        """
+        Fit from {lang: [texts]}, keeping the `max_features` most frequent n-grams per language.
+        """
+        counts = {lang: Counter(g for t in ts for g in _ngrams(t)) for lang, ts in texts.items()}
+        vocab = sorted({g for c in counts.values() for g, _ in c.most_common(max_features)})
+        log_probs, unknown = {}, {}
+        for lang, c in counts.items():
+            total = sum(c[g] for g in vocab) + len(vocab) + 1
+            log_probs[lang] = {g: round(math.log((c[g] + 1) / total), 4) for g in vocab}
+            unknown[lang] = round(math.log(1 / total), 4)
+        return cls(log_probs, unknown)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Return (lang, posterior probability of that lang).
+        """
+        if len(self._langs) == 2:
+            delta, unk, n = self._delta, self._delta_unknown, 0
+            llr = 0.0
+            for gram in _ngrams(text):
+                llr += delta.get(gram, unk)
+                n += 1
+            if not n:
+                return DEFAULT_LANG, 0.0
+            a, b = self._langs
+            p_b = 1.0 / (1.0 + math.exp(-max(min(llr, 700.0), -700.0)))
+            return (b, p_b) if p_b > 0.5 else (a, 1.0 - p_b)
+        scores = {lang: 0.0 for lang in self.log_probs}
+        seen = False
+        for gram in _ngrams(text):
+            seen = True
+            for lang, table in self.log_probs.items():
+                scores[lang] += table.get(gram, self.unknown[lang])
+        if not seen:
+            return DEFAULT_LANG, 0.0
+        best = max(sorted(scores), key=scores.get)
+        top = scores[best]
+        norm = sum(math.exp(s - top) for s in scores.values())
+        return best, 1.0 / norm
+
+    def save(self, path: str = MODEL_PATH) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"log_probs": self.log_probs, "unknown": self.unknown},
+                f,
+                sort_keys=True,
+                separators=(",", ":"),
+            )
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "LangClassifier":
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        return cls(raw["log_probs"], raw["unknown"])
+
+
+_CLASSIFIER: Optional[LangClassifier] = None
+_CLASSIFIER_LOCK = threading.Lock()
+
+# session_id -> last confidently detected language
+_SESSION_LANGS: "OrderedDict[str, str]" = OrderedDict()
+_SESSION_LANGS_MAX = 10000
+_SESSION_LANGS_LOCK = threading.Lock()
+
+
+def get_classifier() -> LangClassifier:
+    global _CLASSIFIER
+    with _CLASSIFIER_LOCK:
+        if _CLASSIFIER is None:
+            _CLASSIFIER = LangClassifier.load()
+        return _CLASSIFIER
+
+
+def _remember(session_id: Optional[str], lang: str) -> None:
+    if session_id is None:
+        return
+    with _SESSION_LANGS_LOCK:
+        _SESSION_LANGS[session_id] = lang
+        _SESSION_LANGS.move_to_end(session_id)
+        while len(_SESSION_LANGS) > _SESSION_LANGS_MAX:
+            _SESSION_LANGS.popitem(last=False)
+
+
+def _recall(session_id: Optional[str]) -> Optional[str]:
+    if session_id is None:
+        return None
+    with _SESSION_LANGS_LOCK:
+        lang = _SESSION_LANGS.get(session_id)
+        if lang is not None:
+            _SESSION_LANGS.move_to_end(session_id)
+        return lang
+
+
+def detect_lang(
+    text: str, session_id: Optional[str] = None, history: Optional[List] = None
+) -> str:
+    """
+    Return "en" or "id" for `text`.
+    Low-confidence predictions fall back to the session's last confident language,
+    then to the user turns in `history`, then to DEFAULT_LANG.
+    Args:
+        text: The user's message.
+        session_id: Optional session key used to cache the conversation language.
+        history: Optional previous LangChain messages.
+    """
+    clf = get_classifier()
+    lang, confidence = clf.predict(text)
+    if confidence >= MIN_CONFIDENCE:
+        _remember(session_id, lang)
+        return lang
+    remembered = _recall(session_id)
+    if remembered is not None:
+        return remembered
+    if history:
+        past = " ".join(m.content for m in history if isinstance(m, HumanMessage))
+        past_lang, past_conf = clf.predict(f"{past} {text}")
+        if past_conf >= MIN_CONFIDENCE:
+            _remember(session_id, past_lang)
+            return past_lang
+    return lang if confidence > 0 else DEFAULT_LANG
+
+
+def main():
+    """
+    Retrain the shipped model from the FAQ PDFs.
+    PYTHONPATH=src python3 -m services.lang_detect
+    """
+    from retrieval.chunking import DEFAULT_JOBS, iter_chunks
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--max-features", type=int, default=1500)
+    parser.add_argument("--out", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    texts: Dict[str, List[str]] = {lang: [] for lang in LANGS}
+    for job in DEFAULT_JOBS:
+        for _, answer, meta in iter_chunks(job):
+            texts[job.lang].extend([meta["question"], answer])
+    clf = LangClassifier.train(texts, max_features=args.max_features)
+    clf.save(args.out)
+    print(f"Saved {args.out} ({sum(len(t) for t in texts.values())} training texts)")
+
+
+if __name__ == "__main__":
+    main()
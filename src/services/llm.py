@@ -1,29 +1,105 @@
 import logging
-from langchain_openai import ChatOpenAI
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Tuple
+
 from core.settings import settings
+from services.clients import get_async_http_client, get_http_client
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
 """
 LLM (Large Language Model) service for the Jenius FX chatbot.
-Provides a factory for creating a streaming ChatOpenAI instance.
+Provides a factory for creating a streaming ChatOpenAI instance and a
+tokenizer-backed token counter for prompt budgeting.
+langchain_openai is imported on first use; it is the slowest import in the app.
 """
 
 logger = logging.getLogger(__name__)
 
-def chat_model(temperature: float = 0):
+CHAT_MODEL = "gpt-4o"
+
+
+# one model per (temperature, event loop): the async HTTP pool is loop-bound.
+# Each model holds its client, so a weak mapping could never drop it; the cache
+# is LRU-bounded instead (every short-lived loop brings a new client).
+MODELS_MAX = 32
+# (temperature, id(client)) -> (client, model); the client is kept to rule out id reuse
+_MODELS: "OrderedDict[Tuple[float, int], Tuple[Any, ChatOpenAI]]" = OrderedDict()
+_MODELS_LOCK = threading.Lock()
+
+
+def chat_model(temperature: float = 0) -> "ChatOpenAI":
     """
-    Create a streaming ChatOpenAI model instance for chat completion.
+    Return a long-lived streaming ChatOpenAI instance for chat completion.
+    Instances share the pooled HTTP clients from services.clients, so turns
+    reuse open connections instead of paying a new TLS handshake each time.
     Args:
         temperature: Sampling temperature for the model (default 0).
     Returns:
         A ChatOpenAI instance configured for streaming.
     """
+    return chat_model_for(get_async_http_client(), temperature)
+
+
+def chat_model_for(async_client, temperature: float = 0) -> "ChatOpenAI":
+    """
+    `chat_model` for an explicit async HTTP client (None: the SDK's own), so a
+    loop's model can be built on a worker thread.
+    """
+    key = (temperature, id(async_client))
+    with _MODELS_LOCK:
+        entry = _MODELS.get(key)
+        if entry is not None and entry[0] is async_client:
+            _MODELS.move_to_end(key)
+            return entry[1]
+        try:
+            from langchain_openai import ChatOpenAI
+
+            model = ChatOpenAI(
+                openai_api_key=settings.bati_openai_api_key,
+                model=CHAT_MODEL,
+                temperature=temperature,
+                streaming=True,
+                stream_usage=True,  # final chunk reports prompt (incl. cached) and completion tokens
+                http_client=get_http_client(),
+                http_async_client=async_client,
+            )
+        except Exception as e:
+            logger.error(f"Failed to instantiate ChatOpenAI: {e}")
+            raise
+        _MODELS[key] = (async_client, model)
+        _MODELS.move_to_end(key)
+        while len(_MODELS) > MODELS_MAX:
+            _MODELS.popitem(last=False)
+        return model
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """
+    Return the tiktoken encoding for CHAT_MODEL, or None if it cannot be loaded
+    (tiktoken downloads its BPE files on first use).
+    """
     try:
-        return ChatOpenAI(
-            openai_api_key=settings.bati_openai_api_key,
-            model="gpt-4o",
-            temperature=temperature,
-            streaming=True,
-        )
+        import tiktoken
+
+        return tiktoken.encoding_for_model(CHAT_MODEL)
     except Exception as e:
-        logger.error(f"Failed to instantiate ChatOpenAI: {e}")
-        raise
+        logger.warning(f"tiktoken unavailable, approximating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in `text` with the chat model's tokenizer.
+    Falls back to ~4 characters per token if the tokenizer is unavailable.
+    """
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is None:
+        return max(1, (len(text) + 3) // 4)
+    return len(enc.encode(text, disallowed_special=()))
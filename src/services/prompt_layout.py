@@ -0,0 +1,98 @@
+import logging
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+from langchain_core.messages import BaseMessage
+
+from core.metrics import LLM_TOKENS, RequestTimings
+from services.llm import count_tokens
+
+"""
+Prompt assembly for the Jenius FX chatbot, ordered for provider prompt caching.
+OpenAI reuses the prefill of the longest previously seen prompt prefix, so
+messages go from most to least stable: the static system prompt, then the
+conversation (running summary, then turns, which only grow at the end), then
+the per-request retrieved context and query. Consecutive turns of a session
+then share everything up to the new context.
+Token counts are kept per segment, and the cached/uncached split of prompt
+tokens reported in the response usage is recorded, so the effect on cost and
+time to first token can be measured.
+"""
+
+logger = logging.getLogger(__name__)
+
+# chat format overhead per message (role and delimiters)
+MESSAGE_OVERHEAD_TOKENS = 3
+SEGMENTS = ("system", "history", "context")
+
+
+@lru_cache(maxsize=4096)
+def _content_tokens(content: str) -> int:
+    # the system prompt and history turns recur on every request of a session
+    return count_tokens(content)
+
+
+def message_tokens(messages: List[BaseMessage]) -> int:
+    return sum(_content_tokens(str(m.content)) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class PromptLayout(NamedTuple):
+    system: List[BaseMessage]
+    history: List[BaseMessage]
+    context: List[BaseMessage]
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.system + self.history + self.context
+
+    def segment_tokens(self) -> Dict[str, int]:
+        """
+        Estimated prompt tokens of each segment, in prompt order.
+        """
+        return {name: message_tokens(getattr(self, name)) for name in SEGMENTS}
+
+
+def build_messages(
+    system: BaseMessage, history: List[BaseMessage], context: BaseMessage
+) -> PromptLayout:
+    """
+    Lay out a chat prompt for maximum stable-prefix reuse.
+    Args:
+        system: The language's system prompt (identical on every request).
+        history: Prior conversation, oldest first (summary message first, if any).
+        context: The human message holding the retrieved context and the query.
+    Returns:
+        The segments; `.messages` is what is sent to the model.
+    """
+    return PromptLayout([system], list(history), [context])
+
+
+def record_prompt(layout: PromptLayout, timings: Optional[RequestTimings]) -> None:
+    """
+    Put the per-segment token estimates on the request's timing counters.
+    """
+    if timings is None:
+        return
+    for name, tokens in layout.segment_tokens().items():
+        timings.counters[f"prompt_tokens_{name}"] = tokens
+
+
+def record_usage(usage: Optional[dict], timings: Optional[RequestTimings]) -> None:
+    """
+    Record prompt/completion usage reported by the provider.
+    `usage` is LangChain's usage_metadata: input_tokens, output_tokens and
+    input_token_details.cache_read (prompt tokens served from the provider's cache).
+    """
+    if not usage:
+        return
+    prompt = usage.get("input_tokens", 0)
+    cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    completion = usage.get("output_tokens", 0)
+    LLM_TOKENS.inc(cached, kind="cached")
+    LLM_TOKENS.inc(prompt - cached, kind="uncached")
+    LLM_TOKENS.inc(completion, kind="completion")
+    if timings is not None:
+        timings.counters["prompt_tokens"] = prompt
+        timings.counters["cached_prompt_tokens"] = cached
+        timings.counters["completion_tokens"] = completion
+    logger.info(f"Usage: {prompt} prompt tokens ({cached} cached), {completion} completion tokens")
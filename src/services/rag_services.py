@@ -1,15 +1,47 @@
+import asyncio
 import logging
-from typing import List, Literal, Optional
+import threading
+import time
+from typing import AsyncIterator, Iterator, List, Literal, Optional, Union
 
-from langchain.schema import AIMessage, HumanMessage, SystemMessage
-from langdetect import detect  # pip install langdetect
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages.ai import add_usage
 
-from retrieval.vector_store import retrieve_docs
+from core.metrics import (
+    GENERATION_SECONDS,
+    REQUESTS,
+    TOKENS_PER_SECOND,
+    TTFT_SECONDS,
+    RequestTimings,
+    bind_timings,
+    record_cache,
+    span,
+    unbind_timings,
+)
+from core.settings import settings
+from retrieval import vector_store
+from retrieval.lexical_index import get_lexical_index
+from services.answer_cache import answer_cache, normalize_query, replay
+from services.answer_store import get_answer_store
+from services.concurrency import single_flight
+from services import fx_rates
+from services.context_builder import build_context
+from services.function_handler import ToolRun
+from services.lang_detect import detect_lang
 from services.llm import chat_model
+from services.prompt_layout import build_messages, record_prompt, record_usage
 
 """
 RAG (Retrieval-Augmented Generation) services for the Jenius FX chatbot.
 Handles system prompts, prompt augmentation, and chat with memory.
+Prompts are laid out system → history → context (services/prompt_layout.py) so
+the provider's prompt-prefix cache matches across turns.
+Concurrent identical questions share one retrieval and, when there is no
+history, one upstream generation whose tokens are fanned out to every stream.
+Known FAQ questions are answered from the precomputed answer store
+(services/answer_store.py), and rate/conversion questions from the FX rate
+table (services/fx_rates.py), without retrieval or generation.
 """
 
 logger = logging.getLogger(__name__)
@@ -76,6 +108,27 @@ SYS_PROMPT = {
 
 
 # ───────────────────────── 2 ─ AUGMENT PROMPT ──────────────────────────
+def _context_text(docs: List) -> str:
+    """
+    Pack retrieved documents into a token-budgeted, deduplicated Q/A context block.
+    """
+    with span("context_build"):
+        ctx = build_context(docs)
+    logger.info(
+        f"Context: {ctx.used}/{len(docs)} chunks, {ctx.tokens} tokens "
+        f"({ctx.duplicates} duplicates, {ctx.truncated} over budget)"
+    )
+    return ctx.text
+
+
+def _format_prompt(query: str, context: str) -> str:
+    return f"Context:\n{context}\n\nQuery:\n{query}"
+
+
+def _build_prompt(query: str, docs: List) -> str:
+    return _format_prompt(query, _context_text(docs))
+
+
 def augment_prompt(query: str, lang: str) -> str:
     """
     Retrieve relevant documents and build an augmented prompt for the LLM.
@@ -86,43 +139,337 @@ def augment_prompt(query: str, lang: str) -> str:
         A string containing context and the user query.
     """
     try:
-        docs = retrieve_docs(query, lang=lang, k=3)
-        context = "\n".join(d.page_content for d in docs) or "No relevant context."
-        logger.info(f"Retrieved {len(docs)} docs for query '{query}' in lang '{lang}'")
+        docs = vector_store.retrieve_docs(query, lang=lang, k=settings.retrieval_k)
+        logger.info(f"Retrieved {len(docs)} docs in lang '{lang}'")
     except Exception as e:
-        logger.error(f"Error retrieving docs for query '{query}': {e}")
-        context = "No relevant context."
-    return f"Context:\n{context}\n\nQuery:\n{query}"
+        logger.error(f"Error retrieving docs in lang '{lang}': {e}")
+        docs = []
+    return _build_prompt(query, docs)
+
+
+async def aaugment_prompt(query: str, lang: str) -> str:
+    """
+    Async counterpart of `augment_prompt`, backed by `aretrieve_docs`.
+    Args:
+        query: The user's query string.
+        lang: The language code ("en" or "id").
+    Returns:
+        A string containing context and the user query.
+    """
+    return _format_prompt(query, await _aretrieve_context(query, lang))
+
+
+async def _aretrieve_context(query: str, lang: str) -> str:
+    """
+    Retrieve documents for `query` and return the packed context block alone.
+    """
+    try:
+        docs = await vector_store.aretrieve_docs(query, lang=lang, k=settings.retrieval_k)
+        logger.info(f"Retrieved {len(docs)} docs in lang '{lang}'")
+    except Exception as e:
+        logger.error(f"Error retrieving docs in lang '{lang}': {e}")
+        docs = []
+    return _context_text(docs)
+
+
+def canonical_answer(question: str, text: str, metadata: dict) -> str:
+    """
+    Generate the stored answer for one FAQ question (ingest-time answer store),
+    grounded on that FAQ entry alone.
+    Args:
+        question: The FAQ question.
+        text: The FAQ answer text from the PDF.
+        metadata: The chunk metadata (lang, source, ...).
+    Returns:
+        The generated answer.
+    """
+    lang = metadata.get("lang", "en")
+    doc = Document(page_content=text, metadata={k: v for k, v in metadata.items() if k != "text"})
+    messages = [SYS_PROMPT.get(lang, SYS_PROMPT["en"]), HumanMessage(content=_build_prompt(question, [doc]))]
+    return chat_model().invoke(messages).content
+
+
+async def _stored_answer(user_input: str, lang: str) -> Optional[str]:
+    """
+    Return the precomputed answer if `user_input` is a known FAQ question:
+    same normalized text, a confident lexical match on an FAQ question, or a
+    close enough question embedding.
+    """
+    try:
+        store = get_answer_store(lang)
+        if not len(store):
+            return None
+        entry = store.exact(user_input)
+        if entry is None:
+            confident = get_lexical_index(lang).confident_match(user_input, k=1) if settings.hybrid_retrieval else None
+            if confident:
+                # the FAQ is already identified: no embedding round trip
+                entry = store.exact(confident[0].metadata.get("question", ""))
+            else:
+                vs = vector_store.get_vectorstore(namespace=lang)
+                entry = store.nearest(await vs.embeddings.aembed_query(user_input))
+        return entry["answer"] if entry is not None else None
+    except Exception as e:
+        logger.error(f"Answer store lookup failed for lang '{lang}': {e}")
+        return None
+
+
+def _rate_answer(user_input: str, lang: str) -> Optional[str]:
+    """
+    Return an answer computed from the local FX rate table, if `user_input`
+    is a rate/conversion question and the rates are fresh.
+    """
+    try:
+        return fx_rates.answer_rate_question(user_input, lang)
+    except Exception as e:
+        logger.error(f"FX rate answer failed for lang '{lang}': {e}")
+        return None
+
+
+async def _replay(answer: str, timings: RequestTimings) -> AsyncIterator[str]:
+    first = True
+    async for chunk in replay(answer):
+        if first:
+            _observe_ttft(timings)
+            first = False
+        yield chunk
 
 
 # ───────────────────────── 3 ─ CHAT WITH MEMORY ────────────────────────
-def stream_chat_with_memory(
-    history: List, user_input: str, lang: Optional[Literal["en", "id"]] = None
-):
+def _resolve_lang(
+    user_input: str,
+    lang: Optional[str],
+    history: Optional[List] = None,
+    session_id: Optional[str] = None,
+) -> str:
+    """
+    Return "en" or "id" for the request, detecting it from the input if needed.
+    """
+    try:
+        lang = lang or detect_lang(user_input, session_id=session_id, history=history)
+        return "id" if lang == "id" else "en"
+    except Exception as e:
+        logger.error(f"Language detection failed: {e}")
+        return "en"
+
+
+async def astream_chat_with_memory(
+    history: List,
+    user_input: str,
+    lang: Optional[Literal["en", "id"]] = None,
+    session_id: Optional[str] = None,
+    timings: Optional[RequestTimings] = None,
+) -> AsyncIterator[str]:
     """
     Stream chat responses from the LLM, using RAG and chat history.
+    Fully async: retrieval and generation never block the event loop, so a
+    single worker can serve many concurrent streams.
     Args:
         history: List of previous message objects.
         user_input: The user's input string.
         lang: Optional language code ("en" or "id").
+        session_id: Optional session key; caches the detected language per conversation.
+        timings: Optional collector for per-stage timings of this request.
     Yields:
         Chunks of the LLM's response as they are generated.
     """
+    timings = timings or RequestTimings()
+    token = bind_timings(timings)
     try:
-        lang = lang or detect(user_input)[:2]
-        lang = "id" if lang == "id" else "en"
-    except Exception as e:
-        logger.error(f"Language detection failed for input '{user_input}': {e}")
-        lang = "en"
+        async for chunk in _astream(history, user_input, lang, session_id, timings):
+            yield chunk
+    finally:
+        unbind_timings(token)
+
+
+async def _astream(
+    history: List,
+    user_input: str,
+    lang: Optional[str],
+    session_id: Optional[str],
+    timings: RequestTimings,
+) -> AsyncIterator[str]:
+    with span("lang_detect"):
+        lang = _resolve_lang(user_input, lang, history, session_id)
+
+    if settings.fx_answers_enabled:
+        with span("fx_rates"):
+            rate_answer = _rate_answer(user_input, lang)
+        record_cache("fx_rates", rate_answer is not None)
+        if rate_answer is not None:
+            REQUESTS.inc(outcome="fx_rates")
+            async for chunk in _replay(rate_answer, timings):
+                yield chunk
+            return
+
+    if not history and settings.answer_store_enabled:
+        with span("answer_store"):
+            stored = await _stored_answer(user_input, lang)
+        record_cache("answer_store", stored is not None)
+        if stored is not None:
+            REQUESTS.inc(outcome="answer_store")
+            async for chunk in _replay(stored, timings):
+                yield chunk
+            return
+
+    with span("retrieval"):
+        if settings.coalesce_requests:
+            context = await single_flight("retrieval").do(
+                (normalize_query(user_input), lang), lambda: _aretrieve_context(user_input, lang)
+            )
+        else:
+            context = await _aretrieve_context(user_input, lang)
+        rag_prompt = HumanMessage(content=_format_prompt(user_input, context))
+    layout = build_messages(SYS_PROMPT[lang], history, rag_prompt)
+    record_prompt(layout, timings)
+    messages = layout.messages
 
-    rag_prompt = HumanMessage(content=augment_prompt(user_input, lang))
-    messages = history + [SYS_PROMPT[lang], rag_prompt]
+    # answers only depend on (input, lang, context) when there is no prior history;
+    # the key hashes the context alone, the input is normalized by make_key
+    cache_key = None
+    if not history:
+        cache_key = answer_cache.make_key(user_input, lang, context)
+        cached = answer_cache.get(cache_key)
+        record_cache("answer", cached is not None)
+        if cached is not None:
+            logger.info(f"Answer cache hit for lang '{lang}'")
+            REQUESTS.inc(outcome="cache_hit")
+            async for chunk in _replay(cached, timings):
+                yield chunk
+            return
 
+    if cache_key is not None and settings.coalesce_requests:
+        chunks = single_flight("generation").stream(cache_key, lambda: _generate(messages, cache_key, lang))
+    else:
+        chunks = _generate(messages, cache_key, lang)
+    first = True
+    async for chunk in chunks:
+        if isinstance(chunk, RequestTimings):
+            # generation stats; a coalesced stream delivers them to every subscriber
+            for stage, seconds in chunk.stages.items():
+                timings.add(stage, seconds)
+            timings.counters.update(chunk.counters)
+            continue
+        if first:
+            _observe_ttft(timings)
+            first = False
+        yield chunk
+
+
+async def _generate(messages: List, cache_key, lang: str) -> AsyncIterator[Union[str, RequestTimings]]:
+    """
+    Stream one upstream generation, recording its metrics and caching the
+    finished answer under `cache_key` (if given). With settings.tool_calling
+    the model may call tools first; answers built from tool results are not
+    cached, since they can depend on live data such as rates.
+    After the last chunk, a successful generation yields a RequestTimings with
+    its stage time and token counters, for each requester to merge into its own.
+    """
+    timings = RequestTimings()
+    parts: List[str] = []
+    gen_start = first_at = None
+    run = None
+    usage: dict = {}
     try:
         llm = chat_model()
-        for chunk in llm.stream(messages):  # uses `ChatOpenAI(streaming=True)`
-            if chunk.content:
-                yield chunk.content
+        gen_start = time.perf_counter()
+        if settings.tool_calling:
+            run = ToolRun(llm)
+            stream = run.astream(messages)
+        else:
+            # uses `ChatOpenAI(streaming=True)`; the last chunk carries the usage
+            stream = _contents(llm.astream(messages), usage)
+        async for content in stream:
+            if content:
+                if first_at is None:
+                    first_at = time.perf_counter()
+                parts.append(content)
+                yield content
     except Exception as e:
         logger.error(f"LLM streaming failed: {e}")
+        REQUESTS.inc(outcome="error")
         yield "[Sorry, there was an error generating a response.]"
+        return
+
+    end = time.perf_counter()
+    GENERATION_SECONDS.observe(end - gen_start)
+    timings.add("generation", end - gen_start)
+    if first_at is not None and end > first_at and len(parts) > 1:
+        rate = (len(parts) - 1) / (end - first_at)
+        TOKENS_PER_SECOND.observe(rate)
+        timings.counters["tokens_per_second"] = round(rate, 2)
+    timings.counters["chunks"] = len(parts)
+    REQUESTS.inc(outcome="ok")
+    record_usage(run.usage if run is not None else usage, timings)
+
+    if run is not None and run.tool_calls:
+        timings.counters["tool_calls"] = run.tool_calls
+    elif cache_key is not None:
+        answer_cache.put(cache_key, "".join(parts), namespace=lang)
+    yield timings
+
+
+async def _contents(chunks: AsyncIterator, usage: dict) -> AsyncIterator[str]:
+    """
+    Yield the text of streamed message chunks, summing their usage_metadata into `usage`.
+    """
+    async for chunk in chunks:
+        meta = getattr(chunk, "usage_metadata", None)
+        if isinstance(meta, dict):
+            usage.update(add_usage(usage or None, meta))
+        yield chunk.content
+
+
+def _observe_ttft(timings: RequestTimings) -> None:
+    ttft = timings.elapsed()
+    TTFT_SECONDS.observe(ttft)
+    timings.add("ttft", ttft)
+
+
+# one background loop drives the async pipeline for synchronous callers
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return a long-lived event loop running in a daemon thread.
+    """
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(
+                target=_LOOP.run_forever, name="rag-sync-bridge", daemon=True
+            ).start()
+        return _LOOP
+
+
+def _iter_sync(agen: AsyncIterator[str]) -> Iterator[str]:
+    """
+    Iterate an async generator from synchronous code via the background loop.
+    """
+    loop = _background_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+def stream_chat_with_memory(
+    history: List, user_input: str, lang: Optional[Literal["en", "id"]] = None
+) -> Iterator[str]:
+    """
+    Synchronous wrapper around `astream_chat_with_memory` (used by the CLI).
+    Args:
+        history: List of previous message objects.
+        user_input: The user's input string.
+        lang: Optional language code ("en" or "id").
+    Yields:
+        Chunks of the LLM's response as they are generated.
+    """
+    yield from _iter_sync(astream_chat_with_memory(history, user_input, lang))
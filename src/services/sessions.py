@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from core.settings import settings
+from services.llm import chat_model, count_tokens
+
+"""
+Server-side conversation sessions for the Jenius FX chatbot.
+Session IDs are issued by the server (create_session, a random token) and
+unknown IDs are rejected, so a client cannot pick or guess its way into
+another conversation.
+Clients send only the new message plus a session ID; the server keeps compact
+message records and builds a token-budgeted history window: recent turns verbatim,
+older turns folded into a running summary after each turn.
+Saves are checked against the version the session was read at, so two turns
+of one session finishing together (or in different workers) are both kept.
+"""
+
+logger = logging.getLogger(__name__)
+
+# a turn is re-applied on the latest stored session this many times before it is dropped
+SAVE_ATTEMPTS = 3
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a customer-support conversation about "
+    "foreign currency (FCY) services at Jenius. Update the summary with the new "
+    "messages. Keep facts the assistant may need later (currencies, amounts, "
+    "steps already explained, open questions). Answer with the summary only, "
+    "in at most {max_tokens} tokens."
+)
+
+
+class MessageRecord(NamedTuple):
+    role: str  # "user" | "assistant"
+    content: str
+    tokens: int
+
+
+class Session:
+    """
+    One conversation: message records plus a running summary of the first
+    `summarized_upto` records. `version` counts the saves it has seen.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        messages: Optional[List[MessageRecord]] = None,
+        summary: str = "",
+        summarized_upto: int = 0,
+        version: int = 0,
+    ):
+        self.session_id = session_id
+        self.messages = messages or []
+        self.summary = summary
+        self.summarized_upto = summarized_upto
+        self.version = version
+
+    def append(self, role: str, content: str) -> None:
+        self.messages.append(MessageRecord(role, content, count_tokens(content)))
+
+    def window_start(self, budget: int) -> int:
+        """
+        Index of the oldest record that still fits in the verbatim window.
+        """
+        used, start = 0, len(self.messages)
+        while start > self.summarized_upto:
+            tokens = self.messages[start - 1].tokens
+            if used + tokens > budget:
+                break
+            used += tokens
+            start -= 1
+        return start
+
+    def window(self, budget: Optional[int] = None) -> List:
+        """
+        Return LangChain messages for the prompt: the running summary (if any)
+        followed by as many recent turns as fit in `budget` tokens.
+        """
+        budget = settings.history_token_budget if budget is None else budget
+        start = self.window_start(budget)
+        if start > self.summarized_upto:
+            logger.warning(
+                f"Session '{self.session_id}': {start - self.summarized_upto} messages "
+                "are neither summarized nor in the window"
+            )
+        out: List = []
+        if self.summary:
+            out.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for rec in self.messages[start:]:
+            cls = AIMessage if rec.role == "assistant" else HumanMessage
+            out.append(cls(content=rec.content))
+        return out
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "messages": [list(m) for m in self.messages],
+                "summary": self.summary,
+                "summarized_upto": self.summarized_upto,
+                "version": self.version,
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, session_id: str, data: str) -> "Session":
+        raw = json.loads(data)
+        return cls(
+            session_id,
+            [MessageRecord(*m) for m in raw["messages"]],
+            raw.get("summary", ""),
+            raw.get("summarized_upto", 0),
+            raw.get("version", 0),
+        )
+
+
+async def asummarize(session: Session, budget: Optional[int] = None) -> None:
+    """
+    Fold the records that no longer fit in the verbatim window into the
+    running summary (one small LLM call, only when something fell out).
+    """
+    budget = settings.history_token_budget if budget is None else budget
+    start = session.window_start(budget)
+    if start <= session.summarized_upto:
+        return
+    fresh = session.messages[session.summarized_upto : start]
+    transcript = "\n".join(f"{m.role}: {m.content}" for m in fresh)
+    prompt = [
+        SystemMessage(content=SUMMARY_PROMPT.format(max_tokens=settings.summary_max_tokens)),
+        HumanMessage(
+            content=f"Current summary:\n{session.summary or '(empty)'}\n\nNew messages:\n{transcript}"
+        ),
+    ]
+    try:
+        result = await chat_model().ainvoke(prompt)
+        session.summary = result.content.strip()
+        session.summarized_upto = start
+    except Exception as e:
+        logger.error(f"Failed to summarize session '{session.session_id}': {e}")
+
+
+# ───────────────────────── STORES ──────────────────────────────────────
+class MemorySessionStore:
+    """
+    In-process session store with LRU eviction beyond `max_sessions`.
+    """
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        # session_id -> (version, serialized session)
+        self._sessions: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+
+    def find(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions.move_to_end(session_id)
+        return Session.from_json(session_id, entry[1]) if entry else None
+
+    def get(self, session_id: str) -> Session:
+        return self.find(session_id) or Session(session_id)
+
+    def save(self, session: Session) -> bool:
+        """
+        Store `session` unless it was saved by someone else since it was read;
+        returns False on such a conflict.
+        """
+        with self._lock:
+            entry = self._sessions.get(session.session_id)
+            if (entry[0] if entry else 0) != session.version:
+                return False
+            session.version += 1
+            self._sessions[session.session_id] = (session.version, session.to_json())
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return True
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """
+    Session store persisted in a local SQLite file (survives restarts).
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def find(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return Session.from_json(session_id, row[0]) if row else None
+
+    def get(self, session_id: str) -> Session:
+        return self.find(session_id) or Session(session_id)
+
+    def save(self, session: Session) -> bool:
+        """
+        Store `session` unless it was saved by someone else (any process) since
+        it was read; returns False on such a conflict.
+        """
+        expected = session.version
+        session.version += 1
+        row = (session.to_json(), time.time(), session.session_id)
+        with self._lock:
+            # rows written before sessions were versioned count as version 0
+            saved = self._conn.execute(
+                "UPDATE sessions SET data = ?, updated_at = ? "
+                "WHERE id = ? AND COALESCE(json_extract(data, '$.version'), 0) = ?",
+                (*row, expected),
+            ).rowcount
+            if not saved and expected == 0:
+                saved = self._conn.execute(
+                    "INSERT OR IGNORE INTO sessions (data, updated_at, id) VALUES (?, ?, ?)", row
+                ).rowcount
+            self._conn.commit()
+        if not saved:
+            session.version = expected
+        return bool(saved)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._conn.commit()
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_session_store():
+    """
+    Return the process-wide session store selected by settings.session_backend.
+    """
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            if settings.session_backend == "sqlite":
+                _STORE = SQLiteSessionStore(settings.session_db_path)
+            else:
+                _STORE = MemorySessionStore(settings.session_max_entries)
+            logger.info(f"Using {type(_STORE).__name__} for chat sessions")
+        return _STORE
+
+
+def create_session() -> Session:
+    """
+    Start a session under a fresh server-issued ID and persist it, so the ID is
+    known to every worker even if its first turn never completes.
+    """
+    store = get_session_store()
+    while True:
+        session = Session(secrets.token_urlsafe(24))
+        if store.save(session):  # False only on an (astronomically unlikely) ID collision
+            return session
+
+
+async def record_turn(session: Session, user_input: str, answer: str) -> None:
+    """
+    Append a completed turn, summarize what fell out of the window and persist.
+    If another turn of the session was saved since `session` was read, the turn
+    is re-applied on the stored session instead of overwriting it.
+    """
+    store = get_session_store()
+    for _ in range(SAVE_ATTEMPTS):
+        session.append("user", user_input)
+        session.append("assistant", answer)
+        await asummarize(session)
+        if store.save(session):
+            return
+        session = store.get(session.session_id)
+    logger.warning(f"Session '{session.session_id}': dropped a turn after {SAVE_ATTEMPTS} conflicting saves")
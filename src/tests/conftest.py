@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+"""
+Shared test fixtures.
+Settings require the OpenAI and Pinecone API keys; the tests never call either
+service, so placeholder values are provided when none are set.
+"""
+
+
+@pytest.fixture(autouse=True, scope="session")
+def dummy_credentials():
+    with pytest.MonkeyPatch.context() as mp:
+        for name in ("BATI_OPENAI_API_KEY", "PINECONE_API_KEY"):
+            if not os.environ.get(name):
+                mp.setenv(name, "test")
+        yield
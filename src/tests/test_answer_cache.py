@@ -0,0 +1,48 @@
+import asyncio
+
+from core.settings import settings
+from services.answer_cache import AnswerCache, invalidate_namespace, replay
+
+
+def test_answer_cache_hit_miss_and_lru(tmp_path, monkeypatch):
+    """
+    Test hit/miss counters, normalized keys and LRU eviction by size.
+    """
+    monkeypatch.setattr(settings, "cache_dir", str(tmp_path))
+    cache = AnswerCache(max_entries=2, ttl_s=60)
+    k1 = cache.make_key("How do I top up USD?", "en", "ctx")
+    assert cache.get(k1) is None
+    cache.put(k1, "Open the FCY tab.", namespace="en")
+    assert cache.get(cache.make_key("how do i top up usd", "en", "ctx")) == "Open the FCY tab."
+
+    cache.put(cache.make_key("q2", "en", "ctx"), "a2", namespace="en")
+    assert cache.get(cache.make_key("q2", "en", "ctx")) == "a2"
+    cache.put(cache.make_key("q3", "en", "ctx"), "a3", namespace="en")
+    assert cache.get(k1) is None  # least recently used, evicted
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["size"] == 2
+
+
+def test_answer_cache_invalidated_by_namespace_bump(tmp_path, monkeypatch):
+    """
+    Test that re-ingesting a namespace (another process) makes entries stale.
+    """
+    monkeypatch.setattr(settings, "cache_dir", str(tmp_path))
+    cache = AnswerCache(max_entries=10, ttl_s=60)
+    key = cache.make_key("fee?", "id", "ctx")
+    cache.put(key, "Gratis.", namespace="id")
+    invalidate_namespace("id")
+    assert cache.get(key) is None
+
+
+def test_replay_reassembles_answer():
+    """
+    Test that a replayed answer is chunked but reassembles exactly.
+    """
+
+    async def collect():
+        return [c async for c in replay("Top up USD from the FCY menu in the app.")]
+
+    chunks = asyncio.run(collect())
+    assert len(chunks) > 1
+    assert "".join(chunks) == "Top up USD from the FCY menu in the app."
@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from benchmarks.fakes import FakeEmbeddings
+from core.settings import settings
+from services import answer_store
+from services.answer_store import AnswerStore, prune_answers
+
+
+def _chunks(n):
+    return [(f"id{i}", f"answer {i}", {"question": f"How do I do thing {i}?", "lang": "en"}) for i in range(n)]
+
+
+def test_answer_store_lookup_and_incremental_rebuild(tmp_path):
+    emb = FakeEmbeddings(dim=32)
+    calls = []
+
+    def generate(question, text, meta):
+        calls.append(question)
+        return f"canonical: {text}"
+
+    store = AnswerStore("en", root=str(tmp_path))
+    assert store.build(_chunks(3), emb, generate, model="m") == (3, 0)
+    store.save()
+
+    loaded = AnswerStore("en", root=str(tmp_path)).load()
+    assert loaded.exact("how do i do THING 1")["answer"] == "canonical: answer 1"
+    with patch.object(settings, "answer_store_min_similarity", 0.99):
+        assert loaded.nearest(emb.embed_query("How do I do thing 2?"))["id"] == "id2"
+        assert loaded.nearest(emb.embed_query("something else entirely")) is None
+
+    # unchanged questions are reused, removed ones dropped, new ones generated
+    calls.clear()
+    chunks = _chunks(4)[1:]
+    assert loaded.build(chunks, emb, generate, model="m") == (1, 2)
+    assert calls == ["How do I do thing 3?"]
+    assert [e["id"] for e in loaded.entries] == ["id1", "id2", "id3"]
+    assert loaded.exact("How do I do thing 0?") is None
+
+
+def test_prune_drops_answers_for_changed_or_removed_chunks(tmp_path, monkeypatch):
+    """
+    Test that an ingest without precomputation drops stored answers whose FAQ
+    content changed or disappeared, so exact matches stop serving them.
+    """
+    monkeypatch.setattr(settings, "answer_store_dir", str(tmp_path))
+    monkeypatch.setattr(answer_store, "_STORES", {})
+    store = AnswerStore("en")
+    store.build(_chunks(3), FakeEmbeddings(dim=32), lambda q, text, meta: f"canonical: {text}", model="m")
+    store.save()
+
+    chunks = _chunks(3)[:2]
+    chunks[1] = ("id1", "answer 1, revised", chunks[1][2])
+    assert prune_answers("en", chunks, model="m") == 2
+
+    current = answer_store.get_answer_store("en")
+    assert [e["id"] for e in current.entries] == ["id0"]
+    assert current.vectors.shape[0] == 1
+    assert current.exact("How do I do thing 1?") is None
+    assert prune_answers("en", chunks, model="m") == 0
@@ -0,0 +1,16 @@
+from benchmarks.load import Sample, summarize
+from benchmarks.results import compare, save_results
+
+
+def test_summarize_and_compare(tmp_path):
+    samples = [Sample(200, 0.1 * i, 0.5 * i, 10) for i in range(1, 11)] + [Sample(500, None, 0.1, 0)]
+    metrics = summarize(samples, wall=2.0)
+    assert metrics["errors"] == 1
+    assert metrics["throughput_rps"] == 5.0
+    assert metrics["ttfb_p50_ms"] == 550.0
+
+    old = save_results("load", {}, metrics, out=str(tmp_path / "old.json"))
+    new = save_results("load", {}, dict(metrics, throughput_rps=10.0), out=str(tmp_path / "new.json"))
+    report = compare(old, new)
+    line = next(l for l in report.splitlines() if l.startswith("throughput_rps"))
+    assert line.endswith("+100.0%")
@@ -1,23 +1,43 @@
+import asyncio
+import contextlib
+import json
 from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
+from langchain_core.documents import Document
 
 from app.api import app
+from services.concurrency import AdmissionController
 
 client = TestClient(app)
 
 
-@patch("services.rag_services.stream_chat_with_memory")
+def _sse_events(body: bytes):
+    """
+    Parse an SSE body into (event, data) pairs.
+    """
+    events = []
+    for frame in body.decode().split("\n\n"):
+        if not frame:
+            continue
+        fields = [line.split(": ", 1) for line in frame.split("\n")]
+        event = next((v for k, v in fields if k == "event"), "message")
+        events.append((event, "\n".join(v for k, v in fields if k == "data")))
+    return events
+
+
+async def _fake_stream(*args, **kwargs):
+    for chunk in ["Hello!", "How can I help?"]:
+        yield chunk
+
+
+@patch("services.rag_services.astream_chat_with_memory", side_effect=_fake_stream)
 def test_chat_stream_endpoint(mock_stream):
     """
     Test the /chat-stream endpoint returns a streaming response.
     Mocks the RAG service to avoid external dependencies.
     """
-    # Simulate streaming chunks
-    mock_stream.return_value = iter(
-        [MagicMock(content="Hello!"), MagicMock(content="How can I help?")]
-    )
     payload = {
         "history": [{"role": "user", "content": "Hi"}],
         "user_input": "What is FX?",
@@ -29,3 +49,168 @@ def test_chat_stream_endpoint(mock_stream):
     body = b"".join(response.iter_bytes())
     assert b"Hello!" in body
     assert b"How can I help?" in body
+
+
+@patch("services.rag_services.astream_chat_with_memory", side_effect=_fake_stream)
+def test_chat_stream_session_keeps_history_server_side(mock_stream):
+    """
+    Test that with a session_id the client sends only the new message and the
+    server replays the stored turns (with correct roles) on the next request.
+    """
+    payload = {"new_session": True, "user_input": "What is FX?", "lang": "en"}
+    first = client.post("/chat-stream", json=payload)
+    assert first.status_code == 200
+    payload = {"session_id": first.headers["X-Session-Id"], "user_input": "And the fee?", "lang": "en"}
+    assert client.post("/chat-stream", json=payload).status_code == 200
+
+    history = mock_stream.call_args_list[1].args[0]
+    assert [type(m).__name__ for m in history] == ["HumanMessage", "AIMessage"]
+    assert history[0].content == "What is FX?"
+    assert history[1].content == "Hello!How can I help?"
+
+
+@patch("services.rag_services.astream_chat_with_memory", side_effect=_fake_stream)
+def test_chat_stream_rejects_session_ids_the_server_did_not_issue(mock_stream):
+    """
+    Test that a client-chosen session_id is rejected rather than opening (or
+    reading) a session under that ID, and that the admission slot is returned.
+    """
+    admission = AdmissionController(1, 0, 1.0)
+    with patch("app.api.get_admission", return_value=admission):
+        response = client.post("/chat-stream", json={"session_id": "guessed", "user_input": "Hi"})
+    assert response.status_code == 404
+    mock_stream.assert_not_called()
+    assert admission.stats()["active"] == 0
+
+
+async def _stalled_stream(*args, **kwargs):
+    yield "Hello!"
+    await asyncio.sleep(30)
+
+
+@pytest.mark.parametrize("spec_version", ["2.3", "2.4"])
+def test_chat_stream_frees_admission_slot_when_client_disconnects_mid_stream(spec_version):
+    """
+    Test that a client leaving mid-stream returns its admission slot, whether
+    the server reports the disconnect as a message (ASGI < 2.4) or as a failed send.
+    """
+    admission = AdmissionController(1, 0, 1.0)
+    body = json.dumps({"user_input": "What is FX?", "lang": "en"}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": spec_version},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat-stream",
+        "raw_path": b"/chat-stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+
+    async def run():
+        gone = asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await gone.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                assert admission.stats()["active"] == 1
+                gone.set()
+                if spec_version == "2.4":
+                    raise OSError("connection reset")
+                await asyncio.sleep(30)  # stuck on a slow socket when the disconnect arrives
+
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(app(scope, receive, send), timeout=5)
+        # checked before the loop shuts down (and finalizes abandoned generators)
+        return admission.stats()["active"]
+
+    with patch("app.api.get_admission", return_value=admission), patch(
+        "services.rag_services.astream_chat_with_memory", side_effect=_stalled_stream
+    ):
+        assert asyncio.run(run()) == 0
+
+
+def test_ready_reports_warmup_state():
+    """
+    Test the readiness probe before and after warm-up.
+    """
+    from services import clients
+
+    clients._READY.clear()
+    assert client.get("/ready").status_code == 503
+    clients._READY.set()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    clients._READY.clear()
+
+
+def test_ready_stays_unavailable_after_failed_warmup():
+    """
+    Test that a failed warm-up is reported with a 503 and its error.
+    """
+    from services import clients
+
+    clients._READY.clear()
+    with patch("services.lang_detect.get_classifier", side_effect=RuntimeError("no model")):
+        asyncio.run(clients.warmup())
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["error"] == "no model"
+
+
+@patch("services.rag_services.chat_model")
+@patch("retrieval.vector_store.aretrieve_docs")
+def test_metrics_and_timing_trailer(mock_aretrieve, mock_chat_model):
+    """
+    Test that a streamed request records stage histograms exposed on /metrics
+    and that timing=true appends a timing trailer event.
+    """
+
+    async def no_docs(*args, **kwargs):
+        return []
+
+    async def astream(messages):
+        for text in ["Top ", "up ", "in the app."]:
+            yield MagicMock(content=text)
+
+    mock_aretrieve.side_effect = no_docs
+    mock_chat_model.return_value.astream = astream
+    payload = {
+        "history": [{"role": "user", "content": "Hi"}],
+        "user_input": "How do I top up?",
+        "lang": "en",
+        "timing": True,
+    }
+    events = _sse_events(b"".join(client.post("/chat-stream", json=payload).iter_bytes()))
+    assert "".join(data for event, data in events if event == "message") == "Top up in the app."
+    assert [event for event, _ in events][-2:] == ["done", "timing"]
+    assert '"outcome": "completed"' in events[-2][1]
+
+    metrics = client.get("/metrics").text
+    assert 'chat_stage_seconds_count{stage="lang_detect"}' in metrics
+    assert "chat_ttft_seconds_count" in metrics
+
+
+def test_retrieve_batch_endpoint_keeps_order():
+    """
+    Test /retrieve-batch returns one result list per query, in input order.
+    """
+    fake = [[Document(page_content="a1", metadata={"lang": "en"})], []]
+    with patch("retrieval.vector_store.retrieve_docs_many", return_value=fake) as mock_many:
+        response = client.post("/retrieve-batch", json={"queries": ["q1", "q2"], "lang": "en"})
+    assert response.status_code == 200
+    assert [[d["text"] for d in r] for r in response.json()["results"]] == [["a1"], []]
+    mock_many.assert_called_once_with(["q1", "q2"], "en", 3)
@@ -0,0 +1,56 @@
+import os
+import threading
+from unittest.mock import MagicMock
+
+from core.settings import settings
+from retrieval import chunking
+
+
+class _FakeIndex:
+    def __init__(self):
+        self.vectors = {}
+        self.lock = threading.Lock()
+
+    def upsert(self, items, namespace):
+        with self.lock:
+            for uid, vec, meta in items:
+                self.vectors[uid] = (vec, meta)
+
+    def update(self, id, set_metadata, namespace):
+        self.vectors[id] = (self.vectors.get(id, ([], {}))[0], set_metadata)
+
+    def delete(self, ids=None, namespace=None, delete_all=False):
+        for uid in ids or []:
+            self.vectors.pop(uid, None)
+
+
+def test_run_job_streams_pdf_and_is_incremental(tmp_path, monkeypatch):
+    """
+    Test that the pipeline ingests every Q&A block of the EN FAQ PDF through
+    concurrent embed/upsert, and that a second run embeds nothing.
+    """
+    monkeypatch.setattr(settings, "manifest_dir", str(tmp_path / "manifests"))
+    monkeypatch.setattr(settings, "local_index_dir", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "lexical_index_dir", str(tmp_path / "lexical"))
+    monkeypatch.setattr(settings, "parsed_dir", str(tmp_path / "parsed"))
+    monkeypatch.setattr(settings, "answer_store_dir", str(tmp_path / "answers"))
+    monkeypatch.setattr(chunking, "get_local_index", lambda ns: MagicMock())
+    embedder = MagicMock()
+    embedder.embed_documents.side_effect = lambda texts: [[1.0, 0.0]] * len(texts)
+    index = _FakeIndex()
+    job = chunking.IngestJob(
+        os.path.join(os.path.dirname(__file__), "..", "data", "raw", "FAQ_FCY_Jenius_en.pdf"),
+        "en",
+        "en",
+        "https://example.com/faq.pdf",
+    )
+
+    diff = chunking.run_job(job, embedder=embedder, index=index, batch_size=4)
+    assert diff.new and len(index.vectors) == len(diff.new)
+    assert all(meta["lang"] == "en" for _, meta in index.vectors.values())
+
+    embedder.embed_documents.reset_mock()
+    again = chunking.run_job(job, embedder=embedder, index=index, batch_size=4)
+    assert not again.new and not again.changed and not again.stale
+    embedder.embed_documents.assert_not_called()
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from services.concurrency import AdmissionController, GuardedStream, Overloaded, SingleFlight
+
+
+def test_single_flight_stream_fans_out_one_upstream_call():
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        for tok in ["a", "b", "c"]:
+            await asyncio.sleep(0.01)
+            yield tok
+
+    async def run():
+        group = SingleFlight("test")
+
+        async def consume():
+            return [c async for c in group.stream("k", upstream)]
+
+        first = asyncio.create_task(consume())
+        await asyncio.sleep(0.015)  # join after the first token was produced
+        second = asyncio.create_task(consume())
+        return await asyncio.gather(first, second)
+
+    results = asyncio.run(run())
+    assert results == [["a", "b", "c"], ["a", "b", "c"]]
+    assert len(calls) == 1
+
+
+def test_single_flight_do_shares_result():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "ctx"
+
+    async def run():
+        group = SingleFlight("test")
+        return await asyncio.gather(*(group.do("k", work) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["ctx"] * 5
+    assert len(calls) == 1
+
+
+def test_admission_rejects_when_queue_full_or_wait_times_out():
+    async def run():
+        adm = AdmissionController(max_concurrent=1, max_queued=1, queue_timeout_s=0.05)
+        ticket = await adm.acquire()
+        waiter = asyncio.create_task(adm.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as full:
+            await adm.acquire()
+        with pytest.raises(Overloaded) as timed_out:
+            await waiter
+        ticket.release()
+        ticket.release()  # idempotent
+        (await adm.acquire()).release()
+        return full.value.status_code, timed_out.value.status_code, adm.stats()
+
+    full, timed_out, stats = asyncio.run(run())
+    assert (full, timed_out) == (429, 503)
+    assert stats["active"] == 0
+
+
+def test_guarded_stream_cancels_upstream_on_disconnect_and_caps_tokens():
+    """
+    Test that a disconnect, the token cap and the deadline each end the stream
+    and stop the upstream generator instead of letting it run to completion.
+    """
+    produced = []
+
+    async def upstream(n=100, delay=0.01):
+        try:
+            for i in range(n):
+                await asyncio.sleep(delay)
+                produced.append(i)
+                yield str(i)
+        except asyncio.CancelledError:
+            produced.append("cancelled")
+            raise
+
+    async def run():
+        gone = asyncio.Event()
+        disconnected = GuardedStream(upstream(), disconnected=gone.wait)
+        got = []
+        async for chunk in disconnected:
+            got.append(chunk)
+            if len(got) == 3:
+                gone.set()
+        await asyncio.sleep(0.05)
+
+        capped = GuardedStream(upstream(), max_chunks=5)
+        capped_chunks = [c async for c in capped]
+        timed = GuardedStream(upstream(delay=0.05), max_duration_s=0.12)
+        timed_chunks = [c async for c in timed]
+        return disconnected, got, capped, capped_chunks, timed, timed_chunks
+
+    disconnected, got, capped, capped_chunks, timed, timed_chunks = asyncio.run(run())
+    assert disconnected.outcome == "disconnected" and got == ["0", "1", "2"]
+    assert "cancelled" in produced and 10 not in produced
+    assert capped.outcome == "token_cap" and capped_chunks == ["0", "1", "2", "3", "4"]
+    assert timed.outcome == "timeout" and len(timed_chunks) == 2
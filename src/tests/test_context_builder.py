@@ -0,0 +1,36 @@
+from langchain_core.documents import Document
+
+from services.context_builder import NO_CONTEXT, build_context
+
+
+def _doc(answer, question=None):
+    return Document(page_content=answer, metadata={"question": question} if question else {})
+
+
+def test_build_context_formats_qa_and_drops_near_duplicates():
+    """
+    Test Q/A formatting from metadata and near-duplicate removal.
+    """
+    docs = [
+        _doc("You can top up USD from your Jenius account at any time.", "How do I top up USD?"),
+        _doc("You can top up USD from your Jenius account at any time!", "Top up USD?"),
+        _doc("There is no fee for converting IDR to USD.", "Is there a fee?"),
+    ]
+    ctx = build_context(docs, budget=1000, dedup_threshold=0.8)
+    assert ctx.used == 2
+    assert ctx.duplicates == 1
+    assert ctx.text.startswith("Q: How do I top up USD?\nA: You can top up USD")
+    assert "Q: Is there a fee?" in ctx.text
+    assert ctx.tokens > 0
+
+
+def test_build_context_respects_token_budget():
+    """
+    Test that chunks beyond the budget are dropped and an oversized best chunk is cut.
+    """
+    long = _doc("word " * 400, "Long?")
+    short = _doc("Short answer.", "Short?")
+    ctx = build_context([long, short], budget=50)
+    assert ctx.tokens <= 50
+    assert ctx.truncated >= 1
+    assert build_context([], budget=50).text == NO_CONTEXT
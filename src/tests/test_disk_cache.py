@@ -0,0 +1,109 @@
+import multiprocessing
+import sqlite3
+import threading
+
+from core.disk_cache import DiskCache, get_disk_cache
+from core.settings import settings
+from retrieval.embeddings import CachedEmbeddings
+from services.answer_cache import AnswerCache
+
+
+def _write_from_child(path: str) -> None:
+    cache = DiskCache(path, max_bytes=1 << 20)
+    cache.put("answer", "k", b"from child", "v1")
+    cache.flush()
+
+
+def test_disk_cache_versions_and_shares_across_processes(tmp_path):
+    """
+    Test that entries written by another process are visible and that a
+    version mismatch reads as a miss.
+    """
+    path = str(tmp_path / "cache.sqlite3")
+    child = multiprocessing.get_context("spawn").Process(target=_write_from_child, args=(path,))
+    child.start()
+    child.join(30)
+    assert child.exitcode == 0
+
+    cache = DiskCache(path, max_bytes=1 << 20)
+    assert cache.get("answer", "k", "v1") == b"from child"
+    assert cache.get("answer", "k", "v2") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    """
+    Test that the file is trimmed below max_bytes, oldest entries first.
+    """
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=10_000)
+    for i in range(20):
+        cache.put("retrieval", f"k{i:02d}", b"x" * 1000, "v")
+        cache.flush()
+    cache.evict()
+    assert cache.stats()["bytes"] <= 10_000
+    assert cache.get("retrieval", "k19", "v") is not None
+    assert cache.get("retrieval", "k00", "v") is None
+
+
+def test_disk_cache_eviction_stops_at_the_target_within_one_batch(tmp_path):
+    """
+    Test that entries written in one batch (one access time) are evicted only
+    down to the 90% target, not all together.
+    """
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=10_000)
+    cache.put_many("retrieval", [(f"k{i:02d}", b"x" * 997) for i in range(20)], "v")
+    cache.flush()
+    cache.evict()
+    stats = cache.stats()
+    assert stats["bytes"] == 9_000
+    assert stats["entries"] == 9
+
+
+def test_disk_cache_reads_do_not_wait_for_the_writer(tmp_path):
+    """
+    Test that lookups succeed while the writer's lock and an open write
+    transaction are held.
+    """
+    path = str(tmp_path / "cache.sqlite3")
+    cache = DiskCache(path, max_bytes=1 << 20)
+    cache.put("answer", "k", b"cached", "v1")
+    cache.flush()
+
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    result = {}
+    with cache._lock:
+        reader = threading.Thread(target=lambda: result.update(value=cache.get("answer", "k", "v1")))
+        reader.start()
+        reader.join(2)
+    other.execute("ROLLBACK")
+    assert result == {"value": b"cached"}
+
+
+class _CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [0.5, 0.25, 0.125]
+
+
+def test_persistent_tiers_survive_a_restart(tmp_path, monkeypatch):
+    """
+    Test that a fresh process-level cache (a restarted worker) is served from
+    disk for both embeddings and answers.
+    """
+    monkeypatch.setattr(settings, "cache_dir", str(tmp_path))
+    base = _CountingEmbeddings()
+    CachedEmbeddings(base, model="m", dim=3, persistent=True).embed_query("fx fee")
+    answers = AnswerCache(max_entries=10, ttl_s=60, persistent=True)
+    key = answers.make_key("fx fee?", "en", "ctx")
+    answers.put(key, "Free.", namespace="en")
+
+    get_disk_cache().flush()
+    assert CachedEmbeddings(base, model="m", dim=3, persistent=True).embed_query("fx  fee") == [0.5, 0.25, 0.125]
+    assert base.calls == 1
+    assert CachedEmbeddings(base, model="other", dim=3, persistent=True).embed_query("fx fee")
+    assert base.calls == 2  # another model is another version
+    assert AnswerCache(max_entries=10, ttl_s=60, persistent=True).get(key) == "Free."
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from retrieval.embeddings import CachedEmbeddings
+
+
+def _fake_base(dim=4):
+    base = MagicMock()
+    base.embed_query.side_effect = lambda t: [float(len(t))] * dim
+    base.embed_documents.side_effect = lambda ts: [[float(len(t))] * dim for t in ts]
+
+    async def aembed_query(t):
+        return [float(len(t))] * dim
+
+    base.aembed_query.side_effect = aembed_query
+    return base
+
+
+def test_repeated_queries_hit_the_network_once():
+    """
+    Test that repeated (and whitespace-variant) queries reuse the cached vector,
+    across both the sync and async paths.
+    """
+    base = _fake_base()
+    emb = CachedEmbeddings(base, model="m", dim=4)
+    v1 = emb.embed_query("top up  USD")
+    v2 = emb.embed_query(" top up USD ")
+    v3 = asyncio.run(emb.aembed_query("top up USD"))
+    assert v1 == v2 == v3
+    assert base.embed_query.call_count == 1
+    assert base.aembed_query.call_count == 0
+    assert emb.stats()["hits"] == 2
+
+
+def test_embed_documents_only_sends_misses_and_evicts_by_bytes():
+    """
+    Test that batch embedding sends only uncached, deduplicated texts and that
+    the byte budget bounds the cache.
+    """
+    base = _fake_base()
+    per_vec = np.zeros(4, dtype=np.float32).nbytes
+    emb = CachedEmbeddings(base, model="m", dim=4, max_bytes=2 * per_vec)
+    emb.embed_query("a")
+    out = emb.embed_documents(["a", "bb", "bb", "ccc"])
+    assert out == [[1.0] * 4, [2.0] * 4, [2.0] * 4, [3.0] * 4]
+    base.embed_documents.assert_called_once_with(["bb", "ccc"])
+    assert emb.stats()["entries"] == 2
+    assert emb.stats()["bytes"] <= 2 * per_vec
+
+
+def test_async_path_uses_pooled_client_and_reads_disk_off_the_loop(tmp_path, monkeypatch):
+    """
+    Test that async embeddings go to an embedder on the loop's pooled HTTP
+    client and that the disk-tier lookup does not run on the event loop thread.
+    """
+    from core.disk_cache import get_disk_cache
+    from core.settings import settings
+    from retrieval import embeddings
+    from services.clients import get_async_http_client
+
+    async def embedder_and_client():
+        return embeddings._async_openai_embeddings(), get_async_http_client()
+
+    embedder, client = asyncio.run(embedder_and_client())
+    assert embedder.http_async_client is client
+
+    monkeypatch.setattr(settings, "cache_dir", str(tmp_path))
+    disk = get_disk_cache()
+    threads = []
+    get_many = disk.get_many
+    monkeypatch.setattr(
+        disk, "get_many", lambda *a: threads.append(threading.current_thread()) or get_many(*a)
+    )
+    base = _fake_base()
+    emb = CachedEmbeddings(base, model="m", dim=4, persistent=True)
+    asyncio.run(emb.aembed_query("fx fee"))
+    assert threads and threading.main_thread() not in threads
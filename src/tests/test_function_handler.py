@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+from langchain_core.messages import AIMessageChunk, ToolMessage
+from pydantic import BaseModel
+
+from services import function_handler
+from services.function_handler import Tool, ToolRun, run_tool_calls, tool_cache
+
+
+class _Args(BaseModel):
+    x: int
+
+
+async def _slow_double(x: int) -> int:
+    await asyncio.sleep(0.1)
+    return 2 * x
+
+
+async def _hang(x: int) -> int:
+    await asyncio.sleep(10)
+
+
+async def _flaky(x: int) -> dict:
+    _flaky.calls += 1
+    return {"error": "rates are stale"} if _flaky.calls == 1 else {"value": x}
+
+
+class _FakeToolModel:
+    """
+    First turn requests two tool calls; the second turn answers from the results.
+    """
+
+    def __init__(self):
+        self.turns = []
+
+    def bind_tools(self, specs):
+        self.specs = specs
+        return self
+
+    async def astream(self, messages):
+        self.turns.append(messages)
+        if len(self.turns) == 1:
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": "double", "args": '{"x": 2}', "id": "c1", "index": 0},
+                    {"name": "double", "args": '{"x": 3}', "id": "c2", "index": 1},
+                ],
+            )
+        else:
+            results = [m.content for m in messages if isinstance(m, ToolMessage)]
+            yield AIMessageChunk(content=f"results {' '.join(results)}")
+
+
+def test_tool_run_executes_calls_in_parallel_and_feeds_results_back():
+    tools = {"double": Tool("double", "Double x.", _Args, _slow_double, cache_ttl_s=60)}
+    tool_cache.clear()
+    with patch.dict(function_handler.TOOLS, tools, clear=True):
+        llm = _FakeToolModel()
+        run = ToolRun(llm)
+
+        async def collect():
+            return [c async for c in run.astream([])]
+
+        start = time.perf_counter()
+        chunks = asyncio.run(collect())
+        elapsed = time.perf_counter() - start
+
+        assert chunks == ["results 4 6"]
+        assert run.tool_calls == 2
+        assert elapsed < 0.18  # both 0.1s calls overlapped
+        assert llm.specs[0]["function"]["name"] == "double"
+
+        # memoized: the repeat returns without waiting
+        start = time.perf_counter()
+        msgs = asyncio.run(run_tool_calls([{"name": "double", "args": {"x": 2}, "id": "c3"}]))
+        assert msgs[0].content == "4" and time.perf_counter() - start < 0.05
+    tool_cache.clear()
+
+
+def test_tool_timeout_and_unknown_tool_are_reported_to_the_model():
+    tools = {"hang": Tool("hang", "Never returns.", _Args, _hang, timeout_s=0.05)}
+    with patch.dict(function_handler.TOOLS, tools, clear=True):
+        msgs = asyncio.run(
+            run_tool_calls(
+                [{"name": "hang", "args": {"x": 1}, "id": "a"}, {"name": "nope", "args": {}, "id": "b"}]
+            )
+        )
+    assert "timed out" in json.loads(msgs[0].content)["error"]
+    assert "unknown tool" in json.loads(msgs[1].content)["error"]
+
+
+def test_tool_errors_are_not_memoized():
+    _flaky.calls = 0
+    tools = {"flaky": Tool("flaky", "Fails once.", _Args, _flaky, cache_ttl_s=60)}
+    tool_cache.clear()
+    call = {"name": "flaky", "args": {"x": 5}, "id": "a"}
+    with patch.dict(function_handler.TOOLS, tools, clear=True):
+        first = asyncio.run(run_tool_calls([call]))
+        second = asyncio.run(run_tool_calls([call]))
+    assert json.loads(first[0].content) == {"error": "rates are stale"}
+    assert json.loads(second[0].content) == {"value": 5}
+    tool_cache.clear()
+
+
+def test_tool_cache_key_uses_validated_arguments():
+    """
+    Test that argument spellings the schema normalizes (currency case, defaults) share one cache entry.
+    """
+    tool = function_handler.TOOLS["get_fx_rate"]
+    keys = {
+        tool_cache.make_key("get_fx_rate", tool.validate(args))
+        for args in ({"source": "usd"}, {"source": "USD", "target": "idr"}, {"source": "Usd", "amount": 1})
+    }
+    assert len(keys) == 1
+
+
+def test_calculate_fee_refuses_stale_rates_for_conversions():
+    """
+    Test that calculate_fee does not convert with a stale rate table, as get_fx_rate does not.
+    """
+    service = MagicMock(table=MagicMock(), is_stale=MagicMock(return_value=True))
+    schedule = {"transfer_out": {"currency": "USD", "flat": 5.0}}
+    with patch.object(function_handler, "load_fee_schedule", return_value=schedule), patch.object(
+        function_handler.fx_rates, "get_fx_service", return_value=service
+    ):
+        assert "error" in function_handler.calculate_fee("transfer_out", 100.0, "EUR")
+        # no conversion needed: the schedule's own currency is still served
+        assert function_handler.calculate_fee("transfer_out", 100.0, "USD")["fee"] == 5.0
+    service.table.convert.assert_not_called()
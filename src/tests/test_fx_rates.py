@@ -0,0 +1,70 @@
+import json
+import time
+
+import numpy as np
+
+from services.fx_rates import (
+    FileRateProvider,
+    FxRateService,
+    RateTable,
+    answer_rate_question,
+    parse_rate_question,
+)
+
+RATES = {"USD": 16250.0, "SGD": 12600.0, "JPY": 108.5}
+
+
+def _write_rates(path, as_of=None):
+    doc = {"base": "IDR", "as_of": as_of or time.time(), "rates": RATES}
+    path.write_text(json.dumps(doc))
+    return str(path)
+
+
+def test_vectorized_conversion():
+    table = RateTable("IDR", time.time(), dict(RATES, IDR=1.0))
+    out = table.convert([1, 2, 1000], ["USD", "SGD", "IDR"], ["IDR", "IDR", "JPY"])
+    np.testing.assert_allclose(out, [16250.0, 25200.0, 1000 / 108.5])
+    assert abs(table.rate("USD", "SGD") - 16250.0 / 12600.0) < 1e-12
+
+
+def test_parse_rate_question():
+    known = ["IDR", "USD", "SGD", "ALL"]
+    assert parse_rate_question("How much is 100 USD in IDR?", known) == (100.0, "USD", "IDR")
+    assert parse_rate_question("berapa 1.000.000 rupiah ke sgd", known) == (1000000.0, "IDR", "SGD")
+    assert parse_rate_question("kurs usd hari ini", known) == (1.0, "USD", "IDR")
+    assert parse_rate_question("convert all of it to usd", known) is None
+    assert parse_rate_question("How do I open an FCY account?", known) is None
+    assert parse_rate_question("USD 100 to IDR", known) == (100.0, "USD", "IDR")
+    assert parse_rate_question("what is SGD in USD?", known) == (1.0, "SGD", "USD")
+
+
+def test_fee_limit_and_how_to_questions_are_not_rate_quotes():
+    known = ["IDR", "USD", "SGD"]
+    for text in [
+        "What is the exchange rate fee for USD?",
+        "How do I convert USD to SGD in the app?",
+        "Why is the USD rate in Jenius different from Google?",
+        "Is there a limit when converting IDR to USD?",
+        "Berapa biaya konversi USD ke IDR?",
+    ]:
+        assert parse_rate_question(text, known) is None, text
+
+
+def test_snapshot_survives_restart_and_stale_rates_are_not_quoted(tmp_path):
+    provider = FileRateProvider(_write_rates(tmp_path / "rates.json"))
+    snapshot = str(tmp_path / "snap.json")
+    service = FxRateService(provider, snapshot_path=snapshot, refresh_interval_s=60, max_age_s=3600)
+    assert service.refresh()
+    assert "16,250.00 IDR" in answer_rate_question("1 USD to IDR", "en", service)
+
+    # a fresh process serves from the snapshot before its first refresh
+    restarted = FxRateService(FileRateProvider(str(tmp_path / "missing.json")), snapshot_path=snapshot)
+    assert restarted.load_snapshot()
+    assert not restarted.refresh()  # provider down: keep the snapshot
+    assert "16.250,00 IDR" in answer_rate_question("1 USD ke IDR", "id", restarted)
+
+    old = FileRateProvider(_write_rates(tmp_path / "old.json", as_of=time.time() - 7200))
+    stale = FxRateService(old, snapshot_path=str(tmp_path / "s2.json"), max_age_s=3600)
+    stale.refresh()
+    assert stale.is_stale()
+    assert answer_rate_question("1 USD to IDR", "en", stale) is None
@@ -0,0 +1,23 @@
+from langchain_core.messages import HumanMessage
+
+from services.lang_detect import detect_lang, get_classifier
+
+
+def test_classifier_separates_en_and_id():
+    """
+    Test the shipped model on typical FCY questions, deterministically.
+    """
+    clf = get_classifier()
+    assert clf.predict("How do I top up my USD balance?")[0] == "en"
+    assert clf.predict("Bagaimana cara menambah saldo USD?")[0] == "id"
+    assert clf.predict("berapa biaya tukar valas") == clf.predict("berapa biaya tukar valas")
+
+
+def test_low_confidence_falls_back_to_session_then_history():
+    """
+    Test that short, ambiguous messages reuse the conversation's language.
+    """
+    assert detect_lang("Apakah ada biaya konversi mata uang?", session_id="s-id") == "id"
+    assert detect_lang("USD?", session_id="s-id") == "id"
+    history = [HumanMessage(content="Bagaimana cara membuka rekening mata uang asing?")]
+    assert detect_lang("ok", history=history) == "id"
@@ -0,0 +1,61 @@
+import os
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from core.settings import settings
+from retrieval import vector_store
+from retrieval.lexical_index import LexicalIndex, fuse, get_lexical_index, rebuild_lexical_index
+
+RECORDS = [
+    ("1", {"question": "How do I top up my USD balance?", "text": "Open FCY and tap Top Up.", "lang": "en"}),
+    ("2", {"question": "What is the exchange rate fee?", "text": "No fee for conversions.", "lang": "en"}),
+    ("3", {"question": "Which currencies are supported?", "text": "USD, SGD, JPY and more.", "lang": "en"}),
+]
+
+
+def test_bm25_ranks_and_detects_confident_paraphrase():
+    """
+    Test BM25 ranking and the high-confidence paraphrase detection.
+    """
+    index = LexicalIndex("en").build(RECORDS)
+    top = index.search("exchange rate fee", k=2)
+    assert top[0][0].id == "2"
+    assert top[0][0].page_content == "No fee for conversions."
+    assert index.confident_match("how do i top up my USD balance") is not None
+    assert index.confident_match("is there a promo this month") is None
+
+
+def test_retrieve_docs_lexical_fast_path_skips_vector_store(tmp_path, monkeypatch):
+    """
+    Test that a confident lexical match never touches the vector store.
+    """
+    monkeypatch.setattr(settings, "lexical_index_dir", str(tmp_path))
+    rebuild_lexical_index("en", RECORDS)
+    with patch.object(vector_store, "get_vectorstore") as get_vs:
+        docs = vector_store.retrieve_docs("What is the exchange rate fee?", lang="en", k=1)
+    get_vs.assert_not_called()
+    assert docs[0].page_content == "No fee for conversions."
+
+
+def test_get_lexical_index_reloads_after_reingest(tmp_path, monkeypatch):
+    """
+    Test that an index rebuilt on disk by another process is picked up.
+    """
+    monkeypatch.setattr(settings, "lexical_index_dir", str(tmp_path))
+    rebuild_lexical_index("en", RECORDS)
+    assert len(get_lexical_index("en")) == 3
+
+    other = LexicalIndex("en").build(RECORDS[:1])
+    other.save()
+    stat = os.stat(other.path)
+    os.utime(other.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert len(get_lexical_index("en")) == 1
+
+
+def test_fuse_rewards_docs_ranked_by_both():
+    """
+    Test reciprocal-rank fusion ordering.
+    """
+    a, b, c = (Document(page_content=x) for x in "abc")
+    assert [d.page_content for d in fuse([[a, b, c], [b, c]], k=2)] == ["b", "c"]
@@ -0,0 +1,20 @@
+import asyncio
+from unittest.mock import patch
+
+from services import llm
+
+
+def test_chat_model_cache_is_bounded_and_per_loop():
+    """
+    Test that each event loop gets its own model and that models of finished
+    loops are evicted beyond MODELS_MAX.
+    """
+
+    async def model_twice():
+        return llm.chat_model(), llm.chat_model()
+
+    with patch.object(llm, "MODELS_MAX", 2), patch.dict(llm._MODELS, clear=True):
+        models = [asyncio.run(model_twice()) for _ in range(4)]
+        assert all(a is b for a, b in models)
+        assert len({id(a) for a, _ in models}) == 4
+        assert len(llm._MODELS) == 2
@@ -0,0 +1,88 @@
+import asyncio
+import os
+from unittest.mock import MagicMock
+
+from retrieval.local_index import LocalIndex, LocalVectorStore
+
+
+def _index(tmp_path):
+    idx = LocalIndex("en", root=str(tmp_path))
+    idx.upsert(
+        [
+            ("a", [1.0, 0.0, 0.0], {"lang": "en", "question": "Top up?", "text": "Use FCY."}),
+            ("b", [0.0, 1.0, 0.0], {"lang": "id", "question": "Isi?", "text": "Pakai FCY."}),
+            ("c", [0.7, 0.7, 0.0], {"lang": "en", "question": "Fee?", "text": "Free."}),
+        ]
+    )
+    return idx
+
+
+def test_local_index_topk_and_filter(tmp_path):
+    """
+    Test cosine top-k ordering and Pinecone-style metadata filtering.
+    """
+    idx = _index(tmp_path)
+    hits = idx.query([1.0, 0.1, 0.0], top_k=2)
+    assert [h[0] for h in hits] == ["a", "c"]
+    hits = idx.query([0.0, 1.0, 0.0], top_k=3, filter={"lang": "en"})
+    assert {h[0] for h in hits} == {"a", "c"}
+    hits = idx.query([0.0, 1.0, 0.0], top_k=3, filter={"lang": {"$in": ["id"]}})
+    assert [h[0] for h in hits] == ["b"]
+
+
+def test_local_index_persists_upsert_and_delete(tmp_path):
+    """
+    Test that the index reloads from disk and honours replace/delete.
+    """
+    idx = _index(tmp_path)
+    idx.upsert([("a", [0.0, 0.0, 1.0], {"lang": "en", "text": "New."})])
+    idx.delete(ids=["b"])
+    reloaded = LocalIndex("en", root=str(tmp_path))
+    assert len(reloaded) == 2
+    assert reloaded.query([0.0, 0.0, 1.0], top_k=1)[0][0] == "a"
+
+
+def test_local_index_update_metadata_keeps_the_vectors_file(tmp_path):
+    """
+    Test that a metadata-only update rewrites records.json but not vectors.npy.
+    """
+    idx = _index(tmp_path)
+    before = os.stat(idx._vectors_path)
+    assert idx.update_metadata("c", {"lang": "en", "question": "Fee?", "text": "Still free."})
+    after = os.stat(idx._vectors_path)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    reloaded = LocalIndex("en", root=str(tmp_path))
+    assert reloaded.query([0.7, 0.7, 0.0], top_k=1)[0][2]["text"] == "Still free."
+    assert not idx.update_metadata("missing", {})
+
+
+def test_local_index_picks_up_a_reingest(tmp_path):
+    """
+    Test that an index rewritten by another process is reloaded on the next query.
+    """
+    idx = _index(tmp_path)
+    other = LocalIndex("en", root=str(tmp_path))
+    other.delete(ids=["a", "c"])
+    stat = os.stat(other._records_path)
+    os.utime(other._records_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert [h[0] for h in idx.query([1.0, 0.0, 0.0], top_k=3)] == ["b"]
+    assert len(idx) == 1
+
+
+def test_local_vector_store_returns_documents(tmp_path):
+    """
+    Test that the LangChain store returns Documents shaped like Pinecone's.
+    """
+    embed = MagicMock()
+    embed.embed_query.return_value = [1.0, 0.0, 0.0]
+
+    async def aembed_query(text):
+        return [1.0, 0.0, 0.0]
+
+    embed.aembed_query.side_effect = aembed_query
+    store = LocalVectorStore(_index(tmp_path), embed)
+    docs = store.similarity_search("top up", k=1, filter={"lang": "en"})
+    assert docs[0].page_content == "Use FCY."
+    assert docs[0].metadata == {"lang": "en", "question": "Top up?"}
+    adocs = asyncio.run(store.asimilarity_search("top up", k=1))
+    assert adocs[0].page_content == "Use FCY."
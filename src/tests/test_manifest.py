@@ -0,0 +1,31 @@
+from core.settings import settings
+from retrieval.manifest import content_hash, diff_chunks, load_manifest, save_manifest
+
+
+def test_diff_chunks_classifies_new_changed_unchanged_stale(tmp_path, monkeypatch):
+    """
+    Test that a re-ingest only reports what actually changed, and that the
+    manifest round-trips through disk.
+    """
+    monkeypatch.setattr(settings, "manifest_dir", str(tmp_path))
+    meta_a = {"lang": "en", "question": "Q1?", "text": "A1"}
+    meta_b = {"lang": "en", "question": "Q2?", "text": "A2"}
+    save_manifest(
+        "en",
+        {
+            "a": content_hash("A1", meta_a),
+            "b": content_hash("A2", meta_b),
+            "gone": "x",
+        },
+    )
+    chunks = [
+        ("a", "A1", meta_a),
+        ("b", "A2", {**meta_b, "question": "Q2 (edited)?"}),
+        ("c", "A3", {"lang": "en", "question": "Q3?", "text": "A3"}),
+        ("c", "A3", {"lang": "en", "question": "Q3 again?", "text": "A3"}),
+    ]
+    diff = diff_chunks(load_manifest("en"), chunks)
+    assert [c[0] for c in diff.new] == ["c"]
+    assert [c[0] for c in diff.changed] == ["b"]
+    assert diff.unchanged == ["a"]
+    assert diff.stale == ["gone"]
@@ -0,0 +1,52 @@
+import os
+
+import fitz
+
+from core.settings import settings
+from retrieval import pdf_parser
+from retrieval.chunking import iter_qna_blocks
+
+PDF = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "FAQ_FCY_Jenius_id.pdf")
+
+
+def test_parallel_parse_matches_serial_parse(monkeypatch):
+    """
+    Test that page ranges parsed on a process pool merge back into exactly the
+    serial result, including questions and answers that cross page breaks.
+    """
+    with fitz.open(PDF) as doc:
+        serial = list(iter_qna_blocks(doc))
+    monkeypatch.setattr(pdf_parser, "PARALLEL_MIN_PAGES", 0)
+    parallel = list(pdf_parser.assemble_qna(pdf_parser.read_pages(PDF, workers=3)))
+    assert serial and parallel == serial
+
+
+def test_load_qna_reuses_artifact_until_parser_version_changes(tmp_path, monkeypatch):
+    """
+    Test that the second load reads the artifact instead of the PDF, and that
+    a parser version bump or another question_min forces a re-parse.
+    """
+    monkeypatch.setattr(settings, "parsed_dir", str(tmp_path))
+    first = pdf_parser.load_qna(PDF, workers=1)
+    assert len(list(tmp_path.glob("*.qna.jsonl"))) == 1
+
+    read_pages = pdf_parser.read_pages
+    calls = []
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return read_pages(*args, **kwargs)
+
+    monkeypatch.setattr(pdf_parser, "read_pages", counting)
+    assert pdf_parser.load_qna(PDF, workers=1) == first
+    assert not calls  # served from the artifact
+
+    monkeypatch.setattr(pdf_parser, "PARSER_VERSION", pdf_parser.PARSER_VERSION + 1)
+    assert pdf_parser.load_qna(PDF, workers=1) == first
+    assert len(calls) == 1
+
+    # each question_min has its own artifact, so alternating settings do not re-parse
+    pdf_parser.load_qna(PDF, question_min=12.0, workers=1)
+    assert pdf_parser.load_qna(PDF, workers=1) == first
+    assert len(calls) == 2
+    assert len(list(tmp_path.glob("*.qna.jsonl"))) == 3
@@ -0,0 +1,34 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from core.metrics import LLM_TOKENS, RequestTimings
+from services.prompt_layout import build_messages, record_prompt, record_usage
+
+
+def test_layout_keeps_static_prefix_across_turns():
+    """
+    Test that the system prompt comes first and that a follow-up turn's prompt
+    starts with the previous turn's system prompt and history.
+    """
+    system = SystemMessage(content="You are NIX.")
+    turn1 = build_messages(system, [], HumanMessage(content="Context: a\n\nQuery: fee?"))
+    history = [HumanMessage(content="fee?"), AIMessage(content="Free.")]
+    turn2 = build_messages(system, history, HumanMessage(content="Context: b\n\nQuery: limit?"))
+
+    assert turn2.messages[0] is system
+    assert turn2.messages[: 1 + len(history)] == [system] + history
+    assert turn1.messages[0] is system
+
+    timings = RequestTimings()
+    record_prompt(turn2, timings)
+    tokens = turn2.segment_tokens()
+    assert list(tokens) == ["system", "history", "context"]
+    assert timings.counters["prompt_tokens_history"] == tokens["history"] > 0
+
+
+def test_record_usage_splits_cached_prompt_tokens():
+    before = LLM_TOKENS.value(kind="cached")
+    timings = RequestTimings()
+    usage = {"input_tokens": 1500, "output_tokens": 40, "total_tokens": 1540, "input_token_details": {"cache_read": 1024}}
+    record_usage(usage, timings)
+    assert LLM_TOKENS.value(kind="cached") - before == 1024
+    assert (timings.counters["prompt_tokens"], timings.counters["cached_prompt_tokens"]) == (1500, 1024)
@@ -1,8 +1,14 @@
+import asyncio
 from unittest.mock import MagicMock, patch
 
 import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
 
+from core.metrics import RequestTimings
+from core.settings import settings
 from services import rag_services
+from services.answer_cache import answer_cache
 
 
 def test_augment_prompt_returns_context_and_query():
@@ -17,3 +23,156 @@ def test_augment_prompt_returns_context_and_query():
         assert "This is a relevant context." in result
         assert "Query:" in result
         assert "What is FX?" in result
+
+
+def test_stream_chat_with_memory_wraps_async_pipeline():
+    """
+    Test that the sync stream_chat_with_memory yields the chunks produced by
+    astream_chat_with_memory, in order.
+    """
+
+    async def fake_astream(history, user_input, lang=None):
+        for chunk in ["FX ", "is ", "foreign currency."]:
+            yield chunk
+
+    with patch.object(rag_services, "astream_chat_with_memory", fake_astream):
+        chunks = list(rag_services.stream_chat_with_memory([], "What is FX?", "en"))
+    assert chunks == ["FX ", "is ", "foreign currency."]
+
+
+def test_known_faq_question_is_answered_from_answer_store():
+    """
+    Test that a stored canonical answer is streamed without retrieval or generation.
+    """
+    store = MagicMock()
+    store.__len__.return_value = 1
+    store.exact.return_value = {"answer": "Stored answer."}
+    with patch.object(rag_services, "get_answer_store", return_value=store), patch.object(
+        rag_services, "chat_model"
+    ) as llm, patch("retrieval.vector_store.aretrieve_docs") as retrieve:
+        chunks = list(rag_services.stream_chat_with_memory([], "How do I top up USD?", "en"))
+    assert "".join(chunks) == "Stored answer."
+    llm.assert_not_called()
+    retrieve.assert_not_called()
+
+
+def test_lexical_match_reaches_answer_store_without_embedding():
+    """
+    Test that a confident lexical match is looked up by its FAQ question,
+    skipping the nearest-neighbour embedding call.
+    """
+    store = MagicMock()
+    store.__len__.return_value = 1
+    store.exact.side_effect = lambda q: {"answer": "Stored."} if q == "How do I top up my USD balance?" else None
+    lexical = MagicMock()
+    lexical.confident_match.return_value = [
+        Document(page_content="Open FCY.", metadata={"question": "How do I top up my USD balance?"})
+    ]
+    with patch.object(rag_services, "get_answer_store", return_value=store), patch.object(
+        rag_services, "get_lexical_index", return_value=lexical
+    ), patch.object(settings, "hybrid_retrieval", True), patch(
+        "retrieval.vector_store.get_vectorstore"
+    ) as get_vs:
+        answer = asyncio.run(rag_services._stored_answer("how do i top up my usd balance please", "en"))
+    assert answer == "Stored."
+    get_vs.assert_not_called()
+    store.nearest.assert_not_called()
+
+
+def test_rephrased_repeat_is_served_from_answer_cache(tmp_path, monkeypatch):
+    """
+    Test that a repeat differing only in case, punctuation and spacing hits the
+    answer cache instead of generating again.
+    """
+    monkeypatch.setattr(settings, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "answer_store_enabled", False)
+    monkeypatch.setattr(settings, "fx_answers_enabled", False)
+    monkeypatch.setattr(settings, "tool_calling", False)
+    answer_cache.clear()
+    calls = []
+
+    async def astream(messages):
+        calls.append(messages)
+        yield MagicMock(content="Open the FCY tab.", usage_metadata=None)
+
+    async def docs(*args, **kwargs):
+        return [Document(page_content="Tap Open FCY.", metadata={"question": "How to open USD?"})]
+
+    async def ask(text):
+        return "".join([c async for c in rag_services.astream_chat_with_memory([], text, "en")])
+
+    with patch.object(rag_services, "chat_model") as llm, patch(
+        "retrieval.vector_store.aretrieve_docs", side_effect=docs
+    ):
+        llm.return_value.astream = astream
+        assert asyncio.run(ask("How do I open a USD account?")) == "Open the FCY tab."
+        assert asyncio.run(ask("how do i  open a usd account")) == "Open the FCY tab."
+    assert len(calls) == 1
+    answer_cache.clear()
+
+
+def test_coalesced_generation_reports_stats_to_every_requester(tmp_path, monkeypatch):
+    """
+    Test that concurrent rephrasings share one generation and that each
+    requester gets the generation's timing and usage counters.
+    """
+    monkeypatch.setattr(settings, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "answer_store_enabled", False)
+    monkeypatch.setattr(settings, "fx_answers_enabled", False)
+    monkeypatch.setattr(settings, "tool_calling", False)
+    monkeypatch.setattr(settings, "coalesce_requests", True)
+    answer_cache.clear()
+    calls = []
+
+    async def astream(messages):
+        calls.append(messages)
+        await asyncio.sleep(0.05)
+        yield MagicMock(content="Free.", usage_metadata=None)
+        yield MagicMock(content="", usage_metadata={"input_tokens": 10, "output_tokens": 2, "total_tokens": 12})
+
+    async def docs(*args, **kwargs):
+        return [Document(page_content="No fee.", metadata={"question": "Fees?"})]
+
+    async def ask(text, timings):
+        return "".join([c async for c in rag_services.astream_chat_with_memory([], text, "en", timings=timings)])
+
+    async def both():
+        return await asyncio.gather(ask("Is there a fee?", first), ask("is there a fee", second))
+
+    first, second = RequestTimings(), RequestTimings()
+    with patch.object(rag_services, "chat_model") as llm, patch(
+        "retrieval.vector_store.aretrieve_docs", side_effect=docs
+    ):
+        llm.return_value.astream = astream
+        assert asyncio.run(both()) == ["Free.", "Free."]
+    assert len(calls) == 1
+    for timings in (first, second):
+        assert "generation" in timings.stages
+        assert timings.counters["completion_tokens"] == 2
+    answer_cache.clear()
+
+
+def test_system_prompt_precedes_history():
+    """
+    Test that the prompt sent to the model starts with the system prompt, then
+    the history, then the retrieved context, so turns share a cacheable prefix.
+    """
+    sent = []
+
+    async def astream(messages):
+        sent.append(messages)
+        yield MagicMock(content="ok", usage_metadata=None)
+
+    async def no_docs(*args, **kwargs):
+        return []
+
+    history = [HumanMessage(content="Hi"), AIMessage(content="Hello!")]
+    with patch.object(rag_services, "chat_model") as llm, patch(
+        "retrieval.vector_store.aretrieve_docs", side_effect=no_docs
+    ):
+        llm.return_value.astream = astream
+        list(rag_services.stream_chat_with_memory(history, "What is the USD fee?", "en"))
+    messages = sent[0]
+    assert messages[0] is rag_services.SYS_PROMPT["en"]
+    assert messages[1:3] == history
+    assert "Query:" in messages[-1].content
@@ -0,0 +1,87 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from services.sessions import (
+    MemorySessionStore,
+    Session,
+    SQLiteSessionStore,
+    asummarize,
+    create_session,
+    record_turn,
+)
+
+
+def test_window_keeps_recent_turns_within_budget():
+    """
+    Test that only the most recent turns that fit the token budget are verbatim.
+    """
+    session = Session("s")
+    for i in range(6):
+        session.append("user" if i % 2 == 0 else "assistant", f"message number {i} " * 5)
+    budget = sum(m.tokens for m in session.messages[-2:])
+    assert session.window_start(budget) == 4
+    msgs = session.window(budget)
+    assert [type(m).__name__ for m in msgs] == ["HumanMessage", "AIMessage"]
+
+
+def test_asummarize_folds_old_turns_into_summary():
+    """
+    Test that turns falling out of the window are summarized incrementally.
+    """
+    session = Session("s")
+    for i in range(4):
+        session.append("user" if i % 2 == 0 else "assistant", f"turn {i} " * 10)
+    budget = sum(m.tokens for m in session.messages[-2:])
+    llm = MagicMock()
+    llm.ainvoke = AsyncMock(return_value=MagicMock(content="User asked about USD."))
+    with patch("services.sessions.chat_model", return_value=llm):
+        asyncio.run(asummarize(session, budget))
+    assert session.summary == "User asked about USD."
+    assert session.summarized_upto == 2
+    msgs = session.window(budget)
+    assert type(msgs[0]).__name__ == "SystemMessage"
+    assert len(msgs) == 3
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    """
+    Test that sessions persist in the SQLite backend.
+    """
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    session = Session("abc", summary="s", summarized_upto=0)
+    session.append("user", "hi")
+    store.save(session)
+    loaded = SQLiteSessionStore(str(tmp_path / "sessions.db")).get("abc")
+    assert loaded.messages == session.messages
+    assert loaded.summary == "s"
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_concurrent_turns_of_one_session_are_both_kept(tmp_path, backend):
+    """
+    Test that two turns recorded from the same read of a session do not
+    overwrite each other.
+    """
+    store = MemorySessionStore() if backend == "memory" else SQLiteSessionStore(str(tmp_path / "s.db"))
+    first, second = store.get("abc"), store.get("abc")
+    with patch("services.sessions.get_session_store", return_value=store):
+        asyncio.run(record_turn(first, "What is FX?", "Foreign exchange."))
+        asyncio.run(record_turn(second, "Fees?", "None."))
+    contents = [m.content for m in store.get("abc").messages]
+    assert contents == ["What is FX?", "Foreign exchange.", "Fees?", "None."]
+    assert store.save(first) is False  # stale copy
+
+
+def test_create_session_issues_unguessable_known_ids():
+    """
+    Test that server-issued sessions are persisted under distinct random IDs
+    and that IDs the server never issued are not found.
+    """
+    store = MemorySessionStore()
+    with patch("services.sessions.get_session_store", return_value=store):
+        first, second = create_session(), create_session()
+    assert first.session_id != second.session_id and len(first.session_id) >= 32
+    assert store.find(first.session_id) is not None
+    assert store.find("s-1") is None
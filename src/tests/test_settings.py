@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+
+def test_importing_the_app_has_no_side_effects():
+    """
+    Test that importing the API needs no credentials and loads neither the
+    settings nor the OpenAI/Pinecone client libraries.
+    """
+    env = {k: v for k, v in os.environ.items() if k not in ("BATI_OPENAI_API_KEY", "PINECONE_API_KEY")}
+    code = (
+        "import sys, app.api, app.main\n"
+        "from core import settings\n"
+        "assert settings._SETTINGS is None\n"
+        "heavy = [m for m in ('langchain_openai', 'langchain_pinecone', 'pinecone') if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,23 @@
+import asyncio
+
+from app.sse import coalesce, encode_event
+
+
+def test_encode_event_keeps_multiline_data_and_leading_spaces():
+    frame = encode_event(" rate:\n1 USD\r\n= 16,250 IDR", event="message", event_id=7)
+    assert frame == "id: 7\nevent: message\ndata:  rate:\ndata: 1 USD\ndata: = 16,250 IDR\n\n"
+
+
+def test_coalesce_sends_first_chunk_then_flushes_by_time_and_size():
+    async def tokens():
+        for tok in ["A", "b", "c"]:
+            yield tok
+        await asyncio.sleep(0.1)  # longer than the interval: the buffer is flushed meanwhile
+        for tok in ["dd", "ee", "ff"]:
+            yield tok
+
+    async def run(max_bytes):
+        return [frame async for frame in coalesce(tokens(), interval_s=0.03, max_bytes=max_bytes)]
+
+    assert asyncio.run(run(1024)) == ["A", "bc", "ddeeff"]
+    assert asyncio.run(run(4)) == ["A", "bc", "ddee", "ff"]
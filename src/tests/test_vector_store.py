@@ -0,0 +1,110 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from benchmarks.fakes import FakeEmbeddings, FakePineconeIndex, FakeVectorStore
+from core.settings import settings
+from retrieval import vector_store
+
+
+def test_retrieve_docs_many_batches_embeddings_and_keeps_order():
+    emb = FakeEmbeddings(dim=32)
+    index = FakePineconeIndex()
+    texts = [f"answer {i}" for i in range(10)]
+    index.upsert(
+        ((f"id{i}", v, {"text": t, "lang": "en"}) for i, (t, v) in enumerate(zip(texts, emb.embed_documents(texts)))),
+        namespace="en",
+    )
+    emb.calls = 0
+    store = FakeVectorStore(index, emb, namespace="en")
+
+    with patch.dict(vector_store._VECTORSTORES, {"en": store}), patch.object(
+        settings, "hybrid_retrieval", False
+    ):
+        queries = [texts[7], texts[2], texts[5]]
+        results = vector_store.retrieve_docs_many(queries, lang="en", k=2)
+
+    assert emb.calls == 1
+    assert [docs[0].page_content for docs in results] == queries
+    assert all(len(docs) == 2 for docs in results)
+
+
+class _TimedStore:
+    """
+    Returns `docs[filter is set]` after `delay[filter is set]` seconds.
+    """
+
+    def __init__(self, filtered, unfiltered, delay_filtered=0.0, delay_unfiltered=0.0):
+        self.docs = {True: filtered, False: unfiltered}
+        self.delay = {True: delay_filtered, False: delay_unfiltered}
+        self.cancelled = []
+
+    async def asimilarity_search_by_vector(self, vector, k=4, filter=None):
+        try:
+            await asyncio.sleep(self.delay[filter is not None])
+        except asyncio.CancelledError:
+            self.cancelled.append(filter is not None)
+            raise
+        return self.docs[filter is not None]
+
+    def similarity_search_by_vector(self, vector, k=4, filter=None):
+        time.sleep(self.delay[filter is not None])
+        return self.docs[filter is not None]
+
+
+def _doc(text):
+    return Document(page_content=text, metadata={})
+
+
+def test_speculative_search_prefers_primary_and_respects_deadline():
+    primary, fallback = [_doc("primary")], [_doc("fallback")]
+    run = lambda store: asyncio.run(vector_store._aspeculative_search(store, [0.0], "en", 3, "en"))
+
+    with patch.object(settings, "retrieval_deadline_s", 0.2), patch.object(
+        settings, "retrieval_extra_namespaces", []
+    ):
+        # primary wins even if the fallback answers first; the loser is cancelled
+        store = _TimedStore(primary, fallback, delay_filtered=0.05, delay_unfiltered=0.0)
+        assert run(store) == primary
+        fast = _TimedStore(primary, fallback, delay_filtered=0.0, delay_unfiltered=1.0)
+        assert run(fast) == primary and fast.cancelled == [False]
+        # empty primary: fallback is used without a second round trip
+        assert run(_TimedStore([], fallback, delay_unfiltered=0.05)) == fallback
+        # slow primary: the deadline caps latency and the fallback is served
+        start = time.perf_counter()
+        assert run(_TimedStore(primary, fallback, delay_filtered=1.0)) == fallback
+        assert time.perf_counter() - start < 0.5
+        # sync path, same rules
+        assert vector_store._speculative_search(
+            _TimedStore(primary, fallback, delay_filtered=1.0), [0.0], "en", 3, "en"
+        ) == fallback
+
+
+def test_sync_speculative_search_bounds_work_per_request():
+    """
+    Test that the sync path runs at most SPECULATIVE_PER_REQUEST strategies
+    at once and never starts one that is no longer needed.
+    """
+    primary, fallback = [_doc("primary")], [_doc("fallback")]
+    # the fallback is still running when the primary decides the result
+    store = _TimedStore(primary, fallback, delay_filtered=0.05, delay_unfiltered=0.3)
+    extra = _TimedStore([], [])
+    extra.started = 0
+
+    def extra_search(vector, k=4, filter=None):
+        extra.started += 1
+        return []
+
+    extra.similarity_search_by_vector = extra_search
+
+    with patch.object(settings, "retrieval_deadline_s", 1.0), patch.object(
+        settings, "retrieval_extra_namespaces", ["id"]
+    ), patch.object(vector_store, "get_vectorstore", return_value=extra):
+        assert vector_store._speculative_search(store, [0.0], "en", 3, "en") == primary
+        assert extra.started == 0
+        # both in-namespace queries empty: the cross-namespace one starts next
+        empty = _TimedStore([], [], delay_filtered=0.01, delay_unfiltered=0.01)
+        assert vector_store._speculative_search(empty, [0.0], "en", 3, "en") == []
+        assert extra.started == 1